@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "translate_ocr"))
+
+import mod220_backend_registry
+
+# OCR 與截圖共用的後端登錄表：自動選擇、失敗時改用備援後端
+
+
+def make_backend(backend_name, fail_init=False, fail_call=False):
+    class Backend:
+        name = backend_name
+        calls = 0
+
+        def __init__(self):
+            if fail_init:
+                raise RuntimeError(f"{backend_name} init failed")
+
+        def work(self):
+            type(self).calls += 1
+            if fail_call:
+                raise RuntimeError(f"{backend_name} call failed")
+            return backend_name
+    return Backend
+
+
+class BackendRegistryTest(unittest.TestCase):
+
+    def make_registry(self, **backends):
+        return mod220_backend_registry.BackendRegistry("測試後端", backends, list(backends))
+
+    def test_auto_select_caches_first_backend(self):
+        registry = self.make_registry(fast=make_backend("fast"), slow=make_backend("slow"))
+        self.assertIs(registry.get(), registry.get())
+        self.assertEqual(registry.run(None, lambda backend: backend.work()), "fast")
+
+    def test_init_failure_falls_back(self):
+        registry = self.make_registry(fast=make_backend("fast", fail_init=True), slow=make_backend("slow"))
+        self.assertEqual(registry.get().name, "slow")
+        with self.assertRaises(ValueError):
+            registry.get("fast")
+        with self.assertRaises(ValueError):
+            registry.get("missing")
+
+    def test_call_failure_falls_back_once(self):
+        fast = make_backend("fast", fail_call=True)
+        registry = self.make_registry(fast=fast, slow=make_backend("slow"))
+        self.assertEqual(registry.run(None, lambda backend: backend.work()), "slow")
+        self.assertEqual(registry.run(None, lambda backend: backend.work()), "slow")
+        self.assertEqual(fast.calls, 1)  # 失敗的後端之後略過
+        self.assertEqual(registry.failed, {"fast"})
+
+    def test_named_or_last_backend_failure_raises(self):
+        registry = self.make_registry(fast=make_backend("fast", fail_call=True),
+                                      slow=make_backend("slow", fail_call=True))
+        with self.assertRaises(RuntimeError):
+            registry.run("fast", lambda backend: backend.work())
+        self.assertEqual(registry.failed, set())
+        with self.assertRaises(RuntimeError):
+            registry.run(None, lambda backend: backend.work())
+
+    def test_register_adds_to_module_dict(self):
+        backends = {}
+        registry = mod220_backend_registry.BackendRegistry("測試後端", backends, [])
+        registry.register("extra", make_backend("extra"))
+        self.assertIn("extra", backends)
+        self.assertEqual(registry.get("extra").name, "extra")
+        self.assertEqual([backend.name for backend in registry.loaded()], ["extra"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "translate_ocr"))
+
+import mod206_translate_dispatch
+import mod208_metrics
+import mod219_translate_providers
+import mod403_mock_translate_server
+
+# 批次翻譯的編號 JSON 與純文字備援格式，以 mod403 模擬伺服器的翻譯規則測試 (不需要網路)
+TEXTS = ["first line", "second line", "third line"]
+EXPECTED = ["〔first line〕", "〔second line〕", "〔third line〕"]
+
+
+def mock_translator(text, target_lang, source_lang=None):
+    # 與透過模擬伺服器翻譯相同 (見 mod219_translate_providers.build_prompt)
+    return mod403_mock_translate_server.fake_translate(
+        mod219_translate_providers.build_prompt(text, target_lang, source_lang))
+
+def prose_json_translator(translator):
+    # 編號 JSON 的請求以一般文字回答 (沒有可解析的編號)，其他請求交給 translator
+    def translate(text, target_lang, source_lang=None):
+        if text.startswith(mod206_translate_dispatch.BATCH_INSTRUCTION):
+            return "好的，以下是翻譯結果。"
+        return translator(text, target_lang, source_lang)
+    return translate
+
+def plain_fallbacks():
+    return mod208_metrics.snapshot()['counters'].get('api_plain_fallbacks', 0)
+
+
+class TranslateDispatchTest(unittest.TestCase):
+
+    def test_mock_answers_numbered_json(self):
+        response = mock_translator(mod206_translate_dispatch.build_request(TEXTS), "繁體中文")
+        parsed = mod206_translate_dispatch.parse_response(response, len(TEXTS))
+        self.assertEqual([parsed.get(idx) for idx in range(len(TEXTS))], EXPECTED)
+
+    def test_mock_answers_plain_lines(self):
+        # 純文字格式只翻譯原文，不回傳格式說明
+        response = mock_translator(mod206_translate_dispatch.build_plain_request(TEXTS), "繁體中文")
+        self.assertEqual(mod206_translate_dispatch.parse_plain_response(response, len(TEXTS)), EXPECTED)
+
+    def test_batches_with_mock(self):
+        fallbacks = plain_fallbacks()
+        self.assertEqual(mod206_translate_dispatch.translate_batches(TEXTS, "繁體中文", mock_translator), EXPECTED)
+        self.assertEqual(plain_fallbacks(), fallbacks)
+
+    def test_plain_fallback_fills_translations(self):
+        # 編號 JSON 無法解析時，以純文字格式重送整個批次
+        fallbacks = plain_fallbacks()
+        translator = prose_json_translator(mock_translator)
+        self.assertEqual(mod206_translate_dispatch.translate_batches(TEXTS, "繁體中文", translator), EXPECTED)
+        self.assertEqual(plain_fallbacks(), fallbacks + 1)
+
+    def test_single_retry_uses_plain_lines(self):
+        # 只缺少一行時單獨重送，回應為一行譯文
+        def translator(text, target_lang, source_lang=None):
+            response = mock_translator(text, target_lang, source_lang)
+            if text.startswith(mod206_translate_dispatch.BATCH_INSTRUCTION):
+                return response.replace('"2": "〔second line〕", ', '')
+            return response
+        self.assertEqual(mod206_translate_dispatch.translate_batches(TEXTS, "繁體中文", translator), EXPECTED)
+
+    def test_single_retry_rejects_unparsed_reply(self):
+        # 單行重送的回應沒有編號，也不是一行譯文時視為失敗，不保存模型的回答
+        replies = ["好的，翻譯如下：\n〔first line〕",
+                   mod206_translate_dispatch.build_plain_request(["first line"]),
+                   '{"1": "〔first line〕',
+                   ""]
+        for reply in replies:
+            with self.subTest(reply=reply):
+                translator = lambda text, target_lang, source_lang=None: reply
+                self.assertIsNone(mod206_translate_dispatch.translate_single("first line", "繁體中文", translator))
+        self.assertEqual(mod206_translate_dispatch.translate_batches(["first line"], "繁體中文", translator), [None])
+
+    def test_single_retry_accepts_numbered_reply(self):
+        translator = lambda text, target_lang, source_lang=None: '```json\n{"1": "〔first line〕"}\n```'
+        self.assertEqual(mod206_translate_dispatch.translate_single("first line", "繁體中文", translator),
+                         "〔first line〕")
+
+    def test_plain_fallback_with_benchmark_stub(self):
+        try:
+            import mod400_benchmark
+        except ImportError as e:
+            self.skipTest(f"無法載入 mod400_benchmark: {e}")
+        translator = prose_json_translator(mod400_benchmark.stub_translator())
+        self.assertEqual(mod206_translate_dispatch.translate_batches(TEXTS, "繁體中文", translator), EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import json
+import os
+import select
+import ssl
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "translate_ocr"))
+
+import mod208_metrics
+import mod219_translate_providers
+import mod403_mock_translate_server
+
+# 翻譯服務的連線池與設定檔切換，以 mod403 的本機模擬伺服器測試 (不需要網路與 API key)
+# HTTPS 使用 data 中的自簽憑證 (僅供測試，127.0.0.1)
+CERT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "mock_server.pem")
+KEY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "mock_server.key")
+
+
+class TranslateProvidersTest(unittest.TestCase):
+    certfile = None
+    keyfile = None
+
+    def setUp(self):
+        self.server, url = mod403_mock_translate_server.start_server(certfile=self.certfile, keyfile=self.keyfile)
+        self.old_base_url = os.environ.get(mod219_translate_providers.BASE_URL_ENV)
+        os.environ[mod219_translate_providers.BASE_URL_ENV] = url
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.old_config_file = mod219_translate_providers.API_CONFIG_FILE
+        mod219_translate_providers.API_CONFIG_FILE = os.path.join(self.temp_dir.name, "api_config.json")
+        mod219_translate_providers._providers = []
+        mod219_translate_providers._config_mtime = -1.0
+
+    def tearDown(self):
+        for provider in mod219_translate_providers._providers:
+            provider.close()
+        mod219_translate_providers._providers = []
+        mod219_translate_providers._config_mtime = -1.0
+        mod219_translate_providers.API_CONFIG_FILE = self.old_config_file
+        if self.old_base_url is None:
+            os.environ.pop(mod219_translate_providers.BASE_URL_ENV, None)
+        else:
+            os.environ[mod219_translate_providers.BASE_URL_ENV] = self.old_base_url
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def write_config(self, config):
+        # 修改時間設為比上次更晚，確保 load_config 重新讀取
+        path = mod219_translate_providers.API_CONFIG_FILE
+        previous = os.path.getmtime(path) if os.path.exists(path) else time.time()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        os.utime(path, (previous + 10, previous + 10))
+        if self.certfile:
+            # 重新建立的連線池信任測試用的憑證
+            for provider in mod219_translate_providers.load_config():
+                provider.pool.ssl_context = ssl.create_default_context(cafile=self.certfile)
+
+    def wait_closed(self, provider):
+        # 等待伺服器關閉連線的通知到達 (閒置的連線變成可讀取)
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            if all(mod219_translate_providers._is_closed(conn.sock) for conn, _ in provider.pool.idle):
+                return
+            time.sleep(0.01)
+        self.fail("伺服器關閉的連線沒有被偵測到")
+
+    def cold_connects(self):
+        # 翻譯時才建立連線的次數 (見 ConnectionPool.request)
+        return mod208_metrics.snapshot()['counters'].get('api_cold_connects', 0)
+
+    def test_pool_reuses_connections(self):
+        self.write_config({"gemini": "key", "gemini_enabled": True})
+        for i in range(5):
+            self.assertEqual(mod219_translate_providers.translate(f"line {i}", "繁體中文"), f"〔line {i}〕")
+        self.assertEqual(self.server.snapshot(), {'connections': 1, 'requests': 5})
+
+    def test_refresh_after_dropped_connection(self):
+        self.write_config({"gemini": "key", "gemini_enabled": True})
+        mod219_translate_providers.translate("first", "繁體中文")
+        provider = mod219_translate_providers.load_config()[0]
+
+        self.server.drop_connections()
+        self.wait_closed(provider)
+        provider.pool.refresh()
+        # refresh 已重新連線，翻譯時不需要再建立連線
+        cold_connects = self.cold_connects()
+        self.assertEqual(mod219_translate_providers.translate("second", "繁體中文"), "〔second〕")
+        self.assertEqual(self.cold_connects(), cold_connects)
+        self.assertEqual(self.server.snapshot(), {'connections': 2, 'requests': 2})
+
+    def test_retry_after_dropped_connection(self):
+        # 沒有 refresh 時，重複使用的連線已被關閉，request 重新連線後重送一次
+        self.write_config({"gemini": "key", "gemini_enabled": True})
+        mod219_translate_providers.translate("first", "繁體中文")
+        provider = mod219_translate_providers.load_config()[0]
+
+        self.server.drop_connections()
+        self.wait_closed(provider)
+        cold_connects = self.cold_connects()
+        self.assertEqual(mod219_translate_providers.translate("second", "繁體中文"), "〔second〕")
+        self.assertEqual(self.cold_connects(), cold_connects + 1)
+        self.assertEqual(self.server.snapshot(), {'connections': 2, 'requests': 2})
+
+    def test_switch_provider_from_config(self):
+        self.write_config({"gemini": "key", "gemini_enabled": True})
+        self.assertEqual(mod219_translate_providers.current_name(), "gemini")
+        self.assertEqual(mod219_translate_providers.translate("hello", "繁體中文"), "〔hello〕")
+
+        # 修改設定檔後重新載入，改用 GPT (模擬伺服器會檢查各服務的驗證標頭)
+        self.write_config({"gemini": "key", "gemini_enabled": False, "gpt": "key", "gpt_enabled": True})
+        self.assertEqual(mod219_translate_providers.current_name(), "gpt")
+        self.assertEqual(mod219_translate_providers.translate("hello", "繁體中文"), "〔hello〕")
+        self.assertEqual(self.server.snapshot()['requests'], 2)
+
+        # 沒有啟用任何服務時為 geminiAPI 模組
+        self.write_config({"gemini": "key", "gpt": "key"})
+        self.assertEqual(mod219_translate_providers.current_name(), mod219_translate_providers.LEGACY_NAME)
+
+
+class HttpsTranslateProvidersTest(TranslateProvidersTest):
+    """與 TranslateProvidersTest 相同的測試，改用 HTTPS (TLS 1.3)"""
+    certfile = CERT_FILE
+    keyfile = KEY_FILE
+
+    def test_refresh_keeps_preconnected_connections(self):
+        # TLS 1.3 交握後伺服器送出的 NewSessionTicket 讓閒置的連線可讀取，refresh 不應把它當成已關閉
+        self.write_config({"gemini": "key", "gemini_enabled": True})
+        provider = mod219_translate_providers.load_config()[0]
+        provider.preconnect()
+        self.assertTrue(any(select.select([conn.sock], [], [], 1)[0] for conn, _ in provider.pool.idle))
+
+        provider.pool.refresh()
+        cold_connects = self.cold_connects()
+        self.assertEqual(mod219_translate_providers.translate("hello", "繁體中文"), "〔hello〕")
+        self.assertEqual(self.cold_connects(), cold_connects)
+        self.assertEqual(self.server.snapshot(),
+                         {'connections': mod219_translate_providers.POOL_SIZE, 'requests': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,201 +1,228 @@
 import cv2
 import numpy as np
-import pytesseract
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from collections import defaultdict
+import threading
 #from deep_translator import GoogleTranslator
-from geminiAPI import translate_text
-import colorsys
+import sqlite3
+import mod201_ocr_engine
+import mod202_translate_cache
+import mod206_translate_dispatch
+import mod207_trace
+import mod208_metrics
+import mod209_result_cache
+import mod210_text_regions
+import mod211_layout
+import mod212_fonts
+import mod216_tiled_ocr
+import mod217_script_detect
+import mod218_profiles
+import mod219_translate_providers
 
 # 建立翻譯器
 #translator = GoogleTranslator(source='auto', target='zh-TW')
-translator = translate_text
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# 翻譯器的介面: translator(原文, 目標語言, 原文語言) -> 譯文，原文語言為 None 時由翻譯服務自行判斷
+translator = mod219_translate_providers.translate  # 依 api_config.json 選擇翻譯服務 (見 mod219_translate_providers)
+TRANSLATE_PROVIDER = None  # 翻譯快取以服務名稱區分，None 為目前使用的服務
+TARGET_LANG = "繁體中文"
+USE_TRANSLATE_CACHE = True
+USE_RESULT_CACHE = True  # 相同畫面直接使用上次的結果 (見 mod209_result_cache)
+USE_TEXT_DETECTION = True  # 先偵測文字區域，只辨識這些區域 (見 mod210_text_regions)
+USE_SCALE_NORMALIZATION = True  # 依文字大小縮放 OCR 的輸入
+USE_TILED_OCR = True  # 大圖分塊並行辨識 (見 mod216_tiled_ocr)
+USE_SCRIPT_DETECTION = True  # 依文字系統選擇 OCR 語言與翻譯的原文語言 (見 mod217_script_detect)
+
+def get_default_font():
+    # 預設字體 (見 mod212_fonts，字型檔只解析、載入一次)
+    return mod212_fonts.get_font_manager().face
+
+def warm_up():
+    # 預先載入字體與 OCR 引擎，供常駐翻譯程序啟動時呼叫
+    get_default_font()
+    mod201_ocr_engine.warm_up()
+    if USE_SCRIPT_DETECTION:
+        # 純英文畫面只使用 eng，一併預先載入
+        mod201_ocr_engine.warm_up('eng')
+    # 在背景與翻譯 API 完成 TCP 與 TLS 交握，第一次截圖翻譯時不必等待連線
+    if translator is mod219_translate_providers.translate:
+        mod219_translate_providers.preconnect()
 
 def remove_text(image_path, output_path):
     # 讀取圖片
     img = cv2.imread(image_path)
     if img is None:
         raise ValueError("無法讀取圖片")
+
+    result_img, result_info = remove_text_image(img)
+    cv2.imwrite(output_path, result_img)
+    return result_info
+
+def save_image_async(img, output_path):
+    # 在背景執行緒寫檔，不阻塞預覽視窗顯示
+    thread = threading.Thread(target=cv2.imwrite, args=(output_path, img))
+    thread.start()
+    return thread
+
+def remove_text_image(img, output_path=None, ocr_backend=None, profile=None):
+    # img: BGR 格式的 numpy 陣列
+    # 回傳 (翻譯後的 BGR 陣列, result_info)；指定 output_path 時另外在背景寫檔
+    # ocr_backend: 指定 OCR 後端名稱 (見 mod201_ocr_engine.BACKENDS)，None 為自動選擇
+    # profile: 截圖設定檔名稱 (見 mod218_profiles)，None 為預設參數
+    result_img, result_info = None, None
+    for stage, result_img, result_info in remove_text_stream(img, output_path, ocr_backend, profile):
+        pass
+    return result_img, result_info
+
+def remove_text_stream(img, output_path=None, ocr_backend=None, profile=None):
+    # 與 remove_text_image 相同，但逐步產生 (階段, BGR 陣列, result_info)：
+    #   'erased'     OCR 與塗銷完成，待翻譯的區域以框線標示
+    #   'translated' 部分譯文已繪製 (每收到一批譯文產生一次)
+    #   'done'       全部完成，與 remove_text_image 的回傳值相同
+    # result_info['timings'] 記錄各階段耗時 (秒)：ocr / grouping / color / fill / translate / render
+    # 與最近處理過的畫面幾乎相同時直接產生 'done'，result_info['result_cache_hit'] 為 True
+    if img is None or img.size == 0:
+        raise ValueError("無法讀取圖片")
+    
+    profile = profile or mod218_profiles.DEFAULT_PROFILE
+    if USE_RESULT_CACHE:
+        timings = {'result_cache': 0.0}
+        timer = mod207_trace.StageTimer(timings)
+        # 不同設定檔的辨識結果、不同翻譯服務或目標語言的譯文可能不同，只使用三者都相同的結果
+        cache_tag = (profile, translate_provider(), TARGET_LANG)
+        cached = mod209_result_cache.get_cache().lookup(img, cache_tag)
+        timer.lap('result_cache', hit=cached is not None)
+        if cached is not None:
+            mod208_metrics.increment('result_cache_hits')
+            result_img, result_info = cached
+            result_img = result_img.copy()
+            if output_path:
+                save_image_async(result_img, output_path)
+            yield 'done', result_img, dict(result_info, timings=timings, result_cache_hit=True)
+            return
+        mod208_metrics.increment('result_cache_misses')
+    
+    timings = {'ocr': 0.0, 'grouping': 0.0, 'color': 0.0, 'fill': 0.0, 'translate': 0.0, 'render': 0.0}
+    timer = mod207_trace.StageTimer(timings)  # 同時記錄追蹤區間 (見 mod207_trace)
+    params = mod218_profiles.get_store().params(profile)
+    result, lines, line_info, lightdeck, source_lang = erase_text(img, timer, ocr_backend, params)
+    line_nums = list(line_info)
+    texts_to_translate = [line_info[line_num]['original_text'] for line_num in line_nums]
+
+    # 2. 準備文字繪製 (PIL 圖片直接存放 BGR 資料，不交換色版，繪製時顏色改為 BGR 順序)
+    pil_result = Image.fromarray(result)
+    draw = ImageDraw.Draw(pil_result) 
+    
+    # 共用的字體管理 (常駐模式下字體與字寬只會載入一次)
+    fonts = mod212_fonts.get_font_manager()
+
+    result_info = {
+        'lines': lines,
+        'line_info': line_info,
+        'lightdeck': lightdeck,
+        'dark_background': params['dark_background'],  # 設定檔的深底門檻 (預覽視窗的光暈顏色)
+        'source_lang': source_lang,
+        'profile': profile,
+        'timings': timings
+    }
+
+    # 塗銷完成即可先顯示，尚未翻譯的行以框線標示
+    pending = set(line_nums)
+    frame = render_pending(pil_result, lines, pending)
+    timer.lap('render')
+    yield 'erased', frame, result_info
+
+    # 3. 譯文陸續回傳時逐批繪製 (先查快取，只送出未命中的行)
+    print("\n偵測到的文字：")
+    print("-" * 50)
+    
+    failed_lines = set()
+    translate_iter = iter_translate_lines(texts_to_translate, TARGET_LANG, failed_lines, source_lang)
+    while True:
+        timer.restart()
+        updates = next(translate_iter, None)
+        timer.lap('translate', lines=len(updates) if updates else 0)
+        if updates is None:
+            break
+
+        for index, translated_text in sorted(updates.items()):
+            line_num = line_nums[index]
+            info = line_info[line_num]
+            info['translated_text'] = translated_text
+            print_line_info(line_num, info)
+            draw_translated_line(draw, fonts, line_num, lines[line_num], translated_text)
+            pending.discard(line_num)
+        if pending:
+            frame = render_pending(pil_result, lines, pending)
+            timer.lap('render')
+            yield 'translated', frame, result_info
+        else:
+            timer.lap('render')
+
+    # 將最終結果轉換回OpenCV格式 (已是 BGR)
+    timer.restart()
+    result_img = np.array(pil_result)
+    timer.lap('render')
+    mod208_metrics.observe_timings(timings)
+    # 有翻譯失敗的行時不保存，下次仍會重新翻譯
+    if USE_RESULT_CACHE and not failed_lines:
+        mod209_result_cache.get_cache().store(img, result_img, result_info, cache_tag)
+    if output_path:
+        save_image_async(result_img, output_path)
     
+    yield 'done', result_img, result_info
+
+def erase_text(img, timer, ocr_backend=None, params=None):
+    # OCR、分行、顏色分析與塗銷 (不含翻譯與繪製)，各階段耗時記錄到 timer
+    # params: 截圖設定檔的參數 (見 mod218_profiles)，None 為預設參數
+    # 回傳 (塗銷後的 BGR 陣列, lines, line_info, lightdeck, 原文語言)，line_info 依行編號排序，只包含有文字的行
+    # 原文語言為偵測到的語言名稱 (例如 '日文')，無法判斷時為 None
+    params = params or mod218_profiles.DEFAULT_PARAMS
     # 設定預設的lightdeck值
     lightdeck = 128  # 預設值設為中間值
     
-    # 轉換為PIL Image以使用Tesseract (只需轉換一次)
-    pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-    # 使用Tesseract獲取所有文字區域，修改配置以包含更多字符
-    data = pytesseract.image_to_data(pil_img, output_type=pytesseract.Output.DICT, lang='eng+chi_tra', config='--oem 3 --psm 6 -c tessedit_char_blacklist="●▲■□"')
+    data, source_lang, ocr_details = recognize_text(img, ocr_backend, params)
+    timer.lap('ocr', width=img.shape[1], height=img.shape[0], **ocr_details)
     # 創建遮罩 (只需一次)
     mask = np.zeros(img.shape[:2], dtype=np.uint8)
     # 標記所有文字區域並打印偵測到的文字
     print("\n---進行遍歷資訊---")
-    # 先收集所有文字和位置信息
-    lines = defaultdict(lambda: {"texts": [], "positions": [], "confs": [], "color": None})
-    
-    # 第一次遍歷：收集文字和位置信息
-    i = 0
-    while i < len(data['text']):
-        text = str(data['text'][i]).strip()
-        if text and int(data['conf'][i]) > 10:  # 只收集非空且信心度大於10的文字
-            # 檢查文字是否有效
-            is_valid_text = True
-            if data['width'][i] < 20:  # 寬度太小可能是 ICON
-                is_valid_text = False
-            # 檢查是否為單個英文字母或兩個以上的英文字母
-            if text.isascii():  # 如果是英文
-                if len(text) >= 2 and 'a' in text.lower():
-                    is_valid_text = True
-
-            if text and is_valid_text:
-                # 初始化當前行資訊
-                current_line = {
-                    'text': [text],
-                    'x': data['left'][i],
-                    'y': data['top'][i],
-                    'width': data['width'][i],
-                    'height': data['height'][i],
-                    'conf': [data['conf'][i]]
-                }
-
-                # 尋找同一行的其他文字
-                next_idx = i + 1
-                while next_idx < len(data['text']):
-                    if int(data['conf'][next_idx]) > 10:    # 只收集信心度大於10的文字
-                        next_text = data['text'][next_idx].strip()
-                        if next_text:
-                            # 計算間距
-                            vertical_diff = abs(data['top'][next_idx] - current_line['y'])
-                            horizontal_gap = data['left'][next_idx] - (current_line['x'] + current_line['width'])
-                            
-                            # 判斷是否屬於同一行
-                            VERTICAL_THRESHOLD = 1    # 垂直差異閾值
-                            HORIZONTAL_THRESHOLD = .8 # 水平間距閾值
-                            
-                            if (vertical_diff < current_line['height'] * VERTICAL_THRESHOLD and
-                                horizontal_gap < current_line['height'] * HORIZONTAL_THRESHOLD and
-                                horizontal_gap >= 0):  # 確保文字由左到右排列
-                                
-                                # 更新當前行資訊
-                                current_line['text'].append(next_text)
-                                current_line['width'] = (data['left'][next_idx] + data['width'][next_idx]) - current_line['x']
-                                current_line['height'] = max(current_line['height'], data['height'][next_idx])
-                                current_line['conf'].append(data['conf'][next_idx])
-                                next_idx += 1
-                                continue
-                    break
-
-                # 將當前行加入到 lines 中
-                line_num = len(lines)
-                lines[line_num]["texts"] = current_line['text']
-                lines[line_num]["positions"].append({
-                    'x': current_line['x'],
-                    'y': current_line['y'],
-                    'w': current_line['width'],
-                    'h': current_line['height']
-                })
-                lines[line_num]["confs"] = current_line['conf']
-                i = next_idx
-                continue
-        i += 1
+    # 依 tesseract 的行編號與文字框位置組成文字行 (見 mod211_layout)
+    lines = mod211_layout.group_lines(data, params)
+
+    timer.lap('grouping', words=len(data['text']))
 
     # 第二次遍歷：處理每一行文字
-    texts_to_translate = []  # 儲存所有需要翻譯的文字
     line_info = {}  # 儲存每行的相關資訊
 
-    for line_num in sorted(lines.keys()):
-        if lines[line_num]["texts"]:
-            positions = lines[line_num]["positions"]
-            current_x = min(pos['x'] for pos in positions)
-            current_y = min(pos['y'] for pos in positions)
-            total_width = max(pos['x'] + pos['w'] for pos in positions) - current_x
-            max_height = max(pos['h'] for pos in positions)
-            
-            # 取得文字區域
-            text_area = img[current_y:current_y+max_height, current_x:current_x+total_width]
-
-            # 將圖片轉換為灰度圖
-            img_gray = cv2.cvtColor(text_area, cv2.COLOR_BGR2GRAY)
-            
-            # 使用 OTSU 自適應二值化
-            _, binary = cv2.threshold(img_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # 獲取邊緣3像素的背景區域
-            h, w = binary.shape
-            edge_mask = np.zeros_like(binary)
-            edge_mask[0:3, :] = 1  # 上邊緣
-            edge_mask[h-3:h, :] = 1  # 下邊緣
-            edge_mask[:, 0:3] = 1  # 左邊緣
-            edge_mask[:, w-3:w] = 1  # 右邊緣
-            
-            # 計算背景區域的平均灰度
-            lightdeck = np.mean(img_gray[edge_mask == 1])
-            
-            # 根據背景灰度決定文字遮罩
-            if lightdeck < 145:
-                text_mask = (binary == 255)  # 深底淺字
-            else:
-                text_mask = (binary == 0)    # 淺底深字
-            
-            # 從原始圖片中獲取顏色
-            img_rgb = cv2.cvtColor(text_area, cv2.COLOR_BGR2RGB)
-            
-            # 使用遮罩只取得文字區域的顏色
-            if np.any(text_mask):
-                # 獲取文字區域的所有顏色像素
-                text_colors = img_rgb[text_mask]
-                
-                # 將RGB值組合成唯一的數字以找出最常見的顏色組合
-                text_colors = text_colors.astype(np.int32)  # 確保類型為 int32
-                color_codes = text_colors[:, 0] * 65536 + text_colors[:, 1] * 256 + text_colors[:, 2]
-                most_common_code = np.bincount(color_codes).argmax()
-                
-                # 將最常見的顏色代碼轉回RGB
-                r = most_common_code // 65536
-                g = (most_common_code % 65536) // 256
-                b = most_common_code % 256
-                text_color = (int(r), int(g), int(b))
-                
-                text_color = color_up(text_color, 1.6, 1.2, (20,200)) #增加飽和度(60%) 明暗(20%) 色階()
-                if lightdeck > 175: #lightdeck偏亮時 文字自動變深
-                    text_color = color_up(text_color, 0.7, 0.7, (160,255)) #增加飽和度(-30%) 明暗(-30%)色階()
-            else:
-                text_color = (0, 0, 0)  # 預設黑色
-            
-            # 儲存顏色信息
-            lines[line_num]["color"] = text_color
-            
-            # 儲存當前行的資訊
-            current_line = ' '.join(lines[line_num]["texts"])
-            texts_to_translate.append(current_line)
-            
-            line_info[line_num] = {
-                'original_text': current_line,
-                'confidence': sum(lines[line_num]['confs']) / len(lines[line_num]['confs']),
-                'lightdeck': lightdeck,
-                'text_color': text_color,
-                'positions': positions
-            }
-
-    # 一次性翻譯所有文字
-    SEPARATOR = "◆★◆"  # 使用更不常見的分隔符
-    combined_text = SEPARATOR.join(texts_to_translate)
-    translated_combined = translator(combined_text, "繁體中文")
-    translated_texts = [text.strip() for text in translated_combined.split(SEPARATOR)] if translated_combined else texts_to_translate
-
-    # 印出所有資訊
-    print("\n偵測到的文字：")
-    print("-" * 50)
-    
-    for line_num, translated_text in zip(sorted(line_info.keys()), translated_texts):
-        info = line_info[line_num]
-        print(f"原文({line_num}): {info['original_text']}")
-        print(f"翻譯({line_num}): {translated_text}")
-        print(f"信心度: {info['confidence']:.1f}%")
-        print(f"背景明暗度: {info['lightdeck']:.0f}")
-        print(f"文字顏色: {info['text_color']}")
-        for i, pos in enumerate(info['positions']):# 顯示文字區域位置
-            print(f"文字區域: x={pos['x']}, y={pos['y']}, 寬={pos['w']}, 高={pos['h']}")
-        print("-" * 50)
+    # 先計算每行的文字區域，再一次批次分析所有行的背景明暗與文字顏色
+    line_nums = [line_num for line_num in sorted(lines.keys()) if lines[line_num]["texts"]]
+    boxes = []
+    for line_num in line_nums:
+        positions = lines[line_num]["positions"]
+        current_x = min(pos['x'] for pos in positions)
+        current_y = min(pos['y'] for pos in positions)
+        total_width = max(pos['x'] + pos['w'] for pos in positions) - current_x
+        max_height = max(pos['h'] for pos in positions)
+        boxes.append((current_x, current_y, total_width, max_height))
+
+    lightdecks, text_colors = analyze_line_colors(img, boxes, params['dark_background'], params['bright_background'])
+
+    for line_num, lightdeck, text_color in zip(line_nums, lightdecks, text_colors):
+        # 儲存顏色信息
+        lines[line_num]["color"] = text_color
+        
+        # 儲存當前行的資訊
+        current_line = ' '.join(lines[line_num]["texts"])
+        
+        line_info[line_num] = {
+            'original_text': current_line,
+            'confidence': sum(lines[line_num]['confs']) / len(lines[line_num]['confs']),
+            'lightdeck': lightdeck,
+            'text_color': text_color,
+            'positions': lines[line_num]["positions"]
+        }
+
+    timer.lap('color', lines=len(line_nums))
 
     # **手動查看填充區域**
     #img[np.where(mask == 255)] = (0, 255, 0)  # 用綠色填補
@@ -206,149 +233,379 @@ def remove_text(image_path, output_path):
     # 使用遮罩直接填充背景色
     result = img.copy()
     
-    # 1. 批量處理所有文字區域
-    all_masks = np.zeros_like(img)
-    for line_num in sorted(lines.keys()):
-        if lines[line_num]["texts"]:
-            for pos in lines[line_num]["positions"]:
-                x = max(0, pos['x'] - 10)
-                y = max(0, pos['y'] - 10)
-                w = pos['w'] + 15
-                h = pos['h'] + 10
-                
-                # 創建當前區域的遮罩
-                current_mask = np.zeros_like(img[:,:,0])
-                current_mask[y:y+h, x:x+w] = 1
-                
-                # 獲取邊緣
-                kernel = np.ones((3,3), np.uint8)
-                edge_mask = cv2.dilate(current_mask, kernel) - current_mask
-                
-                # 獲取邊緣顏色的平均值
-                edge_color = cv2.mean(img, mask=edge_mask)[:3]
-                
-                # 填充區域
-                all_masks[y:y+h, x:x+w] = edge_color
-
-    # 2. 一次性應用所有遮罩
-    mask_bool = (all_masks != [0,0,0]).any(axis=2)
-    result[mask_bool] = all_masks[mask_bool]
-
-    # 3. 優化文字繪製
-    pil_result = Image.fromarray(cv2.cvtColor(result, cv2.COLOR_BGR2RGB)) 
-    draw = ImageDraw.Draw(pil_result) 
-    
-    # 預先載入字體
+    # 1. 以每個文字區域外圍的平均顏色填滿 (只處理文字區域附近，直接寫入 result)
+    fill_positions = [pos for line_num in sorted(lines.keys()) if lines[line_num]["texts"]
+                      for pos in lines[line_num]["positions"]]
+    fill_text_regions(img, result, fill_positions)
+    timer.lap('fill', regions=len(fill_positions))
+    return result, lines, line_info, lightdeck, source_lang
+
+def print_line_info(line_num, info):
+    # 印出一行的偵測與翻譯資訊
+    print(f"原文({line_num}): {info['original_text']}")
+    print(f"翻譯({line_num}): {info['translated_text']}")
+    print(f"信心度: {info['confidence']:.1f}%")
+    print(f"背景明暗度: {info['lightdeck']:.0f}")
+    print(f"文字顏色: {info['text_color']}")
+    for i, pos in enumerate(info['positions']):# 顯示文字區域位置
+        print(f"文字區域: x={pos['x']}, y={pos['y']}, 寬={pos['w']}, 高={pos['h']}")
+    print("-" * 50)
+
+def render_pending(pil_result, lines, pending):
+    # 複製目前的繪製結果 (BGR)，並框出尚未翻譯的行
+    frame = np.array(pil_result)
+    for line_num in pending:
+        for pos in lines[line_num]["positions"]:
+            cv2.rectangle(frame, (pos['x'], pos['y']), (pos['x'] + pos['w'], pos['y'] + pos['h']), (240, 240, 60), 1)
+    return frame
+
+def is_sentence(text):
+    # 判斷是否為句子的規則
+    # 1. 檢查是否以標點符號結尾
+    sentence_endings = ['。', '！', '？', '…', '.', '!', '?', '...']
+    if any(text.strip().endswith(end) for end in sentence_endings):
+        return True
+    # 2. 檢查字數是否大於特定長度（假設超過5個字可能是句子）
+    if len(text.strip()) > 5:
+        return True
+    # 3. 檢查是否包含動詞或完整語意（這裡用簡單的方法：檢查是否包含常見的動詞詞尾）
+    verb_endings = ['的', '了', '著', '過', '是', '有']
+    if any(ending in text for ending in verb_endings):
+        return True
+    return False
+
+def draw_translated_line(draw, fonts, line_num, line, translated_text):
+    # 在原文位置繪製一行譯文
+    positions = line["positions"]
+    if not positions:
+        return
+        
     try:
-        default_font = ImageFont.truetype("msjh.ttc", 100)  # 載入一個基礎大小
-    except:
-        try:
-            default_font = ImageFont.truetype("NotoSansCJK-Regular.ttc", 100)
-        except:
-            default_font = ImageFont.truetype("Arial.ttf", 100)
-
-    def is_sentence(text):
-        # 判斷是否為句子的規則
-        # 1. 檢查是否以標點符號結尾
-        sentence_endings = ['。', '！', '？', '…', '.', '!', '?', '...']
-        if any(text.strip().endswith(end) for end in sentence_endings):
-            return True
-        # 2. 檢查字數是否大於特定長度（假設超過5個字可能是句子）
-        if len(text.strip()) > 5:
-            return True
-        # 3. 檢查是否包含動詞或完整語意（這裡用簡單的方法：檢查是否包含常見的動詞詞尾）
-        verb_endings = ['的', '了', '著', '過', '是', '有']
-        if any(ending in text for ending in verb_endings):
-            return True
-        return False
-
-    # 直接處理每一行文字
-    for line_num in sorted(lines.keys()):
-        if not lines[line_num]["texts"] or line_num >= len(translated_texts):
-            continue
-            
-        positions = lines[line_num]["positions"]
-        if not positions:
-            continue
-            
+        # 獲取原始文字的位置信息
+        x = positions[0]['x']
+        y = positions[0]['y']
+        total_width = sum(pos['w'] for pos in positions)
+        max_height = max(pos['h'] for pos in positions)
+        
+        # 計算適當的字體大小
+        original_text = ' '.join(line["texts"])
+        base_font_size = max(6,max_height*1.2)  # 使用原文高度作為基準調整(1.2)
+        
+        # 調整字體大小以適應原文寬度 (字寬取自快取，不需每次量測整行文字)
+        font = fonts.variant(base_font_size)
+        text_width = font.text_width(translated_text)
+        
+        # 如果翻譯後的文字寬度超過原文寬度，縮小到原文寬度內 (留一點邊距，最小為6)
+        if text_width > total_width*1.15:
+            font = fonts.fit(translated_text, base_font_size, total_width * 0.95)
+        
+        # 計算文字的實際寬度和高度
+        text_width, text_height = font.text_size(translated_text)
+        text_width = int(text_width)
+        
+        # 判斷是否為句子
+        is_sentence_text = is_sentence(original_text) or is_sentence(translated_text)
+        
+        # 根據是否為句子決定文字位置
+        if is_sentence_text:
+            # 句子靠左對齊，只需要考慮垂直置中
+            text_x = x
+            text_y = y + (max_height - text_height) // 2
+        else:
+            # 非句子水平垂直都置中
+            text_x = x + (total_width - text_width) // 2
+            text_y = y + (max_height - text_height) // 2
+        
+        # 繪製文字
+        draw.text((text_x, text_y-5), translated_text, font=font.font, fill=line["color"][::-1])  # 文字顏色為 RGB，圖片為 BGR
+        
+    except Exception as e:
+        print(f"警告：處理行 {line_num} 時出現錯誤: {str(e)}")
+
+def draw_translations(result, lines, translations):
+    # 在塗銷後的 BGR 圖片上一次繪製所有譯文 {行編號: 譯文}，回傳新的 BGR 陣列 (批次處理用)
+    pil_result = Image.fromarray(result)
+    draw = ImageDraw.Draw(pil_result)
+    fonts = mod212_fonts.get_font_manager()
+    for line_num, translated_text in translations.items():
+        draw_translated_line(draw, fonts, line_num, lines[line_num], translated_text)
+    return np.array(pil_result)
+
+def translate_lines(texts, target_lang):
+    # 逐行查詢翻譯快取，未命中的行分批並行送出，回傳與 texts 等長的譯文
+    translated_texts = list(texts)
+    for updates in iter_translate_lines(texts, target_lang):
+        for index, translated_text in updates.items():
+            translated_texts[index] = translated_text
+    return translated_texts
+
+def translate_provider():
+    # 目前的翻譯服務名稱 (翻譯快取與結果快取以此區分)
+    return TRANSLATE_PROVIDER or mod219_translate_providers.current_name()
+
+def iter_translate_lines(texts, target_lang, failed=None, source_lang=None):
+    # 逐步產生 {行索引: 譯文}：先是快取命中的行，之後依批次完成的順序產生
+    # 每行只會產生一次，翻譯失敗的行保留原文 (有指定 failed 集合時一併加入其中)
+    # source_lang: 偵測到的原文語言 (見 mod217_script_detect)，與原文一起傳給翻譯器
+    cache = None
+    cached = {}
+    provider = translate_provider()
+    if USE_TRANSLATE_CACHE:
         try:
-            # 獲取原始文字的位置信息
-            x = positions[0]['x']
-            y = positions[0]['y']
-            total_width = sum(pos['w'] for pos in positions)
-            max_height = max(pos['h'] for pos in positions)
-            
-            # 計算適當的字體大小
-            translated_text = translated_texts[line_num]
-            original_text = ' '.join(lines[line_num]["texts"])
-            base_font_size = max(6,max_height*1.2)  # 使用原文高度作為基準調整(1.2)
-            
-            # 調整字體大小以適應原文寬度
-            font = default_font.font_variant(size=base_font_size)
-            bbox = draw.textbbox((0, 0), translated_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            
-            # 如果翻譯後的文字寬度超過原文寬度，進行縮放
-            if text_width > total_width*1.15:
-                scale_factor = total_width / text_width * 0.95  # 留一點邊距
-                base_font_size = max(6,int(base_font_size * scale_factor)) #最小為6
-                font = default_font.font_variant(size=base_font_size)
-                bbox = draw.textbbox((0, 0), translated_text, font=font)
-            
-            # 計算文字的實際寬度和高度
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # 判斷是否為句子
-            is_sentence_text = is_sentence(original_text) or is_sentence(translated_text)
-            
-            # 根據是否為句子決定文字位置
-            if is_sentence_text:
-                # 句子靠左對齊，只需要考慮垂直置中
-                text_x = x
-                text_y = y + (max_height - text_height) // 2
+            cache = mod202_translate_cache.get_cache()
+            with mod207_trace.span('cache_lookup', lines=len(texts)):
+                cached = cache.get_many(texts, target_lang, provider)
+        except sqlite3.Error as e:
+            print(f"讀取翻譯快取時出錯: {e}")
+            cache = None
+
+    # 以正規化後的文字分組，相同內容只翻譯一次
+    normalize = mod202_translate_cache.normalize_text
+    cached = {normalize(text): value for text, value in cached.items()}
+    indices_by_key = defaultdict(list)
+    for index, text in enumerate(texts):
+        indices_by_key[normalize(text)].append(index)
+
+    hits = {index: cached[key] for key, indices in indices_by_key.items() if key in cached for index in indices}
+    if cache is not None:
+        mod208_metrics.increment('cache_hits', len(hits))
+        mod208_metrics.increment('cache_misses', len(texts) - len(hits))
+    if hits:
+        yield hits
+
+    # 未命中的原文 (去除重複並保留順序)
+    misses = [texts[indices[0]] for key, indices in indices_by_key.items() if key not in cached]
+    if not misses:
+        return
+
+    batches = mod206_translate_dispatch.iter_translate_batches(misses, target_lang, translator, source_lang=source_lang)
+    for miss_indices, parts in batches:
+        updates = {}
+        new_translations = {}
+        for miss_index, part in zip(miss_indices, parts):
+            text = misses[miss_index]
+            if part is not None:
+                new_translations[text] = part
             else:
-                # 非句子水平垂直都置中
-                text_x = x + (total_width - text_width) // 2
-                text_y = y + (max_height - text_height) // 2
-            
-            # 繪製文字
-            draw.text((text_x, text_y-5), translated_text, font=font, fill=lines[line_num]["color"])
-            
-        except Exception as e:
-            print(f"警告：處理行 {line_num} 時出現錯誤: {str(e)}")
+                mod208_metrics.increment('translate_failures')
+            for index in indices_by_key[normalize(text)]:
+                updates[index] = part if part is not None else texts[index]
+                if part is None and failed is not None:
+                    failed.add(index)
+        if cache is not None and new_translations:
+            try:
+                cache.put_many(new_translations, target_lang, provider)
+            except sqlite3.Error as e:
+                print(f"寫入翻譯快取時出錯: {e}")
+        yield updates
+
+def fill_text_regions(img, result, positions):
+    # 以文字區域外圍 1 像素的平均顏色填滿該區域 (擴大 10 像素邊距)
+    # 外圍顏色只取區域四邊的切片計算，成本與文字區域大小成正比，與整張圖大小無關
+    height, width = img.shape[:2]
+    for pos in positions:
+        x = max(0, pos['x'] - 10)
+        y = max(0, pos['y'] - 10)
+        x_end = min(width, x + pos['w'] + 15)
+        y_end = min(height, y + pos['h'] + 10)
+        if x >= x_end or y >= y_end:
             continue
 
-    # 將最終結果轉換回OpenCV格式並保存
-    result_img = cv2.cvtColor(np.array(pil_result), cv2.COLOR_RGB2BGR)
-    cv2.imwrite(output_path, result_img)
-    # 在函數末尾修改返回值
-    result_info = {
-        'lines': lines,
-        'lightdeck': lightdeck
-    }
-    
-    return result_info
+        # 外圍一圈 (含四個角，超出圖片的部分略過)
+        left = max(0, x - 1)
+        right = min(width, x_end + 1)
+        edges = []
+        if y > 0:
+            edges.append(img[y - 1, left:right])  # 上邊緣
+        if y_end < height:
+            edges.append(img[y_end, left:right])  # 下邊緣
+        if x > 0:
+            edges.append(img[y:y_end, x - 1])  # 左邊緣
+        if x_end < width:
+            edges.append(img[y:y_end, x_end])  # 右邊緣
+
+        count = sum(len(edge) for edge in edges)
+        if count == 0:
+            continue
+        edge_color = sum(edge.sum(axis=0, dtype=np.float64) for edge in edges) / count
+
+        # 填充區域
+        result[y:y_end, x:x_end] = edge_color.astype(np.uint8)
+
+# 文字顏色統計時每個色版保留的位元數 (3 位元 = 每行 512 個顏色區間)
+COLOR_QUANT_BITS = 3
+
+def recognize_text(img, ocr_backend=None, params=None):
+    # OCR (文字區域偵測、縮放與語言選擇)，回傳 (tesseract 格式的 data, 原文語言, 追蹤用的資訊)
+    params = params or mod218_profiles.DEFAULT_PARAMS
+    # 使用Tesseract獲取所有文字區域，修改配置以包含更多字符
+    ocr_kwargs = {'lang': 'eng+chi_tra', 'psm': params['psm'], 'oem': params['oem'], 'blacklist': params['blacklist'],
+                  'backend': ocr_backend}
+    # 先找出可能含有文字的區域，圖片、圖示等區域不送進 OCR，並依文字大小決定 OCR 前的縮放倍率
+    use_detection = USE_TEXT_DETECTION and params['text_detection']
+    use_scaling = USE_SCALE_NORMALIZATION and params['scale_normalization']
+    boxes = mod210_text_regions.text_boxes(img) if use_detection or use_scaling else []
+    regions = mod210_text_regions.detect_text_regions(img, boxes) if use_detection else None
+    scale = mod210_text_regions.ocr_scale(img, boxes, params['target_text_height']) if use_scaling else 1.0
+    # 只有單一文字系統時只載入需要的語言 (例如純英文介面只用 eng)
+    source_lang = None
+    if USE_SCRIPT_DETECTION:
+        ocr_kwargs['lang'], source_lang = mod217_script_detect.detect_languages(img, regions, scale, ocr_backend)
+    ocr_image = mod216_tiled_ocr.image_to_data if USE_TILED_OCR else mod210_text_regions.image_to_data_scaled
+    if regions is not None:
+        data = mod210_text_regions.image_to_data_regions(img, regions, scale, ocr=ocr_image, **ocr_kwargs)
+    else:
+        data = ocr_image(img, scale, **ocr_kwargs)
+    return data, source_lang, {'regions': len(regions) if regions else 0, 'scale': scale, 'lang': ocr_kwargs['lang']}
+
+def analyze_line_colors(img, boxes, dark_background=145, bright_background=175):
+    # 批次分析每行文字區域 (x, y, w, h) 的背景明暗度與主要文字顏色
+    # 背景灰度低於 dark_background 時為深底淺字，高於 bright_background 時文字顏色調深
+    # 回傳 (lightdecks, text_colors)，順序與 boxes 相同
+    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)  # 整張圖只轉換一次
+    lightdecks = []
+    pixel_chunks = []
+    id_chunks = []
+
+    for idx, (x, y, w, h) in enumerate(boxes):
+        roi_gray = img_gray[y:y+h, x:x+w]
+
+        # 使用 OTSU 自適應二值化
+        _, binary = cv2.threshold(roi_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        # 獲取邊緣3像素的背景區域
+        h, w = binary.shape
+        edge_mask = np.zeros(binary.shape, dtype=bool)
+        edge_mask[0:3, :] = True  # 上邊緣
+        edge_mask[h-3:h, :] = True  # 下邊緣
+        edge_mask[:, 0:3] = True  # 左邊緣
+        edge_mask[:, w-3:w] = True  # 右邊緣
+
+        # 計算背景區域的平均灰度
+        lightdeck = np.mean(roi_gray[edge_mask])
+        lightdecks.append(lightdeck)
+
+        # 根據背景灰度決定文字遮罩 (深底淺字 / 淺底深字)
+        text_mask = (binary == 255) if lightdeck < dark_background else (binary == 0)
+
+        # 收集文字像素 (BGR)，之後所有行一起統計
+        pixels = img[y:y+h, x:x+w][text_mask]
+        pixel_chunks.append(pixels)
+        id_chunks.append(np.full(len(pixels), idx, dtype=np.int64))
+
+    if not boxes:
+        return lightdecks, []
+
+    pixels = np.concatenate(pixel_chunks)
+    line_ids = np.concatenate(id_chunks)
+    colors, has_text = dominant_colors(pixels[:, ::-1], line_ids, len(boxes))
+
+    # 批次調整顏色：增加飽和度(60%) 明暗(20%) 色階()
+    colors = color_up_batch(colors, 1.6, 1.2, (20, 200))
+    # lightdeck偏亮時 文字自動變深：增加飽和度(-30%) 明暗(-30%) 色階()
+    bright = np.array(lightdecks) > bright_background
+    if bright.any():
+        colors[bright] = color_up_batch(colors[bright], 0.7, 0.7, (160, 255))
+    colors[~has_text] = 0  # 沒有文字像素時預設黑色
+
+    text_colors = [tuple(int(c) for c in color) for color in colors]
+    return lightdecks, text_colors
+
+def dominant_colors(pixels, line_ids, n_lines):
+    # pixels: (N, 3) RGB 像素，line_ids: 每個像素所屬的行
+    # 先用量化後的小直方圖篩選候選顏色區間，再只對候選像素統計實際顏色
+    # 避免對每行建立 16M 個區間的 bincount，結果與逐色統計的眾數相同
+    colors = np.zeros((n_lines, 3), dtype=np.int64)
+    has_text = np.zeros(n_lines, dtype=bool)
+    if len(pixels) == 0:
+        return colors, has_text
+
+    rgb = pixels.astype(np.int64)
+    shift = 8 - COLOR_QUANT_BITS
+    n_bins = 1 << (3 * COLOR_QUANT_BITS)
+    quantized = (((rgb[:, 0] >> shift) << (2 * COLOR_QUANT_BITS)) |
+                 ((rgb[:, 1] >> shift) << COLOR_QUANT_BITS) |
+                 (rgb[:, 2] >> shift))
+    hist = np.bincount(line_ids * n_bins + quantized, minlength=n_lines * n_bins).reshape(n_lines, n_bins)
+    best_bin = hist.argmax(axis=1)
+
+    # 第一輪：最多像素的區間內，出現最多次的實際顏色次數，即為各行眾數次數的下限
+    in_best = quantized == best_bin[line_ids]
+    _, best_lines, best_counts = _mode_per_line(rgb[in_best], line_ids[in_best])
+    min_count = np.zeros(n_lines, dtype=np.int64)
+    min_count[best_lines] = best_counts
+
+    # 第二輪：區間總數低於下限的區間不可能包含眾數，只統計剩下的候選區間 (結果與逐色統計相同)
+    candidate = hist[line_ids, quantized] >= min_count[line_ids]
+    best_codes, best_lines, _ = _mode_per_line(rgb[candidate], line_ids[candidate])
+
+    colors[best_lines, 0] = (best_codes >> 16) & 255
+    colors[best_lines, 1] = (best_codes >> 8) & 255
+    colors[best_lines, 2] = best_codes & 255
+    has_text[best_lines] = True
+    return colors, has_text
+
+def _mode_per_line(rgb, line_ids):
+    # 以 (行, RGB) 組合成唯一代碼統計，回傳每行出現最多次的顏色代碼、行號與次數 (同次數取代碼較小者)
+    codes = (line_ids << 24) | (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    unique_codes, counts = np.unique(codes, return_counts=True)
+    code_lines = unique_codes >> 24
+
+    # 依 (行, 次數由多到少, 代碼由小到大) 排序後取每行第一個
+    order = np.lexsort((unique_codes, -counts, code_lines))
+    sorted_lines = code_lines[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_lines[1:] != sorted_lines[:-1]
+    return unique_codes[order][first] & 0xFFFFFF, sorted_lines[first], counts[order][first]
+
+def color_up_batch(colors, RGB=1.0, light=1.0, levels=(0, 255)):
+    # color_up 的向量化版本，colors: (N, 3) RGB 陣列
+    rgb = np.asarray(colors, dtype=np.float64).reshape(-1, 3) / 255.0
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2] * .85
+
+    # RGB -> HSV (與 colorsys.rgb_to_hsv 相同)
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    v = maxc
+    delta = maxc - minc
+    gray = delta == 0
+    safe_delta = np.where(gray, 1.0, delta)
+    s = np.where(gray, 0.0, delta / np.where(maxc == 0, 1.0, maxc))
+    rc = (maxc - r) / safe_delta
+    gc = (maxc - g) / safe_delta
+    bc = (maxc - b) / safe_delta
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
 
-def color_up(rgb_color, RGB=1.0, light=1.0, levels=(0, 255)):
-    # 確保輸入的 rgb_color 是列表或元組
-    rgb_color = tuple(map(int, rgb_color))  # 將所有值轉換為整數
-    
-    # 轉換為 HSV 以調整飽和度
-    r, g, b = np.array(rgb_color) / 255.0
-    h, s, v = colorsys.rgb_to_hsv(r, g, b*.85)
     # 調整飽和度與明亮度
-    s = np.clip(s * RGB, 0, 1) 
-    v = np.clip(v * light, 0, 1) 
-    # 轉回 RGB
-    r, g, b = colorsys.hsv_to_rgb(h, s, v)
-    # 轉換為 0~255 整數
-    color_array = np.array([r, g, b]) * 255
-    # 色階調整
+    s = np.clip(s * RGB, 0, 1)
+    v = np.clip(v * light, 0, 1)
+
+    # HSV -> RGB (與 colorsys.hsv_to_rgb 相同)
+    i = (h * 6.0).astype(np.int64)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    gray = s == 0
+    r = np.where(gray, v, r)
+    g = np.where(gray, v, g)
+    b = np.where(gray, v, b)
+
+    # 轉換為 0~255 並做色階調整
+    color_array = np.stack([r, g, b], axis=1) * 255
     black_point, white_point = levels
     new_color = 255 * (color_array - black_point) / (white_point - black_point)
-    new_color = np.clip(new_color, 0, 255).astype(int)   
-    return tuple(new_color)
+    return np.clip(new_color, 0, 255).astype(int)
+
+def color_up(rgb_color, RGB=1.0, light=1.0, levels=(0, 255)):
+    # 單一顏色的版本
+    rgb_color = tuple(map(int, rgb_color))  # 將所有值轉換為整數
+    return tuple(color_up_batch([rgb_color], RGB, light, levels)[0])
 
 if __name__ == "__main__":
     input_path = "exp04.png"  # 請替換為你的輸入圖片路徑
@@ -0,0 +1,262 @@
+import contextlib
+import os
+import threading
+import time
+import pytesseract
+import mod207_trace
+import mod220_backend_registry
+
+# tesserocr 直接呼叫 tesseract 的 C++ API，可以讓引擎常駐在程序中 (選用套件)
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+# tessdata 位置 (與 tesseract.exe 同一個安裝目錄)，找不到時使用 tesserocr 的預設值
+TESSDATA_PATH = os.path.join(os.path.dirname(pytesseract.pytesseract.tesseract_cmd), 'tessdata')
+
+# 每個程序最多保留的 tesserocr 引擎數 (所有語言合計；分塊並行辨識時每個執行緒一個，每個引擎約佔 100MB 以上記憶體)
+MAX_ENGINES = os.cpu_count() or 1
+ENGINE_IDLE_SECONDS = 120  # 閒置超過此時間的引擎釋放 (最近使用的一個引擎保留，常駐程序截圖時不必重新載入)
+
+# 預設的 OCR 後端名稱，None 表示自動選擇 (有 tesserocr 時優先使用)
+OCR_BACKEND = os.environ.get("TRANSLATE_OCR_BACKEND") or None
+
+# image_to_data 回傳的欄位 (與 pytesseract.Output.DICT 相同)
+DATA_KEYS = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+             'left', 'top', 'width', 'height', 'conf', 'text']
+
+
+class PytesseractBackend:
+    """每次呼叫都啟動 tesseract.exe 的後端 (原本的作法，作為備援)"""
+    name = "pytesseract"
+
+    def __init__(self):
+        self._languages = None
+
+    def image_to_data(self, pil_img, lang, psm, oem, blacklist):
+        config = f'--oem {oem} --psm {psm}'
+        if blacklist:
+            config += f' -c tessedit_char_blacklist="{blacklist}"'
+        return pytesseract.image_to_data(pil_img, output_type=pytesseract.Output.DICT, lang=lang, config=config)
+
+    def warm_up(self, lang, oem=3):
+        pass
+
+    def detect_script(self, pil_img):
+        try:
+            osd = pytesseract.image_to_osd(pil_img, config='--psm 0', output_type=pytesseract.Output.DICT)
+        except pytesseract.TesseractError:
+            return None  # 文字太少或沒有 osd.traineddata 時無法判斷
+        return osd['script'], float(osd['script_conf'])
+
+    def available_languages(self):
+        if self._languages is None:
+            try:
+                self._languages = set(pytesseract.get_languages(config=''))
+            except (pytesseract.TesseractError, OSError):
+                return None
+        return self._languages
+
+
+class TesserocrBackend:
+    """在程序內保留 tesseract 引擎的後端，引擎建立後重複使用 (不必每次載入 traineddata)"""
+    name = "tesserocr"
+
+    def __init__(self):
+        if tesserocr is None:
+            raise RuntimeError("未安裝 tesserocr")
+        self._idle = {}  # (語言, oem) -> [(閒置的引擎, 歸還的時間)]
+        self._total = 0  # 已建立的引擎數 (所有語言合計)
+        self._condition = threading.Condition()
+        self._languages = None
+
+    def _create_api(self, lang, oem):
+        kwargs = {'lang': lang, 'oem': oem}
+        if os.path.isdir(TESSDATA_PATH):
+            kwargs['path'] = TESSDATA_PATH
+        return tesserocr.PyTessBaseAPI(**kwargs)
+
+    def _release(self, entries):
+        # 釋放閒置的引擎 (呼叫時須持有 _condition)
+        for key, entry in entries:
+            self._idle[key].remove(entry)
+            entry[0].End()
+            self._total -= 1
+
+    def _idle_entries(self):
+        # 所有閒置的引擎 [(key, (引擎, 歸還的時間))]，最久未使用的在前
+        entries = [(key, entry) for key, idle in self._idle.items() for entry in idle]
+        entries.sort(key=lambda item: item[1][1])
+        return entries
+
+    def release_idle(self, max_idle=ENGINE_IDLE_SECONDS):
+        """釋放閒置超過 max_idle 秒的引擎 (最近使用的一個除外)"""
+        cutoff = time.monotonic() - max_idle
+        with self._condition:
+            entries = self._idle_entries()[:-1]
+            self._release([item for item in entries if item[1][1] < cutoff])
+
+    def loaded_engines(self):
+        with self._condition:
+            return self._total
+
+    @contextlib.contextmanager
+    def engine(self, lang, oem):
+        # 借用一個 (語言, oem) 的引擎，tesseract 引擎本身不是執行緒安全，同一時間只給一個執行緒使用
+        # 沒有閒置的引擎時建立新的，所有語言合計已達 MAX_ENGINES 個時釋放其他語言最久未使用的閒置引擎，
+        # 都在使用中則等待歸還
+        self.release_idle()
+        key = (lang, oem)
+        api = None
+        with self._condition:
+            while True:
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    api, _ = idle.pop()
+                    break
+                if self._total >= MAX_ENGINES:
+                    self._release(self._idle_entries()[:1])
+                if self._total < MAX_ENGINES:
+                    self._total += 1
+                    break
+                self._condition.wait()
+        if api is None:
+            try:
+                api = self._create_api(lang, oem)
+            except BaseException:
+                with self._condition:
+                    self._total -= 1
+                    self._condition.notify()
+                raise
+        try:
+            yield api
+        finally:
+            with self._condition:
+                self._idle[key].append((api, time.monotonic()))
+                self._condition.notify()
+
+    def warm_up(self, lang, oem=3):
+        with self.engine(lang, oem):
+            pass
+
+    def detect_script(self, pil_img):
+        # 文字系統偵測需要 osd.traineddata (舊版引擎)
+        try:
+            with self.engine('osd', 0) as api:
+                api.SetPageSegMode(tesserocr.PSM.OSD_ONLY)
+                api.SetImage(pil_img)
+                osd = api.DetectOrientationScript()
+        except RuntimeError:
+            return None
+        if not osd:
+            return None
+        return osd['script_name'], float(osd['script_conf'])
+
+    def available_languages(self):
+        if self._languages is None:
+            path = TESSDATA_PATH if os.path.isdir(TESSDATA_PATH) else None
+            self._languages = set(tesserocr.get_languages(path)[1])
+        return self._languages
+
+    def image_to_data(self, pil_img, lang, psm, oem, blacklist):
+        with self.engine(lang, oem) as api:
+            api.SetPageSegMode(psm)
+            api.SetVariable("tessedit_char_blacklist", blacklist or "")
+            api.SetImage(pil_img)
+            api.Recognize()
+            return self._collect_data(api, pil_img.size)
+
+    def _collect_data(self, api, size):
+        # 依照 pytesseract 的格式輸出：page / block / par / line 的結構列 (conf = -1)，接著是文字列
+        data = {key: [] for key in DATA_KEYS}
+        nums = {'block_num': 0, 'par_num': 0, 'line_num': 0, 'word_num': 0}
+
+        def add_row(level, box, conf, text):
+            data['level'].append(level)
+            data['page_num'].append(1)
+            for key in ('block_num', 'par_num', 'line_num', 'word_num'):
+                data[key].append(nums[key])
+            x1, y1, x2, y2 = box
+            data['left'].append(x1)
+            data['top'].append(y1)
+            data['width'].append(x2 - x1)
+            data['height'].append(y2 - y1)
+            data['conf'].append(conf)
+            data['text'].append(text)
+
+        add_row(1, (0, 0, size[0], size[1]), -1, '')
+
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        RIL = tesserocr.RIL
+        for word in tesserocr.iterate_level(iterator, RIL.WORD):
+            if word.IsAtBeginningOf(RIL.BLOCK):
+                nums['block_num'] += 1
+                nums['par_num'] = nums['line_num'] = nums['word_num'] = 0
+                add_row(2, word.BoundingBox(RIL.BLOCK), -1, '')
+            if word.IsAtBeginningOf(RIL.PARA):
+                nums['par_num'] += 1
+                nums['line_num'] = nums['word_num'] = 0
+                add_row(3, word.BoundingBox(RIL.PARA), -1, '')
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                nums['line_num'] += 1
+                nums['word_num'] = 0
+                add_row(4, word.BoundingBox(RIL.TEXTLINE), -1, '')
+            box = word.BoundingBox(RIL.WORD)
+            if box is None:
+                continue
+            nums['word_num'] += 1
+            add_row(5, box, word.Confidence(RIL.WORD), word.GetUTF8Text(RIL.WORD) or '')
+        return data
+
+
+# 可用的後端 (名稱 -> 類別)，新的後端可透過 register_backend 加入
+BACKENDS = {
+    "tesserocr": TesserocrBackend,
+    "pytesseract": PytesseractBackend,
+}
+# tesserocr 優先，無法使用時改用 pytesseract
+_registry = mod220_backend_registry.BackendRegistry("OCR 後端", BACKENDS, ["tesserocr", "pytesseract"])
+
+def register_backend(name, backend_class):
+    _registry.register(name, backend_class)
+
+def get_backend(name=None):
+    # 取得 (並快取) OCR 後端，未指定時自動選擇
+    return _registry.get(name or OCR_BACKEND)
+
+def _run(backend, method, *args):
+    # 自動選擇的後端初始化失敗 (例如找不到 traineddata) 時，改用下一個後端
+    def call(selected):
+        with mod207_trace.span(f'{selected.name}.{method}'):
+            return getattr(selected, method)(*args)
+    return _registry.run(backend or OCR_BACKEND, call)
+
+def image_to_data(pil_img, lang='eng+chi_tra', psm=6, oem=3, blacklist="●▲■□", backend=None):
+    # 回傳格式與 pytesseract.image_to_data(..., output_type=Output.DICT) 相同
+    return _run(backend, 'image_to_data', pil_img, lang, psm, oem, blacklist)
+
+def detect_script(pil_img, backend=None):
+    # 以 tesseract OSD 判斷主要的文字系統，回傳 (名稱, 信心度)，例如 ('Latin', 5.2)
+    # 無法判斷 (文字太少、後端不支援) 時回傳 None
+    if not hasattr(get_backend(backend), 'detect_script'):
+        return None
+    return _run(backend, 'detect_script', pil_img)
+
+def available_languages(backend=None):
+    # 已安裝的 traineddata 名稱，無法取得時回傳 None
+    if not hasattr(get_backend(backend), 'available_languages'):
+        return None
+    return _run(backend, 'available_languages')
+
+def loaded_engines():
+    # 目前程序中已載入的引擎數 (所有後端合計，每次呼叫都啟動 tesseract.exe 的後端不計)
+    return sum(backend.loaded_engines() for backend in _registry.loaded() if hasattr(backend, 'loaded_engines'))
+
+def warm_up(lang='eng+chi_tra', oem=3, backend=None):
+    # 預先初始化引擎 (載入 traineddata)
+    _run(backend, 'warm_up', lang, oem)
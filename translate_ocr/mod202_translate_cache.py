@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# 快取檔案位置與預設容量
+CACHE_FILE = os.path.join(os.path.dirname(__file__), "files", "cache", "translate_cache.db")
+MAX_ENTRIES = 20000
+
+def normalize_text(text):
+    # 全形/半形統一並合併多餘空白，讓 OCR 細微差異的同一句話對應到同一筆快取
+    text = unicodedata.normalize("NFKC", str(text))
+    return " ".join(text.split())
+
+
+class TranslationCache:
+    """以 SQLite 儲存的翻譯快取 (原文, 目標語言, 翻譯服務) -> 譯文，超過容量時移除最久未使用的項目"""
+
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    source TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (source, target, provider)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON translations (last_used)")
+
+    def get_many(self, texts, target, provider):
+        """查詢多行原文，回傳 {原文: 譯文} (只包含命中的項目)"""
+        found = {}
+        now = time.time()
+        with self.lock:
+            for text in texts:
+                key = normalize_text(text)
+                row = self.conn.execute(
+                    "SELECT translation FROM translations WHERE source = ? AND target = ? AND provider = ?",
+                    (key, target, provider)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                found[text] = row[0]
+                # 更新使用時間 (LRU)
+                self.conn.execute(
+                    "UPDATE translations SET last_used = ? WHERE source = ? AND target = ? AND provider = ?",
+                    (now, key, target, provider))
+            self.conn.commit()
+        return found
+
+    def put_many(self, translations, target, provider):
+        """寫入 {原文: 譯文}，並在超過容量時淘汰最久未使用的項目"""
+        now = time.time()
+        rows = [(normalize_text(text), target, provider, translated, now)
+                for text, translated in translations.items() if normalize_text(text)]
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO translations (source, target, provider, translation, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)", rows)
+                self._evict()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM translations WHERE rowid IN "
+                "(SELECT rowid FROM translations ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,))
+
+    def stats(self):
+        """回傳命中次數、未命中次數、命中率與目前筆數"""
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries
+        }
+
+    def clear(self):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM translations")
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    # 整個程序共用一個快取連線
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranslationCache()
+        return _cache
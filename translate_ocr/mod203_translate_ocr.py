@@ -1,13 +1,146 @@
 import mod200_translate
+import mod207_trace
+import mod208_metrics
+import mod213_capture
+import mod214_qt_image
+import mod218_profiles
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QMainWindow, QVBoxLayout, QGraphicsDropShadowEffect
-from PyQt5.QtCore import Qt, QPoint, QRect
-from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QCursor, QPixmap
+from PyQt5.QtCore import Qt, QPoint, QRect, QThread, QTimer, QObject, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QCursor
 import sys
+import cv2
+import numpy as np
+
+# 常駐模式 (由 mod205_translate_worker 設定)，關閉視窗時不結束整個程式
+RESIDENT = False
+
+# 是否另外在背景儲存截圖與翻譯結果 (除錯用)
+SAVE_SCREENSHOT = False
+
+# 監看模式：每隔 WATCH_INTERVAL_MS 取樣一次選取區域，畫面確實改變時才重新翻譯
+WATCH_INTERVAL_MS = 500
+WATCH_THUMB_WIDTH = 160  # 比對用縮圖的寬度
+WATCH_PIXEL_DELTA = 24  # 灰階差超過此值的像素視為改變
+WATCH_CHANGED_RATIO = 0.002  # 改變的像素超過此比例才視為內容改變
+
+def quit_app():
+    # 單次執行時直接結束程式，常駐模式下保留程序等待下一次截圖
+    if not RESIDENT:
+        QApplication.quit()
+
+def watch_thumbnail(img):
+    # 縮小的灰階圖，用於快速比對畫面是否改變
+    height, width = img.shape[:2]
+    thumb_width = min(width, WATCH_THUMB_WIDTH)
+    thumb_height = max(1, round(height * thumb_width / width))
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+
+def thumbnail_changed(a, b):
+    if a.shape != b.shape:
+        return True
+    changed = np.count_nonzero(cv2.absdiff(a, b) > WATCH_PIXEL_DELTA)
+    return changed > max(1, a.size * WATCH_CHANGED_RATIO)
+
+def array_to_pixmap(img):
+    # BGR numpy 陣列 -> QPixmap (不交換色版，只在建立 QPixmap 時複製一次)
+    return mod214_qt_image.bgr_to_pixmap(img)
+
+
+class TranslateThread(QThread):
+    """在背景執行 remove_text_stream，每完成一個階段就發出結果"""
+    stage_ready = pyqtSignal(str, object, object)  # (階段, BGR 陣列, result_info)
+    failed = pyqtSignal(str)
+
+    def __init__(self, image, output_path=None, profile=None):
+        super().__init__()
+        self.image = image
+        self.output_path = output_path
+        self.profile = profile
+
+    def run(self):
+        try:
+            for stage, result_img, result_info in mod200_translate.remove_text_stream(
+                    self.image, self.output_path, profile=self.profile):
+                self.stage_ready.emit(stage, result_img, result_info)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class RegionWatcher(QObject):
+    """監看固定的螢幕區域，內容改變且穩定後重新翻譯，並直接更新原本的預覽視窗"""
+
+    def __init__(self, screen, rect, preview_window, image, interval=None, profile=None):
+        super().__init__()
+        self.screen = screen
+        self.rect = rect
+        self.profile = profile
+        self.preview_window = preview_window
+        self.translate_thread = None
+        # 最後一次翻譯的畫面，以及上一次取樣的畫面
+        self.processed_thumb = watch_thumbnail(image)
+        self.last_thumb = self.processed_thumb
+
+        # 監看中不斷重新截取該區域，預覽視窗不能蓋在區域上
+        x, y, width, height = rect
+        if preview_window.geometry().intersects(QRect(x, y, width, height)):
+            preview_window.move(preview_window.x(), y + height + 10)
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(interval or WATCH_INTERVAL_MS)
+
+    def is_active(self):
+        return self.timer.isActive()
+
+    def stop(self):
+        self.timer.stop()
+
+    def check(self):
+        # 預覽視窗關閉即停止監看
+        if not self.preview_window.isVisible():
+            self.stop()
+            return
+        if self.translate_thread is not None and self.translate_thread.isRunning():
+            return
+
+        x, y, width, height = self.rect
+        with mod207_trace.span('watch_sample'):
+            image = mod213_capture.grab_region(self.screen, (x, y, width, height))
+            thumb = watch_thumbnail(image)
+            # 與上次翻譯時不同，且與上一次取樣相同 (文字已顯示完畢) 才重新翻譯
+            settled = not thumbnail_changed(thumb, self.last_thumb)
+            changed = thumbnail_changed(thumb, self.processed_thumb)
+        self.last_thumb = thumb
+        if not (settled and changed):
+            return
+
+        self.processed_thumb = thumb
+        self.translate_thread = TranslateThread(image, profile=self.profile)
+        self.translate_thread.stage_ready.connect(self.on_stage_ready)
+        self.translate_thread.failed.connect(self.on_translate_failed)
+        self.translate_thread.start()
+
+    def on_stage_ready(self, stage, result_img, result_info):
+        if self.preview_window.isVisible():
+            with mod207_trace.span('preview', stage=stage):
+                self.preview_window.update_image(array_to_pixmap(result_img))
+
+    def on_translate_failed(self, error):
+        print(f"監看區域翻譯時發生錯誤: {error}")
+        mod208_metrics.increment('capture_errors')
 
 
 class Snipper(QWidget):
-    def __init__(self, parent=None):
+    # 截圖流程結束 (完成或取消) 時發出
+    finished = pyqtSignal()
+
+    def __init__(self, parent=None, watch=False):
         super().__init__(parent=parent)
+        # 依按下快捷鍵時的前景視窗選擇截圖設定檔 (必須在截圖視窗顯示之前，見 mod218_profiles)
+        self.profile = mod218_profiles.current_profile()
+
         # 設置視窗屬性
         self.setWindowTitle("ScreenShot Tool")
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.SubWindow)
@@ -16,9 +149,15 @@ class Snipper(QWidget):
         # 獲取當前螢幕
         self._screen = QApplication.screenAt(QCursor.pos())
 
+        # 按下快捷鍵時截取一次整個螢幕，選取區域時直接從這張畫面裁切，不再重新截圖
+        with mod207_trace.span('grab_screen'):
+            self.frame = mod213_capture.grab_screen(self._screen)
+
         # 設置背景
+        background = array_to_pixmap(self.frame)
+        background.setDevicePixelRatio(self.frame.shape[1] / max(1, self._screen.geometry().width()))
         palette = self.palette()
-        palette.setBrush(self.backgroundRole(), QBrush(self.getWindow()))
+        palette.setBrush(self.backgroundRole(), QBrush(background))
         self.setPalette(palette)
 
         # 設置鼠標為十字形
@@ -28,9 +167,10 @@ class Snipper(QWidget):
         self.start = QPoint()
         self.end = QPoint()
         self.preview_window = None
-
-    def getWindow(self):
-        return self._screen.grabWindow(0)
+        self.capture_start = None  # 放開滑鼠的時間點 (追蹤用)
+        # 監看模式：第一次翻譯完成後持續監看同一個區域
+        self.watch = watch
+        self.watcher = None
 
     def paintEvent(self, event):
         painter = QPainter(self)
@@ -57,7 +197,9 @@ class Snipper(QWidget):
         if self.start == self.end:
             return
 
+        self.capture_start = mod207_trace.now()
         self.hide()
+        QApplication.restoreOverrideCursor()
         QApplication.processEvents()
 
         # 計算截圖區域，增加一些邊距以避免切割
@@ -66,25 +208,64 @@ class Snipper(QWidget):
         width = abs(self.start.x() - self.end.x()) + 5  # 增加邊距
         height = abs(self.start.y() - self.end.y()) + 5  # 增加邊距
 
-        # 進行截圖
-        screenshot = self.getWindow().copy(x1, y1, width, height)
-        
-        # 儲存截圖
-        screenshot.save("screenshot.png")  # 儲存截圖為 PNG 格式
-        input_image = "screenshot.png"
-        output_image = "screenshot00.png"
-        result_info = mod200_translate.remove_text(input_image, output_image)
-
-        # 從檔案載入翻譯後的圖片為 QPixmap
-        translated_pixmap = QPixmap(output_image)
-        
-        # 顯示預覽視窗
-        self.show_preview(translated_pixmap, x1, y1, width, height, result_info)
+        # 從開始時截取的畫面裁切，直接在記憶體中處理，不經過 screenshot.png / screenshot00.png
+        with mod207_trace.span('crop', width=width, height=height):
+            input_image = mod213_capture.crop_frame(self.frame, self._screen, (x1, y1, width, height))
+        self.frame = None  # 整個螢幕的畫面不再需要
+        output_image = None
+        if SAVE_SCREENSHOT:
+            mod200_translate.save_image_async(input_image, "screenshot.png")
+            output_image = "screenshot00.png"
+
+        # 在背景翻譯，OCR 完成後先顯示預覽，譯文陸續填入
+        self.capture_rect = (x1, y1, width, height)
+        self.input_image = input_image
+        self.translate_thread = TranslateThread(input_image, output_image, self.profile)
+        self.translate_thread.stage_ready.connect(self.on_stage_ready)
+        self.translate_thread.failed.connect(self.on_translate_failed)
+        self.translate_thread.finished.connect(self.finish)
+        self.translate_thread.start()
+
+    def on_stage_ready(self, stage, result_img, result_info):
+        # 將目前的結果轉為 QPixmap 並更新預覽視窗
+        with mod207_trace.span('preview', stage=stage):
+            translated_pixmap = array_to_pixmap(result_img)
+            if self.preview_window is None:
+                x1, y1, width, height = self.capture_rect
+                self.show_preview(translated_pixmap, x1, y1, width, height, result_info)
+            else:
+                self.preview_window.update_image(translated_pixmap)
+        if stage == 'erased':
+            # 從放開滑鼠到第一次顯示預覽的時間
+            now = mod207_trace.now()
+            mod207_trace.add_complete('first_preview', self.capture_start, now)
+            mod208_metrics.observe('first_preview', (now - self.capture_start) / 1e6)
+
+    def on_translate_failed(self, error):
+        # 常駐模式下不能讓例外結束整個程序
+        print(f"翻譯截圖時發生錯誤: {error}")
+        mod208_metrics.increment('capture_errors')
+        if self.preview_window is None:
+            quit_app()
+
+    def finish(self):
+        # 關閉截圖視窗
+        if self.capture_start is not None:
+            now = mod207_trace.now()
+            mod207_trace.add_complete('capture', self.capture_start, now)
+            mod207_trace.export_if_enabled()
+            mod208_metrics.observe('capture', (now - self.capture_start) / 1e6)
+            if self.watch and self.preview_window is not None:
+                self.watcher = RegionWatcher(self._screen, self.capture_rect, self.preview_window, self.input_image,
+                                             profile=self.profile)
         self.close()
+        self.finished.emit()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
-            QApplication.quit()
+            QApplication.restoreOverrideCursor()
+            self.finish()
+            quit_app()
 
     def show_preview(self, screenshot, x, y, width, height, result_info):
         # 取得翻譯後圖片的實際大小
@@ -114,8 +295,9 @@ class PreviewWindow(QWidget):
         self.container = QWidget()
         self.container.setObjectName("container")
         
-        # 分析截圖背景色並設置相應的光暈效果
-        is_dark_background = result_info['lightdeck'] < 145
+        # 分析截圖背景色並設置相應的光暈效果 (深底門檻使用截圖設定檔的值)
+        dark_background = result_info.get('dark_background', mod218_profiles.DEFAULT_PARAMS['dark_background'])
+        is_dark_background = result_info['lightdeck'] < dark_background
         
         # 設置光暈效果
         self.shadow = QGraphicsDropShadowEffect(self)
@@ -154,6 +336,10 @@ class PreviewWindow(QWidget):
         # 儲存背景色資訊
         self.is_dark_background = is_dark_background
 
+    def update_image(self, screenshot):
+        # 譯文陸續完成時更新顯示的圖片
+        self.label.setPixmap(screenshot)
+
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.dragging = True
@@ -185,11 +371,18 @@ class PreviewWindow(QWidget):
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
             self.close()
-            QApplication.quit()
+            quit_app()
 
 def main():
+    # 參數 --watch [間隔毫秒]：選取區域後持續監看並自動更新翻譯
     app = QApplication(sys.argv)
-    snipper = Snipper()
+    watch = "--watch" in sys.argv
+    if watch:
+        index = sys.argv.index("--watch")
+        if index + 1 < len(sys.argv) and sys.argv[index + 1].isdigit():
+            global WATCH_INTERVAL_MS
+            WATCH_INTERVAL_MS = int(sys.argv[index + 1])
+    snipper = Snipper(watch=watch)
     snipper.show()
     sys.exit(app.exec_())
 
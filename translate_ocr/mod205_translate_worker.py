@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+from multiprocessing.connection import Client
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# 預先載入 cv2 / pytesseract / PIL / geminiAPI 等模組，之後每次截圖都不必重新匯入
+import mod200_translate
+import mod203_translate_ocr
+import mod208_metrics
+
+# 與 mod300_gui 之間傳遞驗證金鑰的環境變數名稱
+AUTHKEY_ENV = "TRANSLATE_WORKER_AUTHKEY"
+
+
+class TranslateWorker(QObject):
+    """常駐翻譯程序，透過本機連線接收截圖工作"""
+    job_received = pyqtSignal(dict)
+    disconnected = pyqtSignal()
+
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+        self.snipper = None
+        self.preview_windows = []
+        self.watchers = []
+
+        # 信號會自動排入主執行緒，確保 Qt 視窗都在主執行緒建立
+        self.job_received.connect(self.start_job)
+        self.disconnected.connect(QApplication.quit)
+
+        # 監聽執行緒
+        listen_thread = threading.Thread(target=self.listen)
+        listen_thread.daemon = True
+        listen_thread.start()
+
+    def listen(self):
+        """接收托盤程式送來的工作"""
+        while True:
+            try:
+                job = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if job.get("cmd") == "quit":
+                break
+            self.job_received.emit(job)
+        self.disconnected.emit()
+
+    def start_job(self, job):
+        """開始一次截圖翻譯 (capture) 或區域監看 (watch)，metrics 只回報目前的統計資料"""
+        if job.get("cmd") == "metrics":
+            # 效能統計頁面定時要求，不必等到截圖結束
+            self.reply({"status": "metrics", "metrics": mod208_metrics.snapshot()})
+            return
+        if job.get("cmd") not in ("capture", "watch"):
+            self.reply({"status": "error", "error": f"未知的工作: {job.get('cmd')}"})
+            return
+
+        # 清除已關閉的預覽視窗與已停止的監看
+        self.preview_windows = [w for w in self.preview_windows if w.isVisible()]
+        self.watchers = [w for w in self.watchers if w.is_active()]
+
+        self.snipper = mod203_translate_ocr.Snipper(watch=job.get("cmd") == "watch")
+        self.snipper.finished.connect(self.finish_job)
+        self.snipper.show()
+        self.snipper.activateWindow()
+
+    def finish_job(self):
+        """截圖流程結束，保留預覽視窗並回報托盤程式"""
+        if self.snipper.preview_window is not None:
+            self.preview_windows.append(self.snipper.preview_window)
+        if self.snipper.watcher is not None:
+            self.watchers.append(self.snipper.watcher)
+        self.snipper = None
+        # 附上統計資料，供托盤程式的效能頁面顯示
+        self.reply({"status": "done", "metrics": mod208_metrics.snapshot()})
+
+    def reply(self, message):
+        try:
+            self.conn.send(message)
+        except (EOFError, OSError):
+            QApplication.quit()
+
+
+def main():
+    # 參數: 托盤程式的連接埠
+    port = int(sys.argv[1])
+    authkey = bytes.fromhex(os.environ[AUTHKEY_ENV])
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)  # 關閉預覽視窗後繼續等待下一次截圖
+    mod203_translate_ocr.RESIDENT = True
+    mod200_translate.warm_up()
+
+    conn = Client(("127.0.0.1", port), authkey=authkey)
+    conn.send({"status": "ready", "metrics": mod208_metrics.snapshot()})
+    worker = TranslateWorker(conn)
+    exit_code = app.exec_()
+    conn.close()
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import mod207_trace
+import mod208_metrics
+
+MAX_CHUNK_TOKENS = 800  # 每批次估計的 token 上限
+MAX_CONCURRENCY = 4  # 同時送出的批次數量上限
+CHUNK_ATTEMPTS = 2  # 批次請求失敗 (例外) 時最多送出的次數
+
+# 批次請求的格式說明：翻譯函式只負責翻譯 (見 mod219_translate_providers)，編號 JSON 的約定由這裡送出
+BATCH_INSTRUCTION = ("以下 JSON 物件的每個值各是一行原文，請只翻譯每個值，保留相同的鍵 (編號)，"
+                     "只回傳 JSON 物件，不要加上說明：\n")
+
+# 備援的純文字格式的說明 (一行一句)
+PLAIN_INSTRUCTION = "請逐行翻譯以下內容，保持相同的行數與順序，只回傳譯文：\n"
+
+# 回應無法解析為 JSON 時，逐一擷取 "編號": "譯文" 的備援規則
+_PAIR_PATTERN = re.compile(r'"(\d+)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+# 中日韓文字 (含全形符號) 大約一字一個 token，其他文字大約四個字元一個 token
+_CJK_PATTERN = re.compile(r'[　-ヿ㐀-鿿가-힯豈-﫿＀-￯]')
+
+def estimate_tokens(text):
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + math.ceil((len(text) - cjk_count) / 4)
+
+def split_chunks(texts, max_tokens=None):
+    # 依估計的 token 數將各行分成數個批次，回傳每批次的行索引 (單行超過上限時自成一批)
+    max_tokens = max_tokens or MAX_CHUNK_TOKENS
+    chunks = []
+    current = []
+    current_tokens = 0
+    for idx, text in enumerate(texts):
+        cost = estimate_tokens(text) + 6  # 每行的編號與 JSON 符號
+        if current and current_tokens + cost > max_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(idx)
+        current_tokens += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_request(texts):
+    # 每行加上編號，以 JSON 物件 {"1": "原文", "2": "原文", ...} 送出，前面附上格式說明
+    return BATCH_INSTRUCTION + json.dumps({str(n): text for n, text in enumerate(texts, 1)}, ensure_ascii=False)
+
+def build_plain_request(texts):
+    # 備援格式：一行一句的純文字，回應同樣一行一句
+    return PLAIN_INSTRUCTION + "\n".join(texts)
+
+def parse_plain_response(response, count):
+    # 行數與原文相同時才使用，否則全部視為失敗
+    lines = [line.strip() for line in (response or "").strip().splitlines() if line.strip()]
+    if len(lines) != count:
+        return [None] * count
+    return lines
+
+def parse_response(response, count):
+    # 解析 {"編號": "譯文"}，只回傳編號在範圍內且譯文非空的項目
+    if not response:
+        return {}
+    text = response.strip()
+    data = None
+    start, end = text.find('{'), text.rfind('}')  # 略過 ```json 等包裝
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+        except ValueError:
+            data = None
+    if not isinstance(data, dict):
+        # JSON 格式損壞時，逐一擷取仍完整的項目
+        data = {}
+        for key, value in _PAIR_PATTERN.findall(text):
+            try:
+                data[key] = json.loads(f'"{value}"')
+            except ValueError:
+                continue
+
+    parsed = {}
+    for key, value in data.items():
+        if not (isinstance(key, str) and key.isdigit() and isinstance(value, str)):
+            continue
+        n = int(key)
+        if 1 <= n <= count and value.strip():
+            parsed[n - 1] = value.strip()
+    return parsed
+
+def translate_chunk(texts, target_lang, translator, source_lang=None):
+    # 翻譯一個批次，回傳 (與 texts 等長的列表, 是否單獨重送缺少的行)，缺少或格式錯誤的編號為 None
+    # translator(原文, 目標語言, 原文語言) -> 譯文，原文語言為 None 時由翻譯服務自行判斷
+    # 回應中完全沒有可解析的編號 (例如模型以一般文字回答) 時，改以純文字格式重送整個批次一次，
+    # 不逐行重送，避免一個批次變成 N 個請求
+    parsed = parse_response(translator(build_request(texts), target_lang, source_lang), len(texts))
+    if parsed or len(texts) == 1:
+        return [parsed.get(idx) for idx in range(len(texts))], True
+    print(f"批次翻譯的回應無法解析，改以純文字格式重送 ({len(texts)} 行)")
+    mod208_metrics.increment('api_requests')
+    mod208_metrics.increment('api_plain_fallbacks')
+    return parse_plain_response(translator(build_plain_request(texts), target_lang, source_lang), len(texts)), False
+
+def translate_single(text, target_lang, translator, source_lang=None):
+    # 單獨重新翻譯一行 (純文字格式)，回應仍含編號 JSON 時取編號 1 的譯文
+    # 回應不是一行譯文 (例如附上格式說明或其他說明) 時視為失敗，不把模型的回答當成譯文
+    response = translator(build_plain_request([text]), target_lang, source_lang)
+    parsed = parse_response(response, 1)
+    if parsed:
+        return parsed[0]
+    if response and response.strip().startswith(('{', '```')):
+        return None  # 損壞的編號 JSON
+    return parse_plain_response(response, 1)[0]
+
+def translate_batches(texts, target_lang, translator, max_tokens=None, concurrency=None, source_lang=None):
+    # 分批並行翻譯，依原順序組回結果，回傳與 texts 等長的譯文列表，翻譯失敗的行為 None
+    results = [None] * len(texts)
+    for indices, parts in iter_translate_batches(texts, target_lang, translator, max_tokens, concurrency, source_lang):
+        for idx, part in zip(indices, parts):
+            results[idx] = part
+    return results
+
+def iter_translate_batches(texts, target_lang, translator, max_tokens=None, concurrency=None, source_lang=None):
+    # 分批並行翻譯 (未指定時使用 MAX_CHUNK_TOKENS / MAX_CONCURRENCY)，依完成順序逐步產生 (行索引列表, 譯文列表)
+    # 成功的回應中缺少或格式錯誤的行在該批次完成後立刻單獨重送，只有失敗的部分需要重試
+    # 請求本身失敗 (連線錯誤、API 錯誤) 時整個批次重送一次，仍失敗就視為失敗，不逐行重送
+    # 每行只會產生一次，重試後仍失敗的行譯文為 None
+    concurrency = concurrency or MAX_CONCURRENCY
+    chunks = split_chunks(texts, max_tokens)
+
+    def run_chunk(indices):
+        # 回傳 (譯文列表, 是否單獨重送缺少的行)
+        for attempt in range(CHUNK_ATTEMPTS):
+            mod208_metrics.increment('api_requests')
+            try:
+                with mod207_trace.span('translate_chunk', lines=len(indices), attempt=attempt):
+                    return translate_chunk([texts[idx] for idx in indices], target_lang, translator, source_lang)
+            except Exception as e:
+                print(f"翻譯批次時發生錯誤 ({len(indices)} 行，第 {attempt + 1} 次): {e}")
+                mod208_metrics.increment('api_errors')
+        return [None] * len(indices), False
+
+    def run_single(idx):
+        mod208_metrics.increment('api_requests')
+        mod208_metrics.increment('api_retries')
+        try:
+            with mod207_trace.span('translate_retry', line=idx):
+                return [translate_single(texts[idx], target_lang, translator, source_lang)]
+        except Exception as e:
+            print(f"重新翻譯第 {idx} 行時發生錯誤: {e}")
+            mod208_metrics.increment('api_errors')
+            return [None]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # future -> (行索引列表, 是否為單行重試)
+        pending = {pool.submit(run_chunk, indices): (indices, False) for indices in chunks}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                indices, is_retry = pending.pop(future)
+                if is_retry:
+                    yield indices, future.result()
+                    continue
+
+                # 只重送成功的回應中缺少的行
+                parts, retry_missing = future.result()
+                missing = [idx for idx, part in zip(indices, parts) if part is None]
+                if missing and retry_missing:
+                    print(f"批次翻譯缺少 {len(missing)} 行，單獨重新翻譯")
+                    for idx in missing:
+                        pending[pool.submit(run_single, idx)] = ([idx], True)
+                elif missing:
+                    yield missing, [None] * len(missing)
+                finished = [(idx, part) for idx, part in zip(indices, parts) if part is not None]
+                if finished:
+                    yield [idx for idx, _ in finished], [part for _, part in finished]
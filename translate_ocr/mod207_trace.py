@@ -0,0 +1,133 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# 設定環境變數 TRANSLATE_TRACE=輸出檔路徑 即可啟用追蹤，結束時自動輸出
+TRACE_FILE = os.environ.get("TRANSLATE_TRACE") or None
+ENABLED = TRACE_FILE is not None
+MAX_EVENTS = 50000  # 只保留最近的事件，記憶體用量固定
+
+_events = deque(maxlen=MAX_EVENTS)
+_thread_names = {}
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def now():
+    # 目前時間 (微秒)，Chrome trace 使用的時間單位
+    return time.perf_counter_ns() // 1000
+
+def _record(event):
+    tid = threading.get_ident()
+    event["pid"] = _pid
+    event["tid"] = tid
+    with _lock:
+        if tid not in _thread_names:
+            _thread_names[tid] = threading.current_thread().name
+        _events.append(event)
+
+def add_complete(name, start, end, **args):
+    # 記錄一段已結束的區間 (start / end 為 now() 的回傳值)，可用於跨執行緒的流程
+    if ENABLED:
+        _record({"name": name, "ph": "X", "ts": start, "dur": max(0, end - start), "args": args})
+
+def instant(name, **args):
+    # 記錄單一時間點的事件
+    if ENABLED:
+        _record({"name": name, "ph": "i", "s": "t", "ts": now(), "args": args})
+
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = str(exc)
+        add_complete(self.name, self.start, now(), **self.args)
+        return False
+
+
+class _NullSpan:
+    # 停用時使用的空物件，不做任何事
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **args):
+    # with mod207_trace.span("名稱", 參數=值): ...
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+class StageTimer:
+    """依序量測流程各階段：lap(名稱) 把上一個時間點到現在的耗時累加到 timings，並記錄追蹤區間"""
+
+    def __init__(self, timings):
+        self.timings = timings
+        self.restart()
+
+    def restart(self):
+        self.start = time.perf_counter_ns()
+
+    def lap(self, name, **args):
+        end = time.perf_counter_ns()
+        self.timings[name] = self.timings.get(name, 0.0) + (end - self.start) / 1e9
+        if ENABLED:
+            add_complete(name, self.start // 1000, end // 1000, **args)
+        self.start = end
+
+
+def enable(trace_file=None):
+    global ENABLED, TRACE_FILE
+    ENABLED = True
+    if trace_file:
+        TRACE_FILE = trace_file
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def clear():
+    with _lock:
+        _events.clear()
+
+def export_chrome_trace(path=None):
+    # 輸出為 Chrome trace / Perfetto 可讀取的 JSON
+    path = path or TRACE_FILE
+    if not path:
+        return None
+    with _lock:
+        events = list(_events)
+        thread_names = dict(_thread_names)
+    metadata = [{"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": name}}
+                for tid, name in thread_names.items()]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return path
+
+def export_if_enabled():
+    # 啟用追蹤且有設定輸出檔時，輸出目前保留的事件 (每次截圖完成與程式結束時呼叫)
+    if ENABLED and TRACE_FILE and _events:
+        try:
+            export_chrome_trace()
+        except OSError as e:
+            print(f"輸出追蹤檔案時出錯: {e}")
+
+atexit.register(export_if_enabled)
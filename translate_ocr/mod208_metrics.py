@@ -0,0 +1,147 @@
+import ctypes
+import os
+import threading
+import time
+from collections import deque
+
+# 記憶體用量使用 psutil (選用套件)，未安裝時 Windows 改用 GetProcessMemoryInfo，其他系統不顯示
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+WINDOW_SIZE = 500  # 每個統計項目只保留最近的樣本數，記憶體用量固定
+PERCENTILES = (50, 95, 99)
+
+
+class RollingHistogram:
+    """保留最近 WINDOW_SIZE 筆樣本的滾動統計，用於計算百分位數"""
+
+    def __init__(self, size=WINDOW_SIZE):
+        self.samples = deque(maxlen=size)
+        self.count = 0  # 累計樣本數 (包含已移出視窗的)
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        result = {'count': self.count, 'window': len(ordered)}
+        for p in PERCENTILES:
+            result[f'p{p}'] = percentile(ordered, p) if ordered else None
+        return result
+
+
+def percentile(ordered, p):
+    # 最近排名法 (nearest-rank)，ordered 需已排序
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class MetricsRegistry:
+    """程序內的統計資料：延遲分布 (秒)、累計次數與目前數值"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = RollingHistogram()
+            histogram.observe(value)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """回傳可序列化的統計資料 (可透過程序間連線傳送)"""
+        memory = memory_usage()
+        with self.lock:
+            if memory is not None:
+                self.gauges['memory_mb'] = memory
+            return {
+                'timestamp': time.time(),
+                'histograms': {name: h.summary() for name, h in self.histograms.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    # psapi.h 的 PROCESS_MEMORY_COUNTERS
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+def _windows_memory_usage():
+    # 工作集大小 (與 psutil 在 Windows 的 rss 相同)
+    try:
+        kernel32 = ctypes.WinDLL('kernel32')
+        psapi = ctypes.WinDLL('psapi')
+        kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+        psapi.GetProcessMemoryInfo.argtypes = [ctypes.c_void_p, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), ctypes.c_ulong]
+        psapi.GetProcessMemoryInfo.restype = ctypes.c_int
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+    except (OSError, AttributeError):
+        return None
+    return counters.WorkingSetSize / (1024 * 1024)
+
+def memory_usage():
+    # 目前程序的實體記憶體用量 (MB)，無法取得時回傳 None
+    if psutil is not None:
+        try:
+            return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+    if os.name == 'nt':
+        return _windows_memory_usage()
+    return None
+
+
+# 整個程序共用一個統計資料
+registry = MetricsRegistry()
+
+def observe(name, value):
+    registry.observe(name, value)
+
+def increment(name, amount=1):
+    registry.increment(name, amount)
+
+def set_gauge(name, value):
+    registry.set_gauge(name, value)
+
+def observe_timings(timings):
+    # 記錄 remove_text_stream 的各階段耗時 (stage.ocr / stage.fill ...)
+    for stage, seconds in timings.items():
+        registry.observe(f'stage.{stage}', seconds)
+
+def snapshot():
+    return registry.snapshot()
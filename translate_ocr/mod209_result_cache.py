@@ -0,0 +1,217 @@
+import os
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# 整張截圖的結果快取：相同 (或幾乎相同) 的畫面直接回傳上次的翻譯結果
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "files", "cache", "results")
+MAX_MEMORY_ENTRIES = 16  # 記憶體中保留的結果數
+MAX_MEMORY_MB = 256  # 記憶體中結果圖片的總大小上限
+USE_DISK_CACHE = False  # 是否另外保存到硬碟 (程式重新啟動後仍可使用)
+MAX_DISK_ENTRIES = 200
+
+# 相似度門檻：感知雜湊 (256 bits) 的漢明距離不超過 HASH_DISTANCE 才進一步比對縮圖，
+# 縮圖中灰階差超過 PIXEL_DELTA 的像素不超過 MAX_CHANGED_PIXELS 個才視為同一個畫面
+# 改一個字母在縮圖上也只差幾個像素，預設不允許任何像素改變，只忽略壓縮與抗鋸齒的細微差異
+# 4K 畫面縮小 8 倍後小字的改變可能低於 PIXEL_DELTA，縮圖中有任何差異的區塊再以原始解析度比對
+HASH_DISTANCE = 8
+PIXEL_DELTA = 16
+MAX_CHANGED_PIXELS = 0
+THUMB_WIDTH = 480
+HASH_SIZE = 16
+CONFIRM_TILE = 8  # 以原始解析度比對的區塊大小 (縮圖像素)
+
+
+def thumbnail(img):
+    # 縮小的灰階圖 (先縮小再轉灰階，大圖也只需幾毫秒)
+    height, width = img.shape[:2]
+    thumb_width = min(width, THUMB_WIDTH)
+    thumb_height = max(1, round(height * thumb_width / width))
+    small = cv2.resize(img, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+def difference_hash(thumb):
+    # dHash：比較相鄰像素的明暗，回傳 HASH_SIZE * HASH_SIZE bits 的整數
+    small = cv2.resize(thumb, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+def is_same_frame(thumb, other_thumb, img=None, other_gray=None):
+    # img: 原始的 BGR 圖片，other_gray: 另一個畫面原始解析度的灰階圖，都有時確認縮圖中有差異的區塊
+    if thumb.shape != other_thumb.shape:
+        return False
+    diff = cv2.absdiff(thumb, other_thumb)
+    if np.count_nonzero(diff > PIXEL_DELTA) > MAX_CHANGED_PIXELS:
+        return False
+    if img is None or other_gray is None:
+        return True
+    if other_gray.shape != img.shape[:2]:
+        return False
+    height, width = other_gray.shape
+    scale_y, scale_x = height / thumb.shape[0], width / thumb.shape[1]
+    rows, cols = np.nonzero(diff)
+    for tile_y, tile_x in set(zip((rows // CONFIRM_TILE).tolist(), (cols // CONFIRM_TILE).tolist())):
+        # 縮圖的一個像素對應原圖的 scale 個像素 (INTER_AREA 會參考邊界的像素，多取一個像素)
+        y1 = max(0, int(tile_y * CONFIRM_TILE * scale_y) - 1)
+        y2 = min(height, int(np.ceil((tile_y + 1) * CONFIRM_TILE * scale_y)) + 1)
+        x1 = max(0, int(tile_x * CONFIRM_TILE * scale_x) - 1)
+        x2 = min(width, int(np.ceil((tile_x + 1) * CONFIRM_TILE * scale_x)) + 1)
+        gray = cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        if np.count_nonzero(cv2.absdiff(gray, other_gray[y1:y2, x1:x2]) > PIXEL_DELTA) > MAX_CHANGED_PIXELS:
+            return False
+    return True
+
+def cache_key(frame_hash, shape, tag=None):
+    # 雜湊、大小與 tag 都相同時視為同一個項目 (較新的結果取代較舊的)
+    key = f"{frame_hash:064x}_{shape[1]}x{shape[0]}"
+    if tag is not None:
+        key += f"_{zlib.crc32(repr(tag).encode('utf-8')):08x}"
+    return key
+
+def entry_bytes(entry):
+    # 項目佔用的記憶體 (原始解析度的灰階圖與結果圖片)
+    return entry[2].nbytes + entry[3].nbytes
+
+
+class ResultCache:
+    """整張截圖的翻譯結果快取，記憶體中以 LRU 保留最近的結果，可選擇另外保存到硬碟"""
+
+    def __init__(self, max_entries=MAX_MEMORY_ENTRIES, max_mb=MAX_MEMORY_MB, disk_dir=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self.disk_dir = disk_dir
+        self.entries = OrderedDict()  # 鍵 -> (雜湊, 縮圖, 原始解析度的灰階圖, 結果圖片, result_info)
+        self.total_bytes = 0
+        self.disk_index = None  # 鍵 -> (雜湊, 縮圖)，第一次查詢硬碟時載入
+        self.lock = threading.Lock()
+
+    def lookup(self, img, tag=None):
+        """尋找相同畫面的結果，回傳 (結果圖片, result_info)，沒有時回傳 None
+        指定 tag 時只使用以相同 tag 保存的結果 (例如截圖設定檔、翻譯服務與目標語言)"""
+        thumb = thumbnail(img)
+        frame_hash = difference_hash(thumb)
+        shape = img.shape
+        with self.lock:
+            for key, (entry_hash, entry_thumb, entry_gray, result_img, result_info) in reversed(self.entries.items()):
+                if tag is not None and result_info.get('cache_tag') != tag:
+                    continue
+                if (result_img.shape == shape and hamming_distance(frame_hash, entry_hash) <= HASH_DISTANCE
+                        and is_same_frame(thumb, entry_thumb, img, entry_gray)):
+                    self.entries.move_to_end(key)
+                    return result_img, result_info
+        if self.disk_dir:
+            return self._lookup_disk(img, frame_hash, thumb, tag)
+        return None
+
+    def store(self, img, result_img, result_info, tag=None):
+        thumb = thumbnail(img)
+        frame_hash = difference_hash(thumb)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # lines 為 defaultdict (含 lambda)，轉為一般 dict 才能保存
+        result_info = dict(result_info, lines=dict(result_info['lines']), cache_tag=tag)
+        key = cache_key(frame_hash, img.shape, tag)
+        with self.lock:
+            self._add(key, (frame_hash, thumb, gray, result_img, result_info))
+        if self.disk_dir:
+            self._store_disk(key, frame_hash, thumb, gray, result_img, result_info)
+
+    def _add(self, key, entry):
+        if key in self.entries:
+            self.total_bytes -= entry_bytes(self.entries.pop(key))
+        self.entries[key] = entry
+        self.total_bytes += entry_bytes(entry)
+        while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            _, removed = self.entries.popitem(last=False)
+            self.total_bytes -= entry_bytes(removed)
+
+    def _load_disk_index(self):
+        self.disk_index = {}
+        os.makedirs(self.disk_dir, exist_ok=True)
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                with open(os.path.join(self.disk_dir, name), 'rb') as f:
+                    meta = pickle.load(f)
+                self.disk_index[name[:-4]] = (meta['hash'], meta['thumb'])
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError) as e:
+                print(f"讀取結果快取 {name} 時出錯: {e}")
+
+    def _lookup_disk(self, img, frame_hash, thumb, tag=None):
+        with self.lock:
+            if self.disk_index is None:
+                self._load_disk_index()
+            for key, (entry_hash, entry_thumb) in self.disk_index.items():
+                if hamming_distance(frame_hash, entry_hash) > HASH_DISTANCE or not is_same_frame(thumb, entry_thumb):
+                    continue
+                path = os.path.join(self.disk_dir, key)
+                try:
+                    with open(path + ".pkl", 'rb') as f:
+                        result_info = pickle.load(f)['result_info']
+                    if tag is not None and result_info.get('cache_tag') != tag:
+                        continue
+                    entry_gray = cv2.imread(path + ".frame.png", cv2.IMREAD_GRAYSCALE)
+                    if entry_gray is None or not is_same_frame(thumb, entry_thumb, img, entry_gray):
+                        continue
+                    result_img = cv2.imread(path + ".png")
+                except (OSError, pickle.UnpicklingError, EOFError, KeyError) as e:
+                    print(f"讀取結果快取時出錯: {e}")
+                    continue
+                if result_img is None or result_img.shape != img.shape:
+                    continue
+                # 更新使用時間 (淘汰時依修改時間)
+                os.utime(path + ".pkl")
+                self._add(key, (entry_hash, entry_thumb, entry_gray, result_img, result_info))
+                return result_img, result_info
+        return None
+
+    def _store_disk(self, key, frame_hash, thumb, gray, result_img, result_info):
+        path = os.path.join(self.disk_dir, key)
+        try:
+            with self.lock:
+                if self.disk_index is None:
+                    self._load_disk_index()
+                cv2.imwrite(path + ".png", result_img)
+                cv2.imwrite(path + ".frame.png", gray)
+                with open(path + ".pkl", 'wb') as f:
+                    pickle.dump({'hash': frame_hash, 'thumb': thumb, 'result_info': result_info}, f)
+                self.disk_index[key] = (frame_hash, thumb)
+                self._evict_disk()
+        except (OSError, pickle.PicklingError) as e:
+            print(f"寫入結果快取時出錯: {e}")
+
+    def _evict_disk(self):
+        if len(self.disk_index) <= MAX_DISK_ENTRIES:
+            return
+        # 刪除最久未使用的項目
+        by_age = sorted(self.disk_index, key=lambda key: os.path.getmtime(os.path.join(self.disk_dir, key + ".pkl")))
+        for key in by_age[:len(self.disk_index) - MAX_DISK_ENTRIES]:
+            for ext in (".pkl", ".png", ".frame.png"):
+                try:
+                    os.remove(os.path.join(self.disk_dir, key + ext))
+                except OSError:
+                    pass
+            del self.disk_index[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    # 整個程序共用一個結果快取
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(disk_dir=CACHE_DIR if USE_DISK_CACHE else None)
+        return _cache
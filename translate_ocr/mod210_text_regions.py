@@ -0,0 +1,230 @@
+import bisect
+import math
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import mod201_ocr_engine
+
+# 文字區域偵測：以形態學梯度找出可能含有文字的區域，只把這些區域送進 OCR
+MIN_TEXT_HEIGHT = 6  # 太小的區塊 (雜點、邊框) 不列入
+MAX_TEXT_HEIGHT_RATIO = 0.3  # 高度超過畫面此比例的區塊多半是圖片
+MIN_INNER_EDGE_RATIO = 0.02  # 區塊內部 (扣除外框) 的邊緣像素比例，太低的是框線或單純色塊
+GRADIENT_THRESHOLD = 32  # 視為邊緣的最小明暗變化 (低對比的文字也要保留)
+LINE_LENGTH = 40  # 超過此長度的水平/垂直直線視為框線，不與文字連在一起
+MAX_COVERAGE = 0.6  # 文字區域超過畫面此比例時直接辨識整張圖
+REGION_GAP = 16  # 拼接圖中各區域之間的間隔
+COLUMN_GAP = 64  # 拼接圖中相鄰兩欄的間隔 (夠寬時 tesseract 不會把兩欄的文字視為同一個字)
+MAX_COLUMNS = 8  # 拼接圖最多排成幾欄
+
+# OCR 前的縮放：把一般文字行高縮放到 tesseract 辨識最準確的大小 (只影響 OCR 的輸入，座標會換算回原圖)
+TARGET_TEXT_HEIGHT = 30
+MIN_SCALE = 0.4
+MAX_SCALE = 4.0
+SCALE_TOLERANCE = 1.3  # 與目標差距在此倍數內時不縮放
+MAX_OCR_PIXELS = 16_000_000  # 放大後的圖片像素上限
+
+
+def text_boxes(img):
+    # 回傳可能是文字行 (或行的一部分) 的框 [(x, y, w, h), ...]，未加邊距
+    height, width = img.shape[:2]
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    # 文字筆畫的邊緣：形態學梯度 + 二值化
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, edges = cv2.threshold(gradient, GRADIENT_THRESHOLD, 255, cv2.THRESH_BINARY)
+
+    # 去除對話框、按鈕的框線，避免框線旁的文字被併入框線的輪廓
+    lines = cv2.bitwise_or(
+        cv2.morphologyEx(edges, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (LINE_LENGTH, 1))),
+        cv2.morphologyEx(edges, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, LINE_LENGTH))))
+    edges = cv2.subtract(edges, lines)
+
+    # 水平方向連接同一行的字元
+    connected = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    # 按鈕、對話框內的文字在框線的輪廓裡面，需要取得所有層級的輪廓
+    contours, _ = cv2.findContours(connected, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    max_height = max(MIN_TEXT_HEIGHT, height * MAX_TEXT_HEIGHT_RATIO)
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < MIN_TEXT_HEIGHT or h > max_height or w < MIN_TEXT_HEIGHT:
+            continue
+        inner = edges[y + 4:y + h - 4, x + 4:x + w - 4]
+        if inner.size and cv2.countNonZero(inner) < inner.size * MIN_INNER_EDGE_RATIO:
+            continue
+        boxes.append((x, y, w, h))
+    return boxes
+
+def detect_text_regions(img, boxes=None):
+    # 回傳可能含有文字的區域 [(x, y, w, h), ...] (由上而下排序)，
+    # 找不到區域或區域幾乎涵蓋整張圖時回傳 None，表示應辨識整張圖
+    height, width = img.shape[:2]
+    if boxes is None:
+        boxes = text_boxes(img)
+    if not boxes:
+        return None
+
+    # 保留一些邊距，讓 OCR 有完整的字形與背景
+    padded = []
+    for x, y, w, h in boxes:
+        pad = max(4, h // 3)
+        padded.append([max(0, x - pad), max(0, y - pad), min(width, x + w + pad), min(height, y + h + pad)])
+    regions = merge_boxes(padded)
+    covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+    if covered > width * height * MAX_COVERAGE:
+        return None
+    return [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in sorted(regions, key=lambda r: (r[1], r[0]))]
+
+def merge_boxes(boxes):
+    # 合併互相重疊的框 [x1, y1, x2, y2]：依 y1 排序後由上而下掃描，每個框只與下緣還沒超過它的框比較
+    # 合併後的框變大，可能與上方已掃描過的框重疊 (少見)，有合併時再掃描一次確認
+    while True:
+        boxes, merged = _sweep_merge(boxes)
+        if not merged:
+            return boxes
+
+def _sweep_merge(boxes):
+    # 掃描一次，回傳 (合併後的框, 是否有合併)
+    result = []
+    active = []  # 下緣還沒超過掃描位置的框
+    merged = False
+    for box in sorted(boxes, key=lambda b: b[1]):
+        box = list(box)
+        still_active = []
+        for other in active:
+            (still_active if other[3] >= box[1] else result).append(other)
+        active = still_active
+        while True:
+            overlapping = [other for other in active
+                           if box[0] <= other[2] and other[0] <= box[2] and box[1] <= other[3] and other[1] <= box[3]]
+            if not overlapping:
+                break
+            # 合併後的框變大，可能又與其他框重疊，繼續檢查
+            merged = True
+            active = [other for other in active if other not in overlapping]
+            for other in overlapping:
+                box = [min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3])]
+        active.append(box)
+    return result + active, merged
+
+def estimate_text_height(boxes):
+    # 文字行高的中位數 (以寬度加權，避免零碎的小框影響結果)，沒有文字時回傳 None
+    if not boxes:
+        return None
+    order = sorted(boxes, key=lambda box: box[3])
+    half = sum(w for _, _, w, _ in order) / 2
+    total = 0
+    for _, _, w, h in order:
+        total += w
+        if total >= half:
+            return h
+    return order[-1][3]
+
+def ocr_scale(img, boxes, target_height=None):
+    # OCR 前的縮放倍率：讓文字行高接近 target_height (預設 TARGET_TEXT_HEIGHT)，差距不大時回傳 1.0
+    text_height = estimate_text_height(boxes)
+    if not text_height:
+        return 1.0
+    scale = (target_height or TARGET_TEXT_HEIGHT) / text_height
+    if 1 / SCALE_TOLERANCE <= scale <= SCALE_TOLERANCE:
+        return 1.0
+    scale = min(max(scale, MIN_SCALE), MAX_SCALE)
+    # 放大後的圖片太大時降低倍率
+    pixels = img.shape[0] * img.shape[1]
+    if pixels * scale * scale > MAX_OCR_PIXELS:
+        scale = max(1.0, (MAX_OCR_PIXELS / pixels) ** 0.5)
+    return scale
+
+def image_to_data_scaled(img, scale=1.0, **ocr_kwargs):
+    # 將 BGR 圖片縮放 scale 倍後辨識，回傳的座標已換算回縮放前的大小
+    if scale != 1.0:
+        interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=interpolation)
+    pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    data = mod201_ocr_engine.image_to_data(pil_img, **ocr_kwargs)
+    if scale != 1.0:
+        for key in ('left', 'top', 'width', 'height'):
+            data[key] = [int(round(value / scale)) for value in data[key]]
+    return data
+
+def pack_regions(regions):
+    # 把各區域排成幾欄 (每欄由上而下，寬的區域先放)，選擇拼接圖面積最小的排法
+    # 一個很寬的區域加上許多小區域時，單欄的拼接圖會比原圖還大
+    # 回傳 (寬, 高, 各區域在拼接圖中的 (x, y))
+    heights = [h + REGION_GAP for _, _, _, h in regions]
+    total = sum(heights)
+    order = sorted(range(len(regions)), key=lambda i: -regions[i][2])
+    best = None
+    for columns in range(1, min(MAX_COLUMNS, len(regions)) + 1):
+        limit = max(max(heights), math.ceil(total / columns))
+        positions = [None] * len(regions)
+        left = top = column_width = height = 0
+        for i in order:
+            if top and top + heights[i] > limit:
+                left += column_width + COLUMN_GAP
+                top = column_width = 0
+            positions[i] = (left, top)
+            top += heights[i]
+            column_width = max(column_width, regions[i][2])
+            height = max(height, top)
+        width = left + column_width
+        if best is None or width * height < best[0] * best[1]:
+            best = (width, height, positions)
+    return best
+
+def build_mosaic(img, regions, layout=None):
+    # 將各區域拼成一張圖 (只需呼叫一次 OCR)，回傳 (拼接圖, 各區域在拼接圖中的 (x, y))
+    # layout: pack_regions 的結果，None 時重新計算
+    mosaic_width, mosaic_height, positions = layout or pack_regions(regions)
+    # 欄與欄之間的空白以整張圖的中位數顏色填滿
+    mosaic = np.empty((mosaic_height, mosaic_width, 3), dtype=np.uint8)
+    mosaic[:] = np.median(img[::8, ::8].reshape(-1, 3), axis=0).astype(np.uint8)
+    for (x, y, w, h), (left, top) in zip(regions, positions):
+        crop = img[y:y + h, x:x + w]
+        # 區域周圍的空白以該區域邊緣的中位數顏色填滿，避免產生多餘的邊緣
+        border = np.concatenate([crop[0], crop[-1], crop[:, 0], crop[:, -1]])
+        mosaic[top:top + h + REGION_GAP, left:left + w + REGION_GAP] = np.median(border, axis=0).astype(np.uint8)
+        mosaic[top:top + h, left:left + w] = crop
+    return mosaic, positions
+
+def image_to_data_regions(img, regions, scale=1.0, ocr=None, **ocr_kwargs):
+    # 只辨識 regions 內的文字，回傳格式與 mod201_ocr_engine.image_to_data 相同，座標已換算回原圖
+    # ocr: 辨識拼接圖的函式 (參數與 image_to_data_scaled 相同)，例如 mod216_tiled_ocr.image_to_data
+    # 拼接圖不比原圖小時直接辨識整張圖 (較快，也沒有換算座標的誤差)
+    ocr = ocr or image_to_data_scaled
+    layout = pack_regions(regions)
+    if layout[0] * layout[1] >= img.shape[0] * img.shape[1]:
+        return ocr(img, scale, **ocr_kwargs)
+    mosaic, positions = build_mosaic(img, regions, layout)
+    data = ocr(mosaic, scale, **ocr_kwargs)
+
+    # 各欄的左端 x 座標，與每欄中各區域的 (上端 y 座標, 區域序號)
+    column_lefts = sorted({left for left, _ in positions})
+    column_rows = {left: sorted((top, i) for i, (other, top) in enumerate(positions) if other == left)
+                   for left in column_lefts}
+    column_tops = {left: [top for top, _ in rows] for left, rows in column_rows.items()}
+    for i in range(len(data['text'])):
+        if data['level'][i] == 1:
+            # 整頁的結構列改為原圖大小
+            data['left'][i], data['top'][i] = 0, 0
+            data['width'][i], data['height'][i] = img.shape[1], img.shape[0]
+            continue
+        # 依中心點決定屬於哪個區域
+        center_x = data['left'][i] + data['width'][i] // 2
+        center_y = data['top'][i] + data['height'][i] // 2
+        column = column_lefts[max(0, bisect.bisect_right(column_lefts, center_x) - 1)]
+        row = max(0, bisect.bisect_right(column_tops[column], center_y) - 1)
+        index = column_rows[column][row][1]
+        x, y, w, h = regions[index]
+        left, top = positions[index]
+        # 超出區域範圍的部分 (落在間隔中) 截掉
+        left = min(max(0, data['left'][i] - left), w - 1)
+        top = min(max(0, data['top'][i] - top), h - 1)
+        data['width'][i] = max(1, min(data['width'][i], w - left))
+        data['height'][i] = max(1, min(data['height'][i], h - top))
+        data['left'][i] = left + x
+        data['top'][i] = top + y
+    return data
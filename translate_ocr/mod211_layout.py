@@ -0,0 +1,196 @@
+import bisect
+import statistics
+from collections import defaultdict
+
+# 依 tesseract 的 block / par / line 編號與文字框位置組成文字行與段落
+MIN_CONF = 10  # 只收集信心度大於此值的文字
+MIN_WORD_WIDTH = 20  # 寬度太小可能是 ICON (不能單獨成為一行)
+HORIZONTAL_THRESHOLD = 0.8  # 同一行相鄰文字的最大間距 (行高的倍數)
+VERTICAL_OVERLAP = 0.5  # 同一行的文字在垂直方向至少要重疊的比例 (以較矮的文字計算)
+PARAGRAPH_GAP = 0.8  # 同一段落上下行的最大間距 (行高的倍數)
+PARAGRAPH_HEIGHT_RATIO = 1.4  # 同一段落的行高差異上限
+
+
+def is_valid_word(text, width, min_width):
+    # 寬度太小可能是 ICON，但兩個字母以上且含有 a 的英文字仍視為文字
+    if width >= min_width:
+        return True
+    return text.isascii() and len(text) >= 2 and 'a' in text.lower()
+
+def collect_words(data, min_conf, min_word_width):
+    # 取出有效的文字 (非空且信心度足夠)，記錄 tesseract 的行編號
+    words = []
+    for i, text in enumerate(data['text']):
+        text = str(text).strip()
+        if not text or float(data['conf'][i]) <= min_conf:
+            continue
+        x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
+        words.append({
+            'text': text, 'x': x, 'y': y, 'x2': x + w, 'y2': y + h, 'conf': data['conf'][i],
+            'key': (data['block_num'][i], data['par_num'][i], data['line_num'][i]),
+            'valid': is_valid_word(text, w, min_word_width),
+        })
+    return words
+
+def vertical_overlap(a, b):
+    overlap = min(a['y2'], b['y2']) - max(a['y'], b['y'])
+    return overlap / max(1, min(a['y2'] - a['y'], b['y2'] - b['y']))
+
+def new_segment(word):
+    return {'words': [word], 'x': word['x'], 'y': word['y'], 'x2': word['x2'], 'y2': word['y2']}
+
+def extend_segment(segment, other):
+    segment['words'].extend(other['words'])
+    segment['x'] = min(segment['x'], other['x'])
+    segment['y'] = min(segment['y'], other['y'])
+    segment['x2'] = max(segment['x2'], other['x2'])
+    segment['y2'] = max(segment['y2'], other['y2'])
+
+def can_join(left, right, horizontal, overlap):
+    # right 是否緊接在 left 的右邊 (同一行)
+    height = max(left['y2'] - left['y'], right['y2'] - right['y'])
+    gap = right['x'] - left['x2']
+    return -height * 0.2 <= gap < height * horizontal and vertical_overlap(left, right) >= overlap
+
+def split_segments(words, horizontal, overlap):
+    # tesseract 的每一行依 x 座標排序後，在間距過大 (不同欄) 或上下錯開的地方切開
+    by_line = defaultdict(list)
+    for word in words:
+        by_line[word['key']].append(word)
+
+    segments = []
+    for line_words in by_line.values():
+        line_words.sort(key=lambda word: word['x'])
+        current = new_segment(line_words[0])
+        for word in line_words[1:]:
+            if can_join(current, word, horizontal, overlap):
+                extend_segment(current, new_segment(word))
+            else:
+                segments.append(current)
+                current = new_segment(word)
+        segments.append(current)
+    return segments
+
+def merge_segments(segments, cell, horizontal, overlap):
+    # tesseract 把同一行拆成不同行時，以空間索引找出緊接在左邊的行並合併
+    # rows: 列編號 -> 依右端 x 座標排序的 [(x2, 行序號)]，每個片段只需查詢所在的幾個列
+    segments = sorted(segments, key=lambda segment: segment['x'])
+    rows = defaultdict(list)
+    lines = []
+
+    for segment in segments:
+        height = segment['y2'] - segment['y']
+        best = None
+        for row in range(segment['y'] // cell, segment['y2'] // cell + 1):
+            entries = rows[row]
+            # 只查詢右端落在 [x - 最大間距, x + 容許重疊] 的行 (行延長後舊的索引項目仍在，以目前的範圍重新判斷)
+            start = bisect.bisect_left(entries, (segment['x'] - height * horizontal,))
+            end = bisect.bisect_right(entries, (segment['x'] + height * 0.2, float('inf')))
+            for _, index in entries[start:end]:
+                if not can_join(lines[index], segment, horizontal, overlap):
+                    continue
+                if best is None or lines[index]['x2'] > lines[best]['x2']:
+                    best = index
+        if best is not None:
+            extend_segment(lines[best], segment)
+            index = best
+        else:
+            index = len(lines)
+            lines.append(dict(segment, words=list(segment['words'])))
+        line = lines[index]
+        for row in range(line['y'] // cell, line['y2'] // cell + 1):
+            bisect.insort(rows[row], (line['x2'], index))
+    return lines
+
+def assign_paragraphs(lines, gap, height_ratio):
+    # 上下相鄰、左右重疊且行高相近的行視為同一段落，回傳每行的段落編號
+    # columns: 欄編號 -> 依下緣 y 座標排序的 [(y2, 行序號)]
+    cell = max(1, int(statistics.median(line['y2'] - line['y'] for line in lines))) * 4
+    order = sorted(range(len(lines)), key=lambda i: lines[i]['y'])
+    columns = defaultdict(list)
+    paragraphs = [0] * len(lines)
+    next_paragraph = 0
+    for i in order:
+        line = lines[i]
+        height = line['y2'] - line['y']
+        max_gap = height * height_ratio * gap
+        best = None
+        for column in range(line['x'] // cell, line['x2'] // cell + 1):
+            entries = columns[column]
+            start = bisect.bisect_left(entries, (line['y'] - max_gap,))
+            end = bisect.bisect_right(entries, (line['y'] + height * 0.2, float('inf')))
+            for _, j in entries[start:end]:
+                above = lines[j]
+                above_height = above['y2'] - above['y']
+                if line['y'] - above['y2'] > max(height, above_height) * gap:
+                    continue
+                if above['x2'] <= line['x'] or line['x2'] <= above['x']:
+                    continue
+                if max(height, above_height) > min(height, above_height) * height_ratio:
+                    continue
+                if best is None or above['y2'] > lines[best]['y2']:
+                    best = j
+        if best is not None:
+            paragraphs[i] = paragraphs[best]
+        else:
+            paragraphs[i] = next_paragraph
+            next_paragraph += 1
+        for column in range(line['x'] // cell, line['x2'] // cell + 1):
+            bisect.insort(columns[column], (line['y2'], i))
+    return paragraphs
+
+def trim_line(line):
+    # 行首寬度太小的文字 (可能是 ICON) 不列入，整行都無效時回傳 None
+    words = sorted(line['words'], key=lambda word: word['x'])
+    while words and not words[0]['valid']:
+        words.pop(0)
+    if not words:
+        return None
+    trimmed = new_segment(words[0])
+    for word in words[1:]:
+        extend_segment(trimmed, new_segment(word))
+    return trimmed
+
+def group_lines(data, params=None):
+    # 回傳與原本相同格式的 lines：行編號 -> {"texts", "positions", "confs", "color", "paragraph"}，依閱讀順序編號
+    # params: 截圖設定檔的參數 (見 mod218_profiles)，沒有的項目使用本模組的預設值
+    # 排序與空間索引查詢使整體為 O(n log n)
+    params = params or {}
+    horizontal = params.get('horizontal_threshold', HORIZONTAL_THRESHOLD)
+    overlap = params.get('vertical_overlap', VERTICAL_OVERLAP)
+    lines = defaultdict(lambda: {"texts": [], "positions": [], "confs": [], "color": None, "paragraph": 0})
+    words = collect_words(data, params.get('min_conf', MIN_CONF), params.get('min_word_width', MIN_WORD_WIDTH))
+    if not words:
+        return lines
+
+    segments = split_segments(words, horizontal, overlap)
+    cell = max(1, int(statistics.median(segment['y2'] - segment['y'] for segment in segments)))
+    merged = [trim_line(line) for line in merge_segments(segments, cell, horizontal, overlap)]
+    merged = [line for line in merged if line is not None]
+    if not merged:
+        return lines
+    paragraphs = assign_paragraphs(merged, params.get('paragraph_gap', PARAGRAPH_GAP),
+                                   params.get('paragraph_height_ratio', PARAGRAPH_HEIGHT_RATIO))
+
+    # 閱讀順序：段落依第一行的位置排列 (同一列由左而右)，段落內由上而下
+    first_line = {}
+    for i, paragraph in enumerate(paragraphs):
+        if paragraph not in first_line or merged[i]['y'] < merged[first_line[paragraph]]['y']:
+            first_line[paragraph] = i
+    def reading_key(i):
+        first = merged[first_line[paragraphs[i]]]
+        return (first['y'] // cell, first['x'], paragraphs[i], merged[i]['y'], merged[i]['x'])
+
+    paragraph_numbers = {}
+    for line_num, i in enumerate(sorted(range(len(merged)), key=reading_key)):
+        line = merged[i]
+        lines[line_num]["texts"] = [word['text'] for word in line['words']]
+        lines[line_num]["positions"].append({
+            'x': line['x'],
+            'y': line['y'],
+            'w': line['x2'] - line['x'],
+            'h': line['y2'] - line['y']
+        })
+        lines[line_num]["confs"] = [word['conf'] for word in line['words']]
+        lines[line_num]["paragraph"] = paragraph_numbers.setdefault(paragraphs[i], len(paragraph_numbers))
+    return lines
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from PIL import ImageFont
+
+# 譯文繪製用的字體管理：字型檔只解析、載入一次，各大小的字體與字寬以 LRU 保留
+FONT_CANDIDATES = ["msjh.ttc", "NotoSansCJK-Regular.ttc", "Arial.ttf"]  # 依序嘗試，第一個可載入的字型檔
+BASE_SIZE = 100  # 預設字體的大小
+MIN_FONT_SIZE = 6
+MAX_VARIANTS = 64  # 保留的字體大小數 (每個大小另有字寬快取)
+REFERENCE_TEXT = "國Ag"  # 用來量測每個大小的文字高度
+
+
+def resolve_font_path(candidates=None):
+    # 回傳第一個可載入的字型檔，全部失敗時回傳 None (使用 Pillow 內建字體)
+    candidates = candidates or FONT_CANDIDATES
+    for path in candidates:
+        try:
+            ImageFont.truetype(path, BASE_SIZE)
+            return path
+        except OSError:
+            continue
+    print(f"警告：找不到字型檔 {', '.join(candidates)}，使用內建字體")
+    return None
+
+
+class FontVariant:
+    """單一大小的字體，快取每個字元的字寬與文字高度"""
+
+    def __init__(self, font):
+        self.font = font
+        self.advances = {}
+        _, self.top, _, self.bottom = font.getbbox(REFERENCE_TEXT)
+
+    def text_width(self, text):
+        advances = self.advances
+        width = 0.0
+        for char in text:
+            advance = advances.get(char)
+            if advance is None:
+                advance = advances[char] = self.font.getlength(char)
+            width += advance
+        return width
+
+    def text_size(self, text):
+        return self.text_width(text), self.bottom - self.top
+
+
+class FontManager:
+    """整個程序共用的字體：字型檔只載入一次，各大小的字體以 LRU 保留"""
+
+    def __init__(self, path=None, max_variants=MAX_VARIANTS):
+        self.path = path
+        self.max_variants = max_variants
+        self.face = self._load(BASE_SIZE)
+        self.variants = OrderedDict()  # 大小 -> FontVariant
+        self.lock = threading.Lock()
+
+    def _load(self, size):
+        if self.path is None:
+            return ImageFont.load_default(size=size)
+        return ImageFont.truetype(self.path, size)
+
+    def variant(self, size):
+        size = max(MIN_FONT_SIZE, int(size))
+        with self.lock:
+            variant = self.variants.get(size)
+            if variant is not None:
+                self.variants.move_to_end(size)
+                return variant
+        variant = FontVariant(self.face.font_variant(size=size) if self.path else self._load(size))
+        with self.lock:
+            self.variants[size] = variant
+            while len(self.variants) > self.max_variants:
+                self.variants.popitem(last=False)
+        return variant
+
+    def fit(self, text, max_size, max_width):
+        """以二分搜尋找出寬度不超過 max_width 的最大字體大小 (不小於 MIN_FONT_SIZE)，回傳 FontVariant"""
+        low, high = MIN_FONT_SIZE, max(MIN_FONT_SIZE, int(max_size))
+        while low < high:
+            size = (low + high + 1) // 2
+            if self.variant(size).text_width(text) <= max_width:
+                low = size
+            else:
+                high = size - 1
+        return self.variant(low)
+
+    def clear(self):
+        with self.lock:
+            self.variants.clear()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_font_manager():
+    # 第一次使用時解析字型檔，之後整個程序共用
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = FontManager(resolve_font_path())
+        return _manager
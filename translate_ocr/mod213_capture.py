@@ -0,0 +1,99 @@
+import os
+import threading
+import numpy as np
+
+import mod214_qt_image
+import mod220_backend_registry
+
+# mss 以作業系統的截圖 API 直接讀取畫面 (Windows: BitBlt / Linux: XShm)，比 Qt 快 (選用套件)
+try:
+    import mss
+    import mss.exception
+except ImportError:
+    mss = None
+
+# 預設的截圖後端名稱，None 表示自動選擇 (有 mss 時優先使用)
+CAPTURE_BACKEND = os.environ.get("TRANSLATE_CAPTURE_BACKEND") or None
+
+
+class QtCapture:
+    """以 QScreen.grabWindow 截圖 (原本的作法，作為備援)"""
+    name = "qt"
+
+    def grab(self, screen, rect=None):
+        if rect is None:
+            pixmap = screen.grabWindow(0)
+        else:
+            x, y, width, height = rect
+            pixmap = screen.grabWindow(0, x, y, width, height)
+        if pixmap.isNull():
+            raise RuntimeError("無法截取螢幕畫面")
+        return mod214_qt_image.pixmap_to_bgr(pixmap)
+
+
+class MssCapture:
+    """以 mss 截圖，每個執行緒各自保留一個 mss 物件 (不能跨執行緒共用)"""
+    name = "mss"
+
+    def __init__(self):
+        if mss is None:
+            raise RuntimeError("未安裝 mss")
+        self._local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._local.sct = mss.mss()
+        return sct
+
+    def grab(self, screen, rect=None):
+        # Qt 的座標為邏輯像素，mss 使用實際像素
+        ratio = screen.devicePixelRatio()
+        geometry = screen.geometry()
+        x, y, width, height = rect if rect is not None else (0, 0, geometry.width(), geometry.height())
+        monitor = {
+            'left': round((geometry.x() + x) * ratio),
+            'top': round((geometry.y() + y) * ratio),
+            'width': max(1, round(width * ratio)),
+            'height': max(1, round(height * ratio)),
+        }
+        try:
+            shot = self._sct().grab(monitor)
+        except mss.exception.ScreenShotError as e:
+            raise RuntimeError(f"mss 截圖失敗: {e}")
+        # BGRA -> BGR (複製成連續的陣列)
+        return np.ascontiguousarray(np.frombuffer(shot.raw, np.uint8).reshape(shot.height, shot.width, 4)[:, :, :3])
+
+
+# 可用的後端 (名稱 -> 類別)，新的後端可透過 register_backend 加入
+BACKENDS = {
+    "mss": MssCapture,
+    "qt": QtCapture,
+}
+# mss 優先，無法使用時改用 Qt
+_registry = mod220_backend_registry.BackendRegistry("截圖後端", BACKENDS, ["mss", "qt"])
+
+def register_backend(name, backend_class):
+    _registry.register(name, backend_class)
+
+def get_backend(name=None):
+    # 取得 (並快取) 截圖後端，未指定時自動選擇
+    return _registry.get(name or CAPTURE_BACKEND)
+
+def _grab(backend, screen, rect):
+    # 自動選擇的後端截圖失敗 (例如無法連線到顯示器) 時，改用下一個後端
+    return _registry.run(backend or CAPTURE_BACKEND, lambda selected: selected.grab(screen, rect))
+
+def grab_screen(screen, backend=None):
+    # 截取整個螢幕，回傳 BGR numpy 陣列
+    return _grab(backend, screen, None)
+
+def grab_region(screen, rect, backend=None):
+    # 截取螢幕中的區域 rect = (x, y, 寬, 高)，座標相對於該螢幕 (邏輯像素)
+    return _grab(backend, screen, rect)
+
+def crop_frame(frame, screen, rect):
+    # 從已截取的整個螢幕畫面中取出區域 (不需再截圖)，畫面為實際像素時依比例換算座標
+    ratio = frame.shape[1] / max(1, screen.geometry().width())
+    x, y, width, height = (round(value * ratio) for value in rect)
+    return frame[max(0, y):y + height, max(0, x):x + width].copy()
@@ -0,0 +1,44 @@
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap
+
+# QImage 與 numpy 陣列之間的轉換，整個流程統一使用 BGR (OpenCV 的順序)
+# QImage 的 Format_RGB32 在記憶體中依序為 B, G, R, X，可直接當作 BGRA 陣列使用
+# Format_BGR888 需要 Qt 5.14 以上，舊版改用 RGB888 並交換色版 (多複製一次)
+HAS_BGR888 = hasattr(QImage, "Format_BGR888")
+
+
+def qimage_view(image):
+    # 回傳 QImage 像素的 (高, 寬, 4) BGRA 陣列 (不複製)，使用期間 image 必須保留
+    # 非 32 位元格式時先轉換 (Qt 會複製一次)
+    if image.format() not in (QImage.Format_RGB32, QImage.Format_ARGB32, QImage.Format_ARGB32_Premultiplied):
+        image = image.convertToFormat(QImage.Format_RGB32)
+    width, height = image.width(), image.height()
+    ptr = image.constBits()
+    ptr.setsize(image.bytesPerLine() * height)
+    # 每行可能有對齊用的補位，以 bytesPerLine 作為列的間距
+    view = np.ndarray((height, width, 4), np.uint8, buffer=ptr, strides=(image.bytesPerLine(), 4, 1))
+    return view, image
+
+def qimage_to_bgr(image):
+    # QImage -> 連續的 BGR 陣列 (只複製一次，不交換色版)
+    view, image = qimage_view(image)
+    return cv2.cvtColor(view, cv2.COLOR_BGRA2BGR)
+
+def pixmap_to_bgr(pixmap):
+    return qimage_to_bgr(pixmap.toImage())
+
+def bgr_to_qimage(img):
+    # BGR 陣列 -> 共用同一塊記憶體的 QImage (不複製)，QImage 會保留陣列的參照
+    img = np.ascontiguousarray(img)
+    height, width = img.shape[:2]
+    if not HAS_BGR888:
+        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        return QImage(rgb.data, width, height, width * 3, QImage.Format_RGB888).copy()
+    image = QImage(img.data, width, height, img.strides[0], QImage.Format_BGR888)
+    image._array = img  # 陣列必須比 QImage 存在得久
+    return image
+
+def bgr_to_pixmap(img):
+    # QPixmap.fromImage 會把像素複製到 QPixmap，陣列之後不需保留
+    return QPixmap.fromImage(bgr_to_qimage(img))
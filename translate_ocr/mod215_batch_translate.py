@@ -0,0 +1,250 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import cv2
+import numpy as np
+
+import mod200_translate
+import mod201_ocr_engine
+import mod207_trace
+import mod216_tiled_ocr
+import mod218_profiles
+
+# 批次翻譯整個資料夾的圖片：OCR / 顏色分析 / 塗銷在多個程序中並行，
+# 所有圖片的文字集中後一起分批翻譯，最後再由各程序繪製譯文並寫檔
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff")
+MANIFEST_NAME = "manifest.json"  # 進度記錄 (放在輸出資料夾中)，中斷後重新執行會從上次的進度繼續
+ERASED_DIR = ".erased"  # 塗銷後、尚未繪製譯文的圖片
+TRANSLATE_BATCH_LINES = 300  # 累積多少行後一起送出翻譯
+SAVE_INTERVAL = 2.0  # 進度記錄最短的寫檔間隔 (秒)
+TARGET_LANG = "繁體中文"
+
+
+def find_images(source, exclude_dir=None):
+    # source 為資料夾 (包含子資料夾) 或 glob 樣式，回傳 (基準資料夾, 排序後的圖片路徑)
+    if os.path.isdir(source):
+        base = os.path.abspath(source)
+        paths = [os.path.join(root, name) for root, _, names in os.walk(base) for name in names]
+    else:
+        paths = [os.path.abspath(path) for path in glob.glob(source, recursive=True)]
+        base = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else os.getcwd()
+    exclude_dir = os.path.abspath(exclude_dir) + os.sep if exclude_dir else None
+    images = [path for path in paths
+              if path.lower().endswith(IMAGE_EXTENSIONS) and not (exclude_dir and path.startswith(exclude_dir))]
+    return base, sorted(images)
+
+def read_image(path):
+    # cv2.imread 在 Windows 上無法讀取含中文的路徑，改為先讀取檔案再解碼
+    data = np.fromfile(path, dtype=np.uint8)
+    return cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+
+def write_image(path, img):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ok, encoded = cv2.imencode(os.path.splitext(path)[1] or ".png", img)
+    if not ok:
+        raise ValueError(f"無法編碼圖片 {path}")
+    encoded.tofile(path)
+
+
+class Manifest:
+    """批次翻譯的進度記錄：圖片 (相對路徑) -> 狀態與待翻譯的行，寫檔時先寫入暫存檔再取代"""
+
+    def __init__(self, path):
+        self.path = path
+        self.images = {}
+        self.last_save = 0.0
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.images = json.load(f).get("images", {})
+            except (OSError, ValueError) as e:
+                print(f"讀取進度記錄時出錯，重新開始: {e}")
+
+    def status(self, name):
+        return self.images.get(name, {}).get("status")
+
+    def update(self, name, **fields):
+        self.images.setdefault(name, {}).update(fields)
+        self.dirty = True
+
+    def save(self, force=False):
+        if not self.dirty or (not force and time.monotonic() - self.last_save < SAVE_INTERVAL):
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"images": self.images}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self.last_save = time.monotonic()
+        self.dirty = False
+
+
+def init_worker(ocr_backend, processes=1):
+    # 每個工作程序只初始化一次 OCR 引擎；批次處理的圖片各不相同，不使用結果快取
+    # 所有工作程序同時辨識，大圖分塊的記憶體上限與引擎數由各程序平分
+    mod200_translate.USE_RESULT_CACHE = False
+    mod216_tiled_ocr.share_budget(processes)
+    try:
+        mod201_ocr_engine.warm_up(backend=ocr_backend)
+    except Exception as e:
+        print(f"預先載入 OCR 引擎失敗: {e}")
+
+def erase_job(source_path, erased_path, ocr_backend, profile=None):
+    # 工作程序：OCR 與塗銷，塗銷後的圖片寫入 erased_path，回傳待翻譯的行 (可序列化的格式)
+    # profile: 截圖設定檔名稱 (見 mod218_profiles)，None 為預設參數
+    img = read_image(source_path)
+    if img is None:
+        raise ValueError("無法讀取圖片")
+    timings = {}
+    result, lines, line_info, _, source_lang = mod200_translate.erase_text(
+        img, mod207_trace.StageTimer(timings), ocr_backend, mod218_profiles.get_store().params(profile))
+    write_image(erased_path, result)
+    rows = [{
+        'line_num': line_num,
+        'text': info['original_text'],
+        'texts': lines[line_num]['texts'],
+        'positions': lines[line_num]['positions'],
+        'color': list(lines[line_num]['color']),
+    } for line_num, info in line_info.items()]
+    return rows, timings, source_lang
+
+def render_job(erased_path, output_path, rows, translated_texts, keep_erased):
+    # 工作程序：在塗銷後的圖片上繪製譯文並寫入 output_path
+    start = time.perf_counter()
+    result = read_image(erased_path)
+    if result is None:
+        raise ValueError("無法讀取塗銷後的圖片")
+    lines = {row['line_num']: {'texts': row['texts'], 'positions': row['positions'], 'color': tuple(row['color'])}
+             for row in rows}
+    translations = {row['line_num']: text for row, text in zip(rows, translated_texts)}
+    write_image(output_path, mod200_translate.draw_translations(result, lines, translations))
+    if not keep_erased:
+        os.remove(erased_path)
+    return time.perf_counter() - start
+
+
+def translate_queue(queue, manifest, target_lang):
+    # 將佇列中所有圖片的行合併後一起翻譯 (相同文字只翻譯一次，原文語言相同的圖片一起送出)
+    # 回傳 {圖片: (譯文列表, 是否有失敗的行)}
+    groups = {}
+    for name in queue:
+        groups.setdefault(manifest.images[name].get("source_lang"), []).append(name)
+
+    results = {}
+    for source_lang, names in groups.items():
+        texts = []
+        owners = []
+        for name in names:
+            rows = manifest.images[name]["lines"]
+            owners.append((name, len(texts), len(rows)))
+            texts.extend(row['text'] for row in rows)
+
+        translated = list(texts)
+        failed = set()
+        for updates in mod200_translate.iter_translate_lines(texts, target_lang, failed, source_lang):
+            for index, text in updates.items():
+                translated[index] = text
+        for name, start, count in owners:
+            results[name] = (translated[start:start + count], any(i in failed for i in range(start, start + count)))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次翻譯資料夾中的圖片 (可中斷後繼續)")
+    parser.add_argument("source", help="圖片資料夾或 glob 樣式 (例如 \"shots/**/*.png\")")
+    parser.add_argument("-o", "--output", default=None, help="輸出資料夾 (預設為 來源資料夾_translated)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="OCR 與繪製的程序數")
+    parser.add_argument("--backend", default=None, help="OCR 後端 (見 mod201_ocr_engine.BACKENDS)")
+    parser.add_argument("--batch-lines", type=int, default=TRANSLATE_BATCH_LINES, help="累積多少行後一起送出翻譯")
+    parser.add_argument("--target", default=TARGET_LANG, help="翻譯的目標語言")
+    parser.add_argument("--profile", default=None, help="截圖設定檔名稱 (見 mod218_profiles)，預設為預設參數")
+    parser.add_argument("--restart", action="store_true", help="忽略進度記錄，全部重新處理")
+    args = parser.parse_args(argv)
+
+    source_dir = args.source.rstrip("/\\")
+    output_dir = os.path.abspath(args.output or (source_dir + "_translated" if os.path.isdir(source_dir) else "translated"))
+    base, images = find_images(args.source, exclude_dir=output_dir)
+    if not images:
+        print(f"找不到圖片: {args.source}")
+        return 1
+
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_NAME))
+    if args.restart:
+        manifest.images = {}
+    erased_dir = os.path.join(output_dir, ERASED_DIR)
+    paths = {}
+    for path in images:
+        name = os.path.relpath(path, base).replace(os.sep, "/")
+        paths[name] = (path, os.path.join(erased_dir, name + ".png"), os.path.join(output_dir, name))
+
+    start = time.perf_counter()
+    todo = [name for name in paths if manifest.status(name) != "done"]
+    # 上次已塗銷但尚未完成翻譯的圖片直接進入翻譯佇列
+    queue = [name for name in todo if manifest.status(name) == "erased" and os.path.exists(paths[name][1])]
+    queued_lines = sum(len(manifest.images[name]["lines"]) for name in queue)
+    print(f"共 {len(images)} 張圖片，待處理 {len(todo)} 張 (已塗銷 {len(queue)} 張)，使用 {args.workers} 個程序")
+
+    done_count = error_count = partial_count = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(args.backend, args.workers)) as pool:
+        pending = {}  # future -> (步驟, 圖片)
+        already_erased = set(queue)
+        for name in todo:
+            if name not in already_erased:
+                source_path, erased_path, _ = paths[name]
+                pending[pool.submit(erase_job, source_path, erased_path, args.backend, args.profile)] = ("erase", name)
+
+        while pending or queue:
+            erasing = any(step == "erase" for step, _ in pending.values())
+            if queue and (queued_lines >= args.batch_lines or not erasing):
+                # 翻譯在主程序進行，同時工作程序繼續處理其他圖片
+                results = translate_queue(queue, manifest, args.target)
+                for name, (translated_texts, has_failed) in results.items():
+                    _, erased_path, output_path = paths[name]
+                    manifest.update(name, failed=has_failed)
+                    future = pool.submit(render_job, erased_path, output_path, manifest.images[name]["lines"],
+                                         translated_texts, has_failed)
+                    pending[future] = ("render", name)
+                queue, queued_lines = [], 0
+                manifest.save()
+                continue
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step, name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"處理 {name} 時發生錯誤: {e}")
+                    manifest.update(name, status="error", error=str(e))
+                    error_count += 1
+                    continue
+                if step == "erase":
+                    rows, timings, source_lang = result
+                    manifest.update(name, status="erased", lines=rows, timings=timings, source_lang=source_lang)
+                    queue.append(name)
+                    queued_lines += len(rows)
+                elif manifest.images[name].get("failed"):
+                    # 有翻譯失敗的行：保留塗銷後的圖片，下次執行時重新翻譯
+                    partial_count += 1
+                else:
+                    manifest.update(name, status="done", lines=[])
+                    done_count += 1
+                    print(f"[{done_count}/{len(todo)}] {name}")
+            manifest.save()
+    manifest.save(force=True)
+    if not (error_count or partial_count):
+        shutil.rmtree(erased_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n完成 {done_count} 張，部分翻譯失敗 {partial_count} 張，錯誤 {error_count} 張，"
+          f"耗時 {elapsed:.1f} 秒 ({done_count / elapsed if elapsed else 0:.2f} 張/秒)")
+    print(f"結果已保存至 {output_dir}")
+    return 1 if error_count or partial_count else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
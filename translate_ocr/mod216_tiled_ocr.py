@@ -0,0 +1,102 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import mod201_ocr_engine
+import mod207_trace
+import mod210_text_regions
+
+# 大圖分塊辨識：把圖片切成上下重疊的橫條，由多個執行緒同時辨識，重疊部分的文字只保留一份
+TILE_MIN_PIXELS = 6_000_000  # 送進 OCR 的像素數 (縮放後) 超過此值才分塊
+MEMORY_BUDGET_MB = 2048  # 每個程序 OCR 工作記憶體的上限 (已載入的引擎 + 同時辨識中的橫條)
+BYTES_PER_PIXEL = 24  # 辨識時每個像素約需的記憶體 (RGB 輸入、灰階、二值化等中間影像)
+ENGINE_MB = 120  # 每個 tesseract 引擎 (traineddata) 約佔的記憶體
+MAX_WORKERS = os.cpu_count() or 1
+MIN_ENGINES = 2  # 多個程序平分時每個程序至少保留的引擎數 (辨識用的語言與 OSD 各一個，避免每張圖片重新載入)
+OVERLAP_LINES = 3  # 相鄰橫條重疊的高度 (一般文字行高的倍數)
+MIN_OVERLAP = 64  # 重疊的最小高度 (原圖像素)
+
+
+def plan_bands(height, width, scale=1.0):
+    # 回傳 ([(top, bottom, own_top, own_bottom), ...], 執行緒數)，座標為原圖的 y
+    # own_top / own_bottom 為該橫條負責的範圍 (以重疊部分的中線為界)，文字中心落在此範圍內才保留
+    # 文字行高不超過重疊高度的一半時，中心落在負責範圍內的文字一定完整包含在該橫條中
+    overlap = max(MIN_OVERLAP, math.ceil(OVERLAP_LINES * mod210_text_regions.TARGET_TEXT_HEIGHT / scale))
+    scaled_row = max(1.0, width * scale * scale)  # 原圖每一列在縮放後的像素數
+    budget = MEMORY_BUDGET_MB * 1024 * 1024
+    workers = max(1, min(MAX_WORKERS, mod201_ocr_engine.MAX_ENGINES))
+    loaded = mod201_ocr_engine.loaded_engines()
+
+    # 每個執行緒需要一個引擎與一個橫條，記憶體不足時減少同時辨識的數量
+    # 已載入的引擎 (其他語言或 OSD) 也佔用記憶體，引擎總數不超過 MAX_ENGINES (超過時會釋放閒置的引擎)
+    # (橫條太矮時重疊部分重複辨識的比例太高，至少保留重疊高度的 4 倍)
+    while True:
+        engines = min(mod201_ocr_engine.MAX_ENGINES, loaded + workers)
+        band_pixels = (budget - engines * ENGINE_MB * 1024 * 1024) / workers / BYTES_PER_PIXEL
+        max_rows = int(band_pixels / scaled_row) if band_pixels > 0 else 0
+        if max_rows >= 4 * overlap or workers == 1:
+            break
+        workers -= 1
+    max_rows = max(max_rows, 4 * overlap)
+
+    # 橫條數至少等於執行緒數 (每個核心都有工作)，且每條不超過記憶體上限，也不比重疊部分矮太多
+    count = max(workers, math.ceil((height - overlap) / (max_rows - overlap)))
+    count = max(1, min(count, (height - overlap) // (2 * overlap)))
+    band_height = math.ceil((height + (count - 1) * overlap) / count)
+
+    tops = [i * (band_height - overlap) for i in range(count)]
+    owns = [0] + [top + overlap // 2 for top in tops[1:]] + [height]
+    bands = [(top, height if i == count - 1 else min(height, top + band_height), owns[i], owns[i + 1])
+             for i, top in enumerate(tops)]
+    return bands, min(workers, count)
+
+def share_budget(processes):
+    # 多個程序同時辨識時 (例如 mod215_batch_translate 的工作程序)，記憶體上限、執行緒數與引擎數由各程序平分
+    global MEMORY_BUDGET_MB, MAX_WORKERS
+    processes = max(1, processes)
+    MEMORY_BUDGET_MB = MEMORY_BUDGET_MB // processes
+    MAX_WORKERS = max(1, MAX_WORKERS // processes)
+    mod201_ocr_engine.MAX_ENGINES = max(MIN_ENGINES, mod201_ocr_engine.MAX_ENGINES // processes)
+
+def merge_band_data(results, bands, width, height):
+    # 合併各橫條的辨識結果 (座標換算回原圖)，重疊部分只保留文字中心在負責範圍內的項目
+    # block_num 依橫條順序累加，不同橫條的行不會被視為同一行
+    data = {key: [] for key in mod201_ocr_engine.DATA_KEYS}
+    for key, value in zip(mod201_ocr_engine.DATA_KEYS, [1, 1, 0, 0, 0, 0, 0, 0, width, height, -1, '']):
+        data[key].append(value)
+
+    block_offset = 0
+    for band_data, (top, _, own_top, own_bottom) in zip(results, bands):
+        max_block = 0
+        for i in range(len(band_data['text'])):
+            if band_data['level'][i] == 1:
+                continue
+            y = band_data['top'][i] + top
+            if not own_top <= y + band_data['height'][i] // 2 < own_bottom:
+                continue
+            for key in mod201_ocr_engine.DATA_KEYS:
+                data[key].append(band_data[key][i])
+            data['top'][-1] = y
+            data['block_num'][-1] += block_offset
+            max_block = max(max_block, band_data['block_num'][i])
+        block_offset += max_block
+    return data
+
+def image_to_data(img, scale=1.0, **ocr_kwargs):
+    # 與 mod210_text_regions.image_to_data_scaled 相同，大圖改為分塊並行辨識
+    height, width = img.shape[:2]
+    if height * width * scale * scale <= TILE_MIN_PIXELS:
+        return mod210_text_regions.image_to_data_scaled(img, scale, **ocr_kwargs)
+    bands, workers = plan_bands(height, width, scale)
+    if len(bands) == 1:
+        return mod210_text_regions.image_to_data_scaled(img, scale, **ocr_kwargs)
+
+    def run(band):
+        top, bottom = band[:2]
+        with mod207_trace.span('ocr_band', top=top, bottom=bottom):
+            # 橫條為原圖的切片 (不複製)，縮放與轉換只針對該橫條
+            return mod210_text_regions.image_to_data_scaled(img[top:bottom], scale, **ocr_kwargs)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr_band") as pool:
+        results = list(pool.map(run, bands))
+    return merge_band_data(results, bands, width, height)
@@ -0,0 +1,68 @@
+import cv2
+from PIL import Image
+
+import mod201_ocr_engine
+import mod207_trace
+import mod210_text_regions
+
+# OCR 前先判斷主要的文字系統 (tesseract OSD)，只載入需要的 traineddata，並決定翻譯的原文語言
+DEFAULT_LANG = 'eng+chi_tra'  # 無法判斷或混合多種文字時使用 (原本的設定)
+MIN_SCRIPT_CONFIDENCE = 2.0  # OSD 信心度 (與第二名的差距) 低於此值時視為混合文字
+SAMPLE_MAX_PIXELS = 1_500_000  # 偵測用取樣圖的像素上限
+SAMPLE_MAX_REGIONS = 40  # 取樣圖最多包含的文字區域數
+# 不做偵測的 OCR 後端：pytesseract 每次偵測都要另外啟動一次 tesseract.exe，比只用預設語言辨識還慢
+SKIP_BACKENDS = {"pytesseract"}
+
+# 文字系統 -> (tesseract 語言, 翻譯的原文語言)；英文介面常夾雜在其他語言中，非拉丁文字一併加上 eng
+SCRIPT_LANGUAGES = {
+    'Latin': ('eng', '英文'),
+    'Han': (DEFAULT_LANG, '中文'),
+    'Japanese': ('jpn+eng', '日文'),
+    'Hiragana': ('jpn+eng', '日文'),
+    'Katakana': ('jpn+eng', '日文'),
+    'Korean': ('kor+eng', '韓文'),
+    'Hangul': ('kor+eng', '韓文'),
+    'Cyrillic': ('rus+eng', '俄文'),
+    'Thai': ('tha+eng', '泰文'),
+}
+
+_missing_warned = set()
+
+
+def build_sample(img, regions=None, scale=1.0):
+    # 取樣圖：文字區域拼成的圖 (沒有區域時為整張圖)，依 OCR 的縮放倍率調整文字大小，並限制像素數
+    if regions:
+        sample, _ = mod210_text_regions.build_mosaic(img, regions[:SAMPLE_MAX_REGIONS])
+    else:
+        sample = img
+    height, width = sample.shape[:2]
+    factor = scale
+    if height * width * factor * factor > SAMPLE_MAX_PIXELS:
+        factor = (SAMPLE_MAX_PIXELS / (height * width)) ** 0.5
+    if factor != 1.0:
+        interpolation = cv2.INTER_CUBIC if factor > 1 else cv2.INTER_AREA
+        sample = cv2.resize(sample, None, fx=factor, fy=factor, interpolation=interpolation)
+    return Image.fromarray(cv2.cvtColor(sample, cv2.COLOR_BGR2RGB))
+
+def detect_languages(img, regions=None, scale=1.0, backend=None):
+    # 回傳 (tesseract 語言, 原文語言)，無法判斷或後端不做偵測時回傳 (DEFAULT_LANG, None)
+    if mod201_ocr_engine.get_backend(backend).name in SKIP_BACKENDS:
+        return DEFAULT_LANG, None
+    with mod207_trace.span('script_detect'):
+        result = mod201_ocr_engine.detect_script(build_sample(img, regions, scale), backend)
+    if result is None:
+        return DEFAULT_LANG, None
+    script, confidence = result
+    if confidence < MIN_SCRIPT_CONFIDENCE or script not in SCRIPT_LANGUAGES:
+        return DEFAULT_LANG, None
+
+    lang, source_lang = SCRIPT_LANGUAGES[script]
+    installed = mod201_ocr_engine.available_languages(backend)
+    missing = set(lang.split('+')) - installed if installed is not None else set()
+    if missing:
+        # 沒有安裝對應的 traineddata 時仍以預設語言辨識
+        if lang not in _missing_warned:
+            _missing_warned.add(lang)
+            print(f"警告：偵測到 {script} 文字，但未安裝 {', '.join(sorted(missing))}.traineddata，使用 {DEFAULT_LANG}")
+        return DEFAULT_LANG, source_lang
+    return lang, source_lang
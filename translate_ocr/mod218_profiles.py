@@ -0,0 +1,187 @@
+import ctypes
+import fnmatch
+import json
+import os
+import sys
+import threading
+
+import mod210_text_regions
+import mod211_layout
+
+# 各應用程式的截圖設定檔：依前景視窗的標題或程序名稱選擇 OCR、分行與顏色分析的參數
+# 設定檔與快捷鍵設定放在同一個資料夾，可手動編輯，也可由 mod402_profile_tuner 自動產生
+PROFILE_FILE = os.path.join(os.path.dirname(__file__), "files", "config", "capture_profiles.json")
+DEFAULT_PROFILE = "預設"
+
+# 預設參數 (原本寫死在程式中的值)，設定檔中的 params 只需列出與預設不同的項目
+DEFAULT_PARAMS = {
+    # OCR
+    'psm': 6,
+    'oem': 3,
+    'blacklist': "●▲■□",
+    'text_detection': True,  # 只辨識偵測到的文字區域 (mod200_translate.USE_TEXT_DETECTION 關閉時無效)
+    'scale_normalization': True,  # OCR 前依文字大小縮放 (mod200_translate.USE_SCALE_NORMALIZATION 關閉時無效)
+    'target_text_height': mod210_text_regions.TARGET_TEXT_HEIGHT,
+    # 分行與段落 (見 mod211_layout)
+    'min_conf': mod211_layout.MIN_CONF,
+    'min_word_width': mod211_layout.MIN_WORD_WIDTH,
+    'horizontal_threshold': mod211_layout.HORIZONTAL_THRESHOLD,
+    'vertical_overlap': mod211_layout.VERTICAL_OVERLAP,
+    'paragraph_gap': mod211_layout.PARAGRAPH_GAP,
+    'paragraph_height_ratio': mod211_layout.PARAGRAPH_HEIGHT_RATIO,
+    # 顏色分析
+    'dark_background': 145,  # 背景灰度低於此值時視為深底淺字
+    'bright_background': 175,  # 背景灰度高於此值時文字顏色調深
+}
+
+# 設定檔範例：
+# {"profiles": [
+#     {"name": "遊戲", "match": {"process": ["game*.exe"], "title": ["*Launcher*"]}, "params": {"psm": 11}}
+# ]}
+# match 為不分大小寫的萬用字元樣式，依檔案中的順序使用第一個符合的設定檔，都不符合時使用預設參數
+
+
+def process_name(pid):
+    # 程序的執行檔名稱 (Windows)，無法取得時回傳 None
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+    if not handle:
+        return None
+    try:
+        size = ctypes.c_ulong(1024)
+        buffer = ctypes.create_unicode_buffer(size.value)
+        if not kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+            return None
+        return os.path.basename(buffer.value)
+    finally:
+        kernel32.CloseHandle(handle)
+
+def foreground_window():
+    # 回傳前景視窗的 (標題, 程序名稱)，非 Windows 或無法取得時為 (None, None)
+    # 必須在截圖視窗顯示之前呼叫，否則取得的是截圖視窗本身
+    if sys.platform != 'win32':
+        return None, None
+    try:
+        user32 = ctypes.windll.user32
+        hwnd = user32.GetForegroundWindow()
+        if not hwnd:
+            return None, None
+        length = user32.GetWindowTextLengthW(hwnd)
+        buffer = ctypes.create_unicode_buffer(length + 1)
+        user32.GetWindowTextW(hwnd, buffer, length + 1)
+        pid = ctypes.c_ulong()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return buffer.value, process_name(pid.value)
+    except OSError as e:
+        print(f"取得前景視窗時出錯: {e}")
+        return None, None
+
+def matches(patterns, value):
+    if not value:
+        return False
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return any(fnmatch.fnmatch(value.lower(), pattern.lower()) for pattern in patterns)
+
+
+class ProfileStore:
+    """截圖設定檔：從 JSON 讀取 (檔案修改後自動重新載入)，依視窗選擇設定檔並合併預設參數"""
+
+    def __init__(self, path=PROFILE_FILE):
+        self.path = path
+        self.profiles = []
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    def _reload(self):
+        # 設定檔不存在或修改時間不變時不重新讀取
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self.profiles, self.mtime = [], None
+            return
+        if mtime == self.mtime:
+            return
+        self.mtime = mtime
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                profiles = json.load(f).get("profiles", [])
+        except (OSError, ValueError) as e:
+            print(f"讀取截圖設定檔時出錯，使用預設參數: {e}")
+            profiles = []
+        self.profiles = [profile for profile in profiles if isinstance(profile, dict) and profile.get("name")]
+        for profile in self.profiles:
+            unknown = set(profile.get("params", {})) - set(DEFAULT_PARAMS)
+            if unknown:
+                print(f"截圖設定檔 {profile['name']} 含有未知的參數: {', '.join(sorted(unknown))}")
+
+    def names(self):
+        with self.lock:
+            self._reload()
+            return [profile["name"] for profile in self.profiles]
+
+    def select(self, title=None, process=None):
+        """依視窗標題與程序名稱選擇設定檔，回傳設定檔名稱"""
+        with self.lock:
+            self._reload()
+            for profile in self.profiles:
+                match = profile.get("match", {})
+                if matches(match.get("process", []), process) or matches(match.get("title", []), title):
+                    return profile["name"]
+        return DEFAULT_PROFILE
+
+    def params(self, name=None):
+        """設定檔的完整參數 (預設參數加上設定檔中的項目)，找不到時回傳預設參數
+        設定檔中也可以有名為 DEFAULT_PROFILE 的項目，用來調整沒有符合任何設定檔時的參數"""
+        params = dict(DEFAULT_PARAMS)
+        name = name or DEFAULT_PROFILE
+        with self.lock:
+            self._reload()
+            for profile in self.profiles:
+                if profile["name"] == name:
+                    params.update((key, value) for key, value in profile.get("params", {}).items()
+                                  if key in DEFAULT_PARAMS)
+                    return params
+        if name != DEFAULT_PROFILE:
+            print(f"找不到截圖設定檔 {name}，使用預設參數")
+        return params
+
+    def save_profile(self, name, params, match=None):
+        """新增或更新設定檔 (只保存與預設不同的參數)，match 為 None 時保留原本的比對規則"""
+        params = {key: value for key, value in params.items()
+                  if key in DEFAULT_PARAMS and value != DEFAULT_PARAMS[key]}
+        with self.lock:
+            self._reload()
+            profile = next((profile for profile in self.profiles if profile["name"] == name), None)
+            if profile is None:
+                profile = {"name": name, "match": {"title": [], "process": []}}
+                self.profiles.append(profile)
+            if match is not None:
+                profile["match"] = match
+            profile["params"] = params
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"profiles": self.profiles}, f, ensure_ascii=False, indent=4)
+            os.replace(temp_path, self.path)
+            self.mtime = os.path.getmtime(self.path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProfileStore()
+        return _store
+
+def current_profile():
+    # 依目前的前景視窗選擇設定檔，回傳設定檔名稱
+    title, process = foreground_window()
+    name = get_store().select(title, process)
+    if name != DEFAULT_PROFILE:
+        print(f"使用截圖設定檔 {name} ({process or ''} {title or ''})")
+    return name
@@ -0,0 +1,340 @@
+import contextlib
+import http.client
+import json
+import os
+import select
+import ssl
+import threading
+import time
+import urllib.parse
+
+import mod206_translate_dispatch
+import mod207_trace
+import mod208_metrics
+
+try:
+    from geminiAPI import translate_text as legacy_translate
+except ImportError:
+    legacy_translate = None
+
+# 翻譯服務：依 api_config.json 選擇 Gemini 或 GPT，每個服務各自保留 keep-alive 連線池
+# 常駐程序啟動時先完成 TCP 與 TLS 交握，之後定期檢查閒置的連線，截圖翻譯時不必重新連線
+API_CONFIG_FILE = os.path.join(os.path.dirname(__file__), "files", "config", "api_config.json")
+PROVIDER_ORDER = ("gemini", "gpt")  # 多個服務都啟用時的優先順序，前一個失敗時改用下一個
+BASE_URL_ENV = "TRANSLATE_API_BASE_URL"  # 設定時所有服務都連到此位址 (例如 mod403 的本機模擬伺服器)
+POOL_SIZE = mod206_translate_dispatch.MAX_CONCURRENCY  # 每個服務的連線數 (與同時送出的批次數相同)
+REQUEST_TIMEOUT = 60  # 秒
+KEEP_WARM_INTERVAL = 20  # 檢查閒置連線的間隔 (秒)
+MAX_IDLE_SECONDS = 240  # 閒置超過此時間的連線重新建立 (一般伺服器約 5 分鐘後關閉閒置連線)
+PROMPT_SEPARATOR = "\n-----\n"  # 提示與原文之間的分隔 (模擬伺服器以此取出原文)
+LEGACY_NAME = "gemini-legacy"  # 沒有啟用任何服務時使用的 geminiAPI 模組 (翻譯快取與結果快取以此區分)
+
+
+def build_prompt(text, target_lang, source_lang=None):
+    # 批次翻譯的格式說明 (編號 JSON) 已包含在 text 中 (見 mod206_translate_dispatch.build_request)
+    source = f"{source_lang}" if source_lang else "原文"
+    return (f"請將以下{source}翻譯成{target_lang}，依照內容中的格式說明回傳，不要加上其他說明。"
+            + PROMPT_SEPARATOR + text)
+
+
+class ConnectionPool:
+    """單一主機的 keep-alive 連線池 (HTTP/1.1)，用完的連線放回池中重複使用"""
+
+    def __init__(self, base_url, size=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+        parts = urllib.parse.urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.size = size
+        self.timeout = timeout
+        self.ssl_context = ssl.create_default_context() if self.https else None
+        self.idle = []  # [(連線, 放回的時間)]，後放回的先使用
+        self.created = 0
+        self.condition = threading.Condition()
+
+    def _new_connection(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    @contextlib.contextmanager
+    def connection(self):
+        # 取得一個連線 (沒有閒置的連線且已達上限時等待)，發生錯誤時關閉該連線
+        with self.condition:
+            while not self.idle and self.created >= self.size:
+                self.condition.wait()
+            if self.idle:
+                conn, _ = self.idle.pop()
+            else:
+                conn = self._new_connection()
+                self.created += 1
+        ok = False
+        try:
+            yield conn
+            ok = True
+        finally:
+            with self.condition:
+                if ok:
+                    self.idle.append((conn, time.monotonic()))
+                else:
+                    conn.close()
+                    self.created -= 1
+                self.condition.notify()
+
+    def request(self, method, path, body=None, headers=None):
+        # 回傳 (狀態碼, 回應內容)；重複使用的連線已被伺服器關閉時重新連線並重送一次
+        for attempt in range(2):
+            with self.connection() as conn:
+                reused = conn.sock is not None
+                if not reused:
+                    mod208_metrics.increment('api_cold_connects')
+                try:
+                    conn.request(method, self.prefix + path, body=body, headers=headers or {})
+                    response = conn.getresponse()
+                    data = response.read()
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, ssl.SSLEOFError):
+                    # HTTPS 連線被伺服器關閉時為 SSLEOFError
+                    if not reused or attempt:
+                        raise
+                    conn.close()  # 放回池中，下次使用時 http.client 會自動重新連線
+                    continue
+                if response.will_close:
+                    conn.close()
+                return response.status, data
+
+    def _connect(self, conn):
+        # 失敗時保持未連線的狀態，下次使用時 http.client 會自動重新連線
+        try:
+            with mod207_trace.span('api_preconnect', host=self.host):
+                conn.connect()
+        except OSError as e:
+            print(f"預先連線到 {self.host} 失敗: {e}")
+            conn.close()
+
+    def preconnect(self):
+        # 事先完成 TCP 與 TLS 交握：補足連線數，並重新連線閒置中已關閉的連線，每完成一個就放回池中
+        with self.condition:
+            pending = [conn for conn, _ in self.idle if conn.sock is None]
+            self.idle = [entry for entry in self.idle if entry[0].sock is not None]
+            missing = self.size - self.created
+            self.created += missing
+        pending += [self._new_connection() for _ in range(missing)]
+        for conn in pending:
+            self._connect(conn)
+            with self.condition:
+                self.idle.append((conn, time.monotonic()))
+                self.condition.notify()
+
+    def refresh(self, max_idle=MAX_IDLE_SECONDS):
+        # 閒置太久或已被伺服器關閉 (socket 可讀取) 的連線重新建立
+        now = time.monotonic()
+        with self.condition:
+            stale = [entry for entry in self.idle
+                     if entry[0].sock is not None and (now - entry[1] > max_idle or _is_closed(entry[0].sock))]
+            for entry in stale:
+                self.idle.remove(entry)
+        for conn, _ in stale:
+            conn.close()
+            self._connect(conn)
+            with self.condition:
+                self.idle.insert(0, (conn, time.monotonic()))
+                self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            for conn, _ in self.idle:
+                conn.close()
+            self.created -= len(self.idle)
+            self.idle = []
+
+def _is_closed(sock):
+    # 閒置中的連線不應該有資料可讀，可讀取表示伺服器已關閉連線
+    # TLS 1.3 的伺服器在交握後會送出 NewSessionTicket，連線正常時 socket 也可讀取：
+    # 以非阻塞方式讀取，SSL 層處理完 ticket 後沒有資料 (SSLWantReadError) 表示連線正常
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    if not readable:
+        return False
+    if not isinstance(sock, ssl.SSLSocket):
+        return True
+    timeout = sock.gettimeout()
+    try:
+        sock.settimeout(0)
+        sock.recv(1)  # 讀到 b'' (已關閉) 或多餘的資料 (無法再使用) 都視為已關閉
+        return True
+    except ssl.SSLWantReadError:
+        return False
+    except OSError:
+        return True
+    finally:
+        try:
+            sock.settimeout(timeout)
+        except OSError:
+            pass
+
+
+class HttpProvider:
+    """以 HTTP API 翻譯的服務"""
+    name = None
+    default_base_url = None
+    default_model = None
+
+    def __init__(self, api_key, base_url=None, model=None):
+        self.api_key = api_key
+        self.model = model or self.default_model
+        self.pool = ConnectionPool(base_url or self.default_base_url)
+
+    def translate(self, text, target_lang, source_lang=None):
+        body = json.dumps(self.build_payload(build_prompt(text, target_lang, source_lang)), ensure_ascii=False)
+        headers = dict(self.headers(), **{"Content-Type": "application/json; charset=utf-8"})
+        with mod207_trace.span('api_request', provider=self.name):
+            status, data = self.pool.request("POST", self.path(), body.encode('utf-8'), headers)
+        if status != 200:
+            raise RuntimeError(f"{self.name} API 錯誤 {status}: {data[:200].decode('utf-8', 'replace')}")
+        try:
+            return self.parse(json.loads(data))
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise RuntimeError(f"{self.name} API 回應格式錯誤: {e}")
+
+    def preconnect(self):
+        self.pool.preconnect()
+
+    def close(self):
+        self.pool.close()
+
+
+class GeminiProvider(HttpProvider):
+    """Google Gemini (generateContent)"""
+    name = "gemini"
+    default_base_url = "https://generativelanguage.googleapis.com"
+    default_model = "gemini-2.0-flash"
+
+    def path(self):
+        return f"/v1beta/models/{self.model}:generateContent"
+
+    def headers(self):
+        return {"x-goog-api-key": self.api_key}
+
+    def build_payload(self, prompt):
+        return {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+    def parse(self, data):
+        return "".join(part.get("text", "") for part in data["candidates"][0]["content"]["parts"])
+
+
+class GptProvider(HttpProvider):
+    """OpenAI GPT (chat/completions)"""
+    name = "gpt"
+    default_base_url = "https://api.openai.com"
+    default_model = "gpt-4o-mini"
+
+    def path(self):
+        return "/v1/chat/completions"
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def build_payload(self, prompt):
+        return {"model": self.model, "messages": [{"role": "user", "content": prompt}]}
+
+    def parse(self, data):
+        return data["choices"][0]["message"]["content"]
+
+
+# 名稱 -> 服務類別 (api_config.json 中的 "名稱" 為 API key，"名稱_enabled" 為是否啟用)
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "gpt": GptProvider,
+}
+
+_providers = []  # 啟用中的服務 (依 PROVIDER_ORDER 排序)
+_config_mtime = -1.0  # 設定檔的修改時間 (None 為沒有設定檔)，-1 為尚未讀取
+_lock = threading.Lock()
+_keep_warm_thread = None
+
+def register_provider(name, provider_class):
+    PROVIDERS[name] = provider_class
+
+def load_config():
+    # 讀取 api_config.json (修改後重新載入並重建連線池)，回傳啟用中的服務
+    global _providers, _config_mtime
+    with _lock:
+        try:
+            mtime = os.path.getmtime(API_CONFIG_FILE)
+        except OSError:
+            mtime = None
+        if mtime == _config_mtime:
+            return list(_providers)
+        _config_mtime = mtime
+
+        config = {}
+        if mtime is not None:
+            try:
+                with open(API_CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"讀取 API 設定時出錯: {e}")
+
+        for provider in _providers:
+            provider.close()
+        base_url = os.environ.get(BASE_URL_ENV)
+        order = list(PROVIDER_ORDER) + [name for name in PROVIDERS if name not in PROVIDER_ORDER]
+        _providers = [
+            PROVIDERS[name](config[name], base_url or config.get(f"{name}_base_url"), config.get(f"{name}_model"))
+            for name in order
+            if name in PROVIDERS and config.get(f"{name}_enabled") and config.get(name)
+        ]
+        return list(_providers)
+
+def current_name():
+    # 目前優先使用的服務名稱 (翻譯快取以此區分)，沒有啟用的服務時為 geminiAPI 模組
+    # geminiAPI 模組的模型與提示都與 Gemini 服務不同，譯文不共用
+    providers = load_config()
+    return providers[0].name if providers else LEGACY_NAME
+
+def legacy(text, target_lang, source_lang=None):
+    # geminiAPI 模組 (原本的方式) 只接受原文與目標語言，由模型自行判斷原文語言
+    if legacy_translate is None:
+        raise RuntimeError(f"未設定翻譯 API，請在 {API_CONFIG_FILE} 輸入 API key")
+    return legacy_translate(text, target_lang)
+
+def translate(text, target_lang, source_lang=None):
+    # 依序使用啟用中的服務翻譯，沒有設定任何服務時使用 geminiAPI 模組 (原本的方式)
+    providers = load_config()
+    if not providers:
+        return legacy(text, target_lang, source_lang)
+
+    last_error = None
+    for provider in providers:
+        try:
+            return provider.translate(text, target_lang, source_lang)
+        except (OSError, http.client.HTTPException, RuntimeError) as e:
+            print(f"{provider.name} 翻譯時發生錯誤: {e}")
+            mod208_metrics.increment('api_provider_errors')
+            last_error = e
+    raise last_error
+
+def keep_warm():
+    # 背景執行緒：定期重建閒置太久或已關閉的連線 (設定檔修改後也會重新預先連線)
+    while True:
+        time.sleep(KEEP_WARM_INTERVAL)
+        for provider in load_config():
+            provider.pool.refresh()
+            provider.preconnect()
+
+def preconnect():
+    # 常駐程序啟動時呼叫：在背景預先連線，並開始定期檢查閒置的連線
+    global _keep_warm_thread
+
+    def run():
+        for provider in load_config():
+            provider.preconnect()
+
+    threading.Thread(target=run, daemon=True, name="api_preconnect").start()
+    with _lock:
+        if _keep_warm_thread is None:
+            _keep_warm_thread = threading.Thread(target=keep_warm, daemon=True, name="api_keep_warm")
+            _keep_warm_thread.start()
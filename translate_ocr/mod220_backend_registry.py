@@ -0,0 +1,57 @@
+import threading
+
+# 可替換的後端登錄表 (OCR 後端與截圖後端共用)：依名稱建立並快取後端，
+# 未指定名稱時依優先順序自動選擇，無法使用的後端之後略過，改用下一個
+
+
+class BackendRegistry:
+    """名稱 -> 後端類別的登錄表，自動選擇時初始化或執行失敗的後端改用下一個"""
+
+    def __init__(self, label, backends, fallback_order):
+        self.label = label  # 訊息中的後端種類，例如 "OCR 後端"
+        self.backends = backends  # 名稱 -> 類別 (與模組的 BACKENDS 為同一個 dict)
+        self.fallback_order = fallback_order  # 自動選擇的順序，最後一個為最終的備援
+        self.instances = {}
+        self.failed = set()  # 自動選擇時失敗、之後略過的後端
+        self.lock = threading.Lock()
+
+    def register(self, name, backend_class):
+        self.backends[name] = backend_class
+
+    def get(self, name=None):
+        # 取得 (並快取) 後端，未指定時依 fallback_order 選擇第一個可以建立的後端
+        candidates = [name] if name else self.fallback_order
+        with self.lock:
+            for candidate in candidates:
+                if not name and candidate in self.failed:
+                    continue
+                if candidate in self.instances:
+                    return self.instances[candidate]
+                try:
+                    backend = self.backends[candidate]()
+                except (KeyError, RuntimeError) as e:
+                    if name:
+                        raise ValueError(f"無法使用{self.label} {candidate}: {e}")
+                    continue
+                self.instances[candidate] = backend
+                return backend
+        raise ValueError(f"沒有可用的{self.label}")
+
+    def run(self, name, call):
+        # 以選擇的後端執行 call(後端)；自動選擇的後端拋出 RuntimeError 時標記為失敗並改用下一個
+        # 指定名稱或已是最後的備援時直接拋出
+        while True:
+            selected = self.get(name)
+            try:
+                return call(selected)
+            except RuntimeError as e:
+                if name or selected.name == self.fallback_order[-1]:
+                    raise
+                print(f"{self.label} {selected.name} 無法使用，改用備援後端: {e}")
+                with self.lock:
+                    self.failed.add(selected.name)
+
+    def loaded(self):
+        # 目前已建立的後端
+        with self.lock:
+            return list(self.instances.values())
@@ -4,12 +4,14 @@ import subprocess
 import keyboard
 import threading
 import json
+import time
+from multiprocessing.connection import Listener
 from PyQt5.QtWidgets import (QApplication, QSystemTrayIcon, QMenu, QAction, QMainWindow, 
                             QLabel, QVBoxLayout, QWidget, QPushButton, QLineEdit, 
                             QHBoxLayout, QGroupBox, QGridLayout, QFrame, QMessageBox, 
                             QStackedWidget, QCheckBox)
 from PyQt5.QtGui import QIcon, QKeySequence, QFont
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 class TrayApp(QMainWindow):
     def __init__(self, app):
@@ -22,6 +24,7 @@ class TrayApp(QMainWindow):
             "複製翻譯": "shift+c",
             "複製原文": "ctrl+c",
             "智慧濾鏡": "alt+f",
+            "監看翻譯": "alt+w",
             # "快速保存": "ctrl+shift+s"
         }
         
@@ -40,6 +43,11 @@ class TrayApp(QMainWindow):
         self.current_process = None
         self.is_editing_hotkey = False
         self.hotkey_inputs = {}
+        self.hotkey_handles = {}  # 動作 -> keyboard.add_hotkey 回傳的 handle (移除註冊時使用)
+        self.worker_process = None
+        self.worker_conn = None
+        self.worker_send_lock = threading.Lock()  # 快捷鍵與統計資料計時器可能同時傳送訊息
+        self.worker_metrics = None  # 常駐程序最近一次回報的統計資料
         
         # 設定應用圖標
         self.app_icon = QIcon("files/icons/mod300_icon.png")
@@ -53,6 +61,9 @@ class TrayApp(QMainWindow):
         
         # 註冊快捷鍵
         self.register_screenshot_hotkey()
+        
+        # 啟動常駐翻譯程序
+        self.start_translate_worker()
 
     def setup_tray_icon(self):
         """設定系統托盤圖示"""
@@ -136,6 +147,24 @@ class TrayApp(QMainWindow):
         self.api_btn.clicked.connect(lambda: self.show_page("api"))
         menu_layout.addWidget(self.api_btn)
         
+        self.metrics_btn = QPushButton(" 效能統計")
+        self.metrics_btn.setFont(QFont("Arial", 10))
+        self.metrics_btn.setMinimumHeight(40)
+        self.metrics_btn.setIcon(QIcon("files/icons/03_chart.png"))  # 假設有圖標
+        self.metrics_btn.setStyleSheet("""
+            QPushButton {
+                border: none;
+                text-align: left;
+                padding: 8px;
+                border-radius: 4px;
+            }
+            QPushButton:hover {
+                background-color: #f0f0f0;
+            }
+        """)
+        self.metrics_btn.clicked.connect(lambda: self.show_page("metrics"))
+        menu_layout.addWidget(self.metrics_btn)
+        
         # 添加更多選單按鈕
         menu_buttons = [
             (" 智慧濾鏡", None, "files/icons/screenshot.png"),
@@ -188,6 +217,11 @@ class TrayApp(QMainWindow):
         self.setup_api_page()
         self.content_stack.addWidget(self.api_page)
         
+        # 創建效能統計頁面
+        self.metrics_page = QWidget()
+        self.setup_metrics_page()
+        self.content_stack.addWidget(self.metrics_page)
+        
         h_layout.addWidget(self.content_stack)
         h_layout.setStretch(0, 1)  # 左側選單佔比
         h_layout.setStretch(2, 4)  # 右側內容區域佔比
@@ -414,6 +448,119 @@ class TrayApp(QMainWindow):
         layout.addLayout(save_layout)
         layout.addStretch()
 
+    def setup_metrics_page(self):
+        """設置效能統計頁面"""
+        layout = QVBoxLayout(self.metrics_page)
+        layout.setSpacing(15)
+        
+        # 標題
+        title_label = QLabel("效能統計")
+        title_label.setFont(QFont("Arial", 14, QFont.Bold))
+        title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title_label)
+        
+        # 延遲百分位數 (最近的截圖)
+        latency_group = QGroupBox("延遲 (毫秒)")
+        latency_layout = QGridLayout()
+        latency_layout.setVerticalSpacing(6)
+        latency_layout.setHorizontalSpacing(10)
+        
+        for column, header in enumerate(["項目", "p50", "p95", "p99", "次數"]):
+            header_label = QLabel(header)
+            header_label.setFont(QFont("Arial", 10, QFont.Bold))
+            latency_layout.addWidget(header_label, 0, column)
+        
+        # 統計名稱 -> 顯示名稱
+        self.metrics_rows = [
+            ("capture", "截圖總計"),
+            ("first_preview", "首次預覽"),
+            ("stage.ocr", "OCR"),
+            ("stage.grouping", "分行"),
+            ("stage.color", "顏色分析"),
+            ("stage.fill", "塗銷"),
+            ("stage.translate", "翻譯"),
+            ("stage.render", "繪製"),
+        ]
+        self.metrics_labels = {}
+        for row, (name, title) in enumerate(self.metrics_rows, 1):
+            latency_layout.addWidget(QLabel(title), row, 0)
+            labels = []
+            for column in range(1, 5):
+                value_label = QLabel("-")
+                value_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                latency_layout.addWidget(value_label, row, column)
+                labels.append(value_label)
+            self.metrics_labels[name] = labels
+        
+        latency_layout.setColumnStretch(0, 2)
+        latency_group.setLayout(latency_layout)
+        layout.addWidget(latency_group)
+        
+        # 快取、API 與記憶體
+        summary_group = QGroupBox("")
+        summary_layout = QGridLayout()
+        summary_layout.setVerticalSpacing(6)
+        self.metrics_summary_labels = {}
+        for row, (key, title) in enumerate([("cache", "翻譯快取命中率"), ("result_cache", "畫面快取命中率"),
+                                            ("api", "API 請求 / 錯誤 / 重試"),
+                                            ("failures", "翻譯失敗行數"), ("memory", "常駐程序記憶體")]):
+            summary_layout.addWidget(QLabel(title), row, 0)
+            value_label = QLabel("-")
+            value_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            summary_layout.addWidget(value_label, row, 1)
+            self.metrics_summary_labels[key] = value_label
+        summary_group.setLayout(summary_layout)
+        layout.addWidget(summary_group)
+        
+        # 狀態提示
+        self.metrics_status_label = QLabel("尚未收到常駐翻譯程序的統計資料")
+        self.metrics_status_label.setFont(QFont("Arial", 10))
+        self.metrics_status_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.metrics_status_label)
+        layout.addStretch()
+        
+        # 頁面顯示時每秒向常駐程序要求一次統計資料並更新
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.poll_worker_metrics)
+
+    def poll_worker_metrics(self):
+        """要求常駐程序回報目前的統計資料 (回覆由 read_worker_replies 接收)，並以最近收到的資料更新頁面"""
+        if self.worker_conn is not None:
+            self.send_to_worker({"cmd": "metrics"})
+        self.refresh_metrics_page()
+
+    def refresh_metrics_page(self):
+        """以常駐程序最近回報的統計資料更新效能統計頁面"""
+        metrics = self.worker_metrics
+        if metrics is None:
+            return
+        
+        histograms = metrics.get("histograms", {})
+        for name, labels in self.metrics_labels.items():
+            summary = histograms.get(name)
+            if summary is None:
+                continue
+            for label, key in zip(labels, ["p50", "p95", "p99"]):
+                value = summary.get(key)
+                label.setText("-" if value is None else f"{value * 1000:.1f}")
+            labels[3].setText(str(summary.get("count", 0)))
+        
+        counters = metrics.get("counters", {})
+        hits = counters.get("cache_hits", 0)
+        total = hits + counters.get("cache_misses", 0)
+        self.metrics_summary_labels["cache"].setText(f"{hits / total:.0%} ({hits}/{total})" if total else "-")
+        hits = counters.get("result_cache_hits", 0)
+        total = hits + counters.get("result_cache_misses", 0)
+        self.metrics_summary_labels["result_cache"].setText(f"{hits / total:.0%} ({hits}/{total})" if total else "-")
+        self.metrics_summary_labels["api"].setText(
+            f"{counters.get('api_requests', 0)} / {counters.get('api_errors', 0)} / {counters.get('api_retries', 0)}")
+        self.metrics_summary_labels["failures"].setText(str(counters.get("translate_failures", 0)))
+        memory = metrics.get("gauges", {}).get("memory_mb")
+        self.metrics_summary_labels["memory"].setText("-" if memory is None else f"{memory:.0f} MB")
+        
+        updated = time.strftime("%H:%M:%S", time.localtime(metrics.get("timestamp", time.time())))
+        self.metrics_status_label.setText(f"最後更新: {updated}")
+
     def toggle_password_visibility(self, input_field, button):
         """切換密碼顯示/隱藏"""
         if input_field.echoMode() == QLineEdit.Password:
@@ -434,7 +581,7 @@ class TrayApp(QMainWindow):
     def show_page(self, page_name):
         """顯示指定的頁面"""
         # 重置所有按鈕樣式
-        for btn in [self.hotkey_btn, self.api_btn]:
+        for btn in [self.hotkey_btn, self.api_btn, self.metrics_btn]:
             btn.setStyleSheet("""
                 QPushButton {
                     border: none;
@@ -471,6 +618,25 @@ class TrayApp(QMainWindow):
                     color: white;
                 }
             """)
+        elif page_name == "metrics":
+            self.content_stack.setCurrentWidget(self.metrics_page)
+            self.metrics_btn.setStyleSheet("""
+                QPushButton {
+                    border: none;
+                    text-align: left;
+                    padding: 8px;
+                    border-radius: 4px;
+                    background-color: #4285f4;
+                    color: white;
+                }
+            """)
+        
+        # 只在效能統計頁面顯示時定時更新
+        if page_name == "metrics":
+            self.refresh_metrics_page()
+            self.metrics_timer.start(1000)
+        else:
+            self.metrics_timer.stop()
 
     def save_api_settings(self):
         """保存API設定"""
@@ -488,7 +654,9 @@ class TrayApp(QMainWindow):
             QMessageBox.warning(self, "設定錯誤", "請輸入GPT API Key！")
             return
         
+        # 保留設定檔中其他的項目 (例如 gemini_model、gpt_base_url，見 mod219_translate_providers)
         self.api_keys = {
+            **self.api_keys,
             "gemini": self.gemini_key_input.text().strip(),
             "gemini_enabled": self.gemini_enabled.isChecked(),
             "gpt": self.gpt_key_input.text().strip(),
@@ -552,14 +720,30 @@ class TrayApp(QMainWindow):
             self.show()
             self.activateWindow()  # 確保視窗獲得焦點
 
+    def unregister_hotkey(self, action):
+        """移除特定動作已註冊的快捷鍵"""
+        handle = self.hotkey_handles.pop(action, None)
+        if handle is not None:
+            try:
+                keyboard.remove_hotkey(handle)
+            except:
+                pass
+
+    def unregister_all_hotkeys(self):
+        """移除所有已註冊的快捷鍵"""
+        for action in list(self.hotkey_handles):
+            self.unregister_hotkey(action)
+
     def register_screenshot_hotkey(self):
-        """註冊所有快捷鍵"""
+        """註冊所有快捷鍵 (先移除之前的註冊，避免同一個快捷鍵觸發多次)"""
         # 設置編輯狀態為False
         self.is_editing_hotkey = False
+        self.unregister_all_hotkeys()
         
         # 定義功能與對應的腳本路徑
         hotkey_functions = {
-            "截圖翻譯": {"function": self.execute_script, "args": ["mod203_translate_ocr.py"]},
+            "截圖翻譯": {"function": self.execute_translate_job, "args": []},
+            "監看翻譯": {"function": self.execute_translate_job, "args": ["watch"]},
             "智慧濾鏡": {"function": self.execute_script, "args": ["mod204_filter_image.py"]},
             # 可以在這裡添加更多功能
             # "複製翻譯": {"function": self.some_function, "args": [...]},
@@ -572,12 +756,12 @@ class TrayApp(QMainWindow):
                 try:
                     func = hotkey_functions[action]["function"]
                     args = hotkey_functions[action]["args"]
-                    keyboard.add_hotkey(hotkey, func, args=args)
+                    self.hotkey_handles[action] = keyboard.add_hotkey(hotkey, func, args=args)
                 except Exception as e:
                     self.status_label.setText(f"註冊快捷鍵錯誤 ({action}): {e}")
                     self.status_label.setStyleSheet("color: #f44336;")
 
-    def execute_script(self, script_name):
+    def execute_script(self, script_name, *script_args):
         """執行指定的腳本"""
         # 如果正在編輯快捷鍵或已經在執行中，不執行功能
         if self.is_editing_hotkey or self.is_executing:
@@ -589,7 +773,7 @@ class TrayApp(QMainWindow):
         try:
             # 執行腳本
             script_path = os.path.join(os.path.dirname(__file__), script_name)
-            self.current_process = subprocess.Popen([sys.executable, script_path], shell=True)
+            self.current_process = subprocess.Popen([sys.executable, script_path, *script_args], shell=True)
             
             # 創建監控線程
             monitor_thread = threading.Thread(target=self.monitor_process, args=(self.current_process,))
@@ -606,6 +790,118 @@ class TrayApp(QMainWindow):
         self.is_executing = False
         self.current_process = None
 
+    def start_translate_worker(self):
+        """啟動常駐翻譯程序，模組與字型只需載入一次"""
+        try:
+            authkey = os.urandom(16)
+            listener = Listener(("127.0.0.1", 0), authkey=authkey)
+            port = listener.address[1]
+            
+            env = os.environ.copy()
+            env["TRANSLATE_WORKER_AUTHKEY"] = authkey.hex()
+            worker_path = os.path.join(os.path.dirname(__file__), "mod205_translate_worker.py")
+            self.worker_process = subprocess.Popen([sys.executable, worker_path, str(port)], env=env)
+            
+            # 等待常駐程序連線 (不阻塞 UI)
+            accept_thread = threading.Thread(target=self.accept_worker, args=(listener,))
+            accept_thread.daemon = True
+            accept_thread.start()
+        except Exception as e:
+            print(f"啟動常駐翻譯程序時發生錯誤: {e}")
+            self.worker_process = None
+
+    def accept_worker(self, listener):
+        """接受常駐翻譯程序的連線"""
+        try:
+            conn = listener.accept()
+            # 常駐程序連線後先回報一次統計資料，之後才開始接受截圖工作
+            self.update_worker_metrics(conn.recv())
+            self.worker_conn = conn
+            # 之後的回覆 (截圖結束、統計資料) 都由同一個執行緒接收
+            reader_thread = threading.Thread(target=self.read_worker_replies, args=(conn,))
+            reader_thread.daemon = True
+            reader_thread.start()
+        except Exception as e:
+            print(f"常駐翻譯程序連線失敗: {e}")
+        finally:
+            listener.close()
+
+    def execute_translate_job(self, mode="capture"):
+        """截圖翻譯 (capture) 或監看翻譯 (watch)：優先交給常駐程序，尚未就緒時改用單次執行腳本"""
+        if self.is_editing_hotkey or self.is_executing:
+            return
+        
+        script_args = ["--watch"] if mode == "watch" else []
+        if self.worker_conn is None or self.worker_process is None or self.worker_process.poll() is not None:
+            # 常駐程序已結束時重新啟動，供下一次截圖使用
+            if self.worker_process is not None and self.worker_process.poll() is not None:
+                self.worker_conn = None
+                self.start_translate_worker()
+            self.execute_script("mod203_translate_ocr.py", *script_args)
+            return
+        
+        # 截圖流程結束時由 read_worker_replies 重置執行狀態
+        self.is_executing = True
+        if not self.send_to_worker({"cmd": mode}):
+            self.is_executing = False
+            self.execute_script("mod203_translate_ocr.py", *script_args)
+
+    def send_to_worker(self, message):
+        """傳送訊息給常駐程序，失敗時回傳 False"""
+        conn = self.worker_conn
+        if conn is None:
+            return False
+        try:
+            with self.worker_send_lock:
+                conn.send(message)
+            return True
+        except Exception as e:
+            print(f"傳送訊息給常駐翻譯程序時發生錯誤: {e}")
+            self.worker_conn = None
+            return False
+
+    def read_worker_replies(self, conn):
+        """接收常駐程序的回覆：截圖流程結束 (done / error) 與統計資料 (metrics)"""
+        while True:
+            try:
+                reply = conn.recv()
+            except (EOFError, OSError):
+                break
+            self.update_worker_metrics(reply)
+            status = reply.get("status")
+            if status == "error":
+                print(f"常駐翻譯程序錯誤: {reply.get('error')}")
+            if status in ("done", "error"):
+                self.is_executing = False
+        # 不是由 stop_translate_worker 關閉的連線表示常駐程序已中斷
+        if self.worker_conn is conn:
+            print("常駐翻譯程序中斷")
+            self.worker_conn = None
+        self.is_executing = False
+
+    def update_worker_metrics(self, reply):
+        """保存常駐程序回報的統計資料 (由效能統計頁面的計時器讀取)"""
+        if isinstance(reply, dict) and reply.get("metrics"):
+            self.worker_metrics = reply["metrics"]
+
+    def stop_translate_worker(self):
+        """結束常駐翻譯程序"""
+        if self.worker_conn is not None:
+            conn = self.worker_conn
+            self.worker_conn = None
+            try:
+                with self.worker_send_lock:
+                    conn.send({"cmd": "quit"})
+                conn.close()
+            except Exception:
+                pass
+        if self.worker_process is not None:
+            try:
+                self.worker_process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                self.worker_process.kill()
+            self.worker_process = None
+
     def eventFilter(self, obj, event):
         """事件過濾器，用於捕獲按鍵事件"""
         # 檢查是否是輸入框的點擊事件
@@ -623,13 +919,9 @@ class TrayApp(QMainWindow):
                 self.status_label.setText(f"請按下新的快捷鍵組合 ({action})，當前: {self.hotkey_inputs[action].text()}")
                 self.status_label.setStyleSheet("color: #2196F3;")
                 
-                # 設置編輯狀態為True並暫時移除快捷鍵註冊
+                # 設置編輯狀態為True並暫時移除所有快捷鍵註冊
                 self.is_editing_hotkey = True
-                if self.current_hotkeys["截圖翻譯"]:
-                    try:
-                        keyboard.remove_hotkey(self.current_hotkeys["截圖翻譯"])
-                    except:
-                        pass
+                self.unregister_all_hotkeys()
                 
                 return True
         
@@ -664,7 +956,7 @@ class TrayApp(QMainWindow):
                     self.hotkey_inputs[self.current_editing].setStyleSheet("")
                     self.current_editing = None
                     
-                    # 重新註冊截圖翻譯的快捷鍵
+                    # 重新註冊所有快捷鍵
                     self.register_screenshot_hotkey()
                 return True
             
@@ -720,7 +1012,7 @@ class TrayApp(QMainWindow):
         # 重置編輯狀態
         self.current_editing = None
         
-        # 重新註冊截圖翻譯的快捷鍵
+        # 重新註冊所有快捷鍵
         self.register_screenshot_hotkey()
         
         self.status_label.setText(f"已設定並儲存 {action} 的快捷鍵為: {new_hotkey}")
@@ -746,12 +1038,8 @@ class TrayApp(QMainWindow):
         # 清空輸入框
         self.hotkey_inputs[action].clear()
         
-        # 如果是截圖翻譯的快捷鍵，移除註冊
-        if action == "截圖翻譯" and self.current_hotkeys[action]:
-            try:
-                keyboard.remove_hotkey(self.current_hotkeys[action])
-            except:
-                pass
+        # 移除該動作的快捷鍵註冊
+        self.unregister_hotkey(action)
         
         # 更新快捷鍵字典
         self.current_hotkeys[action] = ""
@@ -781,14 +1069,12 @@ class TrayApp(QMainWindow):
             )
             
             if reply == QMessageBox.No:
+                # 取消編輯狀態，重新註冊所有快捷鍵
+                self.register_screenshot_hotkey()
                 return
                 
-            # 移除截圖翻譯的快捷鍵
-            if self.current_hotkeys["截圖翻譯"]:
-                try:
-                    keyboard.remove_hotkey(self.current_hotkeys["截圖翻譯"])
-                except:
-                    pass
+            # 移除所有快捷鍵的註冊
+            self.unregister_all_hotkeys()
             
             # 恢復默認快捷鍵
             self.current_hotkeys = self.default_hotkeys.copy()
@@ -800,7 +1086,7 @@ class TrayApp(QMainWindow):
             for action, hotkey in self.current_hotkeys.items():
                 self.hotkey_inputs[action].setText(hotkey)
             
-            # 重新註冊截圖翻譯的快捷鍵
+            # 重新註冊所有快捷鍵
             self.register_screenshot_hotkey()
             
             self.status_label.setText("已恢復所有快捷鍵為默認設定！")
@@ -812,6 +1098,7 @@ class TrayApp(QMainWindow):
     def exit_app(self):
         """退出應用程式"""
         self.tray_icon.hide()
+        self.stop_translate_worker()
         self.app.quit()
 
     def load_hotkey_config(self):
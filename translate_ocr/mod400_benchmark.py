@@ -0,0 +1,257 @@
+import argparse
+import contextlib
+import difflib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+import mod200_translate
+import mod201_ocr_engine
+import mod403_mock_translate_server
+
+# 測試畫面的參數組合
+RESOLUTIONS = {
+    "small": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+DENSITIES = {"sparse": 0.15, "dense": 0.7}  # 每個文字欄位放入文字的機率
+THEMES = {
+    # 背景色, 文字色
+    "light": ((245, 245, 245), [(20, 20, 20), (30, 60, 150), (150, 30, 30)]),
+    "dark": ((25, 28, 36), [(235, 235, 235), (240, 210, 90), (120, 200, 255)]),
+}
+SCRIPTS = ("latin", "cjk", "mixed")
+
+LATIN_WORDS = ["Start", "Game", "Options", "Settings", "Inventory", "Quest", "Map", "Save",
+               "Load", "Exit", "Continue", "Attack", "Defense", "Level", "Health", "Items",
+               "Skills", "Equipment", "Return", "Confirm", "Cancel", "Volume", "Graphics"]
+CJK_WORDS = ["開始遊戲", "設定", "道具", "任務", "地圖", "存檔", "讀取", "離開", "繼續",
+             "攻擊", "防禦", "等級", "體力", "技能", "裝備", "返回", "確認", "取消", "音量"]
+
+OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "files", "benchmark", "benchmark.json")
+STAGES = ("ocr", "grouping", "color", "fill", "translate", "render")
+
+
+def make_text(rng, script):
+    count = rng.randint(1, 4)
+    if script == "latin":
+        return " ".join(rng.choice(LATIN_WORDS) for _ in range(count))
+    if script == "cjk":
+        return "".join(rng.choice(CJK_WORDS) for _ in range(count))
+    # 中英混合
+    return " ".join(rng.choice(LATIN_WORDS if i % 2 else CJK_WORDS) for i in range(count))
+
+def make_screenshot(width, height, density, theme, script, seed=0):
+    # 產生合成截圖 (BGR)，回傳 (圖片, 繪製的文字列表)
+    rng = random.Random(seed)
+    background, text_colors = THEMES[theme]
+    font_size = max(12, height // 36)
+    font = mod200_translate.get_default_font().font_variant(size=font_size)
+    row_height = int(font_size * 1.8)
+    margin = font_size
+
+    img = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(img)
+
+    # 加入一些圖示與色塊等非文字區域
+    for _ in range(max(2, width * height // 200000)):
+        x, y = rng.randrange(width), rng.randrange(height)
+        size = rng.randint(font_size, font_size * 4)
+        draw.rectangle((x, y, x + size, y + size), fill=tuple(rng.randrange(256) for _ in range(3)))
+
+    # 兩欄文字
+    drawn = []
+    column_width = (width - margin * 2) // 2
+    for top in range(margin, height - row_height, row_height):
+        for column in range(2):
+            if rng.random() >= DENSITIES[density]:
+                continue
+            left = margin + column * column_width
+            text = make_text(rng, script)
+            draw.text((left, top), text, font=font, fill=rng.choice(text_colors))
+            drawn.append(text)
+
+    return cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR), drawn
+
+def stub_translator(latency=0.0):
+    # 固定輸出的翻譯器 (與 mod403 的模擬伺服器相同，支援 mod206 的編號 JSON 與純文字格式)，可模擬 API 延遲
+    def translate(text, target_lang, source_lang=None):
+        if latency:
+            time.sleep(latency)
+        return mod403_mock_translate_server.fake_translate_text(text)
+    return translate
+
+def text_accuracy(expected, recognized):
+    # 每行繪製的文字與最相近的 OCR 結果的相似度 (0~1) 平均值
+    if not expected:
+        return 1.0
+    normalized = ["".join(text.split()) for text in recognized]
+    total = 0.0
+    for text in expected:
+        text = "".join(text.split())
+        total += max((difflib.SequenceMatcher(None, text, other).ratio() for other in normalized), default=0.0)
+    return total / len(expected)
+
+def run_once(img, backend):
+    # 執行一次 remove_text_image (隱藏除錯輸出)，回傳 (總耗時, result_info)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, result_info = mod200_translate.remove_text_image(img, ocr_backend=backend)
+    return time.perf_counter() - start, result_info
+
+def run_case(name, resolution, density, theme, script, repeat, backend, scaling=True):
+    width, height = RESOLUTIONS[resolution]
+    img, drawn = make_screenshot(width, height, density, theme, script)
+    mod200_translate.USE_SCALE_NORMALIZATION = scaling
+
+    # 預熱 (載入引擎與字型)，不列入統計
+    run_once(img, backend)
+
+    totals = []
+    stage_times = {stage: [] for stage in STAGES}
+    ocr_lines = 0
+    accuracy = 0.0
+    for _ in range(repeat):
+        total, result_info = run_once(img, backend)
+        totals.append(total)
+        for stage in STAGES:
+            stage_times[stage].append(result_info['timings'].get(stage, 0.0))
+        ocr_lines = len(result_info['line_info'])
+        accuracy = text_accuracy(drawn, [info['original_text'] for info in result_info['line_info'].values()])
+
+    # 記憶體另外量測一次，避免 tracemalloc 的額外負擔影響計時
+    tracemalloc.start()
+    run_once(img, backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "resolution": resolution,
+        "width": width,
+        "height": height,
+        "density": density,
+        "theme": theme,
+        "script": script,
+        "scaling": scaling,
+        "lines_drawn": len(drawn),
+        "ocr_lines": ocr_lines,
+        "accuracy": accuracy,
+        "total_median": statistics.median(totals),
+        "total_min": min(totals),
+        "stages_median": {stage: statistics.median(times) for stage, times in stage_times.items()},
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    # 與先前的結果比較，回傳退步的項目說明
+    previous = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(case["name"])
+        if old is None:
+            continue
+        if case["total_median"] > old["total_median"] * (1 + tolerance):
+            regressions.append(f"{case['name']}: 耗時 {old['total_median']:.3f}s -> {case['total_median']:.3f}s")
+        for stage in STAGES:
+            old_time = old["stages_median"].get(stage, 0.0)
+            new_time = case["stages_median"].get(stage, 0.0)
+            # 增加不到 10ms 的階段不列入，避免計時誤差造成誤報
+            if new_time - old_time > 0.01 and new_time > old_time * (1 + tolerance):
+                regressions.append(f"{case['name']}: {stage} {old_time:.3f}s -> {new_time:.3f}s")
+        if case["peak_memory_mb"] > old["peak_memory_mb"] * (1 + tolerance):
+            regressions.append(f"{case['name']}: 記憶體 {old['peak_memory_mb']:.1f}MB -> {case['peak_memory_mb']:.1f}MB")
+        if case["ocr_lines"] != old["ocr_lines"]:
+            regressions.append(f"{case['name']}: OCR 行數 {old['ocr_lines']} -> {case['ocr_lines']}")
+        if case.get("accuracy", 1.0) < old.get("accuracy", 0.0) - 0.02:
+            regressions.append(f"{case['name']}: 辨識正確率 {old['accuracy']:.3f} -> {case['accuracy']:.3f}")
+    return regressions
+
+def parse_list(value, choices):
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    for item in items:
+        if item not in choices:
+            raise argparse.ArgumentTypeError(f"未知的選項 {item}，可用: {', '.join(choices)}")
+    return items
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="remove_text 流程的效能測試 (合成截圖)")
+    parser.add_argument("--resolutions", default="small,720p,1080p", type=lambda v: parse_list(v, RESOLUTIONS))
+    parser.add_argument("--densities", default="sparse,dense", type=lambda v: parse_list(v, DENSITIES))
+    parser.add_argument("--themes", default="light,dark", type=lambda v: parse_list(v, THEMES))
+    parser.add_argument("--scripts", default="latin,cjk,mixed", type=lambda v: parse_list(v, SCRIPTS))
+    parser.add_argument("--repeat", type=int, default=3, help="每個項目重複次數")
+    parser.add_argument("--backend", default=None, help="OCR 後端 (見 mod201_ocr_engine.BACKENDS)")
+    parser.add_argument("--latency", type=float, default=0.0, help="模擬翻譯 API 的延遲秒數")
+    parser.add_argument("--scaling", choices=("on", "off", "both"), default="on",
+                        help="OCR 前的縮放 (both 會分別測試開啟與關閉，比較耗時與正確率)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="結果 JSON 檔案")
+    parser.add_argument("--baseline", default=None, help="比較用的先前結果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允許的退步比例")
+    args = parser.parse_args(argv)
+
+    # 使用固定輸出的翻譯器並停用翻譯快取與結果快取，只量測本機流程
+    mod200_translate.translator = stub_translator(args.latency)
+    mod200_translate.USE_TRANSLATE_CACHE = False
+    mod200_translate.USE_RESULT_CACHE = False
+    backend_name = mod201_ocr_engine.get_backend(args.backend).name
+
+    scalings = {"on": [True], "off": [False], "both": [False, True]}[args.scaling]
+    cases = []
+    for resolution, density, theme, script, scaling in itertools.product(
+            args.resolutions, args.densities, args.themes, args.scripts, scalings):
+        name = f"{resolution}-{density}-{theme}-{script}"
+        if not scaling:
+            name += "-noscale"
+        case = run_case(name, resolution, density, theme, script, args.repeat, args.backend, scaling)
+        cases.append(case)
+        print(f"{name:40s} 行數 {case['ocr_lines']:3d}/{case['lines_drawn']:3d}  "
+              f"正確率 {case['accuracy']:.3f}  "
+              f"總計 {case['total_median'] * 1000:8.1f}ms  "
+              + "  ".join(f"{stage} {case['stages_median'][stage] * 1000:7.1f}" for stage in STAGES)
+              + f"  記憶體 {case['peak_memory_mb']:.1f}MB")
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ocr_backend": backend_name,
+            "repeat": args.repeat,
+            "latency": args.latency,
+            "scaling": args.scaling,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "cases": cases,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+    print(f"\n結果已保存至 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\n效能退步：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\n與基準相比沒有退步")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
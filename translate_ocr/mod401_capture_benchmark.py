@@ -0,0 +1,48 @@
+import argparse
+import statistics
+import sys
+import time
+from PyQt5.QtWidgets import QApplication
+
+import mod213_capture
+
+
+def time_backend(backend, screen, repeat, rect=None):
+    # 回傳每次截圖的耗時 (秒)，第一次 (初始化) 不列入
+    backend.grab(screen, rect)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.grab(screen, rect)
+        times.append(time.perf_counter() - start)
+    return times
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="截圖後端的效能測試 (每個螢幕截取整個畫面與一個區域)")
+    parser.add_argument("--backends", default=",".join(mod213_capture.BACKENDS), help="要測試的後端，以逗號分隔")
+    parser.add_argument("--repeat", type=int, default=20, help="每個項目重複次數")
+    args = parser.parse_args(argv)
+
+    app = QApplication(sys.argv[:1])
+    for screen in app.screens():
+        geometry = screen.geometry()
+        region = (geometry.width() // 4, geometry.height() // 4, geometry.width() // 2, geometry.height() // 4)
+        print(f"螢幕 {screen.name()} {geometry.width()}x{geometry.height()} (縮放 {screen.devicePixelRatio()})")
+        for name in args.backends.split(","):
+            try:
+                backend = mod213_capture.get_backend(name)
+            except ValueError as e:
+                print(f"  {name:6s} 略過: {e}")
+                continue
+            for label, rect in (("整個畫面", None), ("區域", region)):
+                try:
+                    times = time_backend(backend, screen, args.repeat, rect)
+                except RuntimeError as e:
+                    print(f"  {name:6s} {label:6s} 失敗: {e}")
+                    continue
+                print(f"  {name:6s} {label:6s} 中位數 {statistics.median(times) * 1000:7.1f}ms  "
+                      f"最大 {max(times) * 1000:7.1f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
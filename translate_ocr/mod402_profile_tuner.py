@@ -0,0 +1,191 @@
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import statistics
+import sys
+import time
+
+import mod200_translate
+import mod201_ocr_engine
+import mod211_layout
+import mod215_batch_translate
+import mod218_profiles
+from mod400_benchmark import RESOLUTIONS, make_screenshot, text_accuracy
+
+# 截圖設定檔的自動調整：以有標註的樣本比較各種參數組合，保存達到正確率目標的組合中最快的一個
+# OCR 參數需要重新辨識，分行參數只需重新分行；每種 OCR 組合只辨識一次，再套用所有分行參數
+# 段落與顏色的參數不影響辨識出的文字，不列入搜尋 (沿用設定檔原本的值)
+OCR_SEARCH_SPACE = {
+    'psm': [6, 11, 3],
+    'text_detection': [True, False],
+    'scale_normalization': [True, False],
+    'target_text_height': [24, 30, 40],
+}
+LAYOUT_SEARCH_SPACE = {
+    'min_conf': [10, 30, 50],
+    'min_word_width': [10, 20],
+    'horizontal_threshold': [0.8, 1.2],
+    'vertical_overlap': [0.5, 0.3],
+}
+ACCURACY_TARGET = 0.9  # 樣本平均正確率 (見 mod400_benchmark.text_accuracy) 的最低要求
+# 沒有指定樣本資料夾時使用的合成截圖 (解析度, 密度, 配色, 文字)
+SYNTHETIC_CASES = [
+    ("720p", "dense", "light", "mixed"),
+    ("720p", "sparse", "dark", "latin"),
+    ("1080p", "dense", "dark", "cjk"),
+]
+
+
+def load_samples(directory):
+    # 樣本資料夾：每張圖片旁邊放同名的 .txt (例如 menu.png 與 menu.txt)，每行為圖片中的一行文字
+    # 回傳 [(名稱, 圖片, 文字列表)]，沒有標註的圖片略過
+    _, images = mod215_batch_translate.find_images(directory)
+    samples = []
+    for path in images:
+        label_path = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(label_path):
+            print(f"略過沒有標註的圖片: {path}")
+            continue
+        img = mod215_batch_translate.read_image(path)
+        if img is None:
+            print(f"無法讀取圖片: {path}")
+            continue
+        with open(label_path, 'r', encoding='utf-8') as f:
+            expected = [line.strip() for line in f if line.strip()]
+        samples.append((os.path.relpath(path, directory), img, expected))
+    return samples
+
+def synthetic_samples():
+    samples = []
+    for seed, (resolution, density, theme, script) in enumerate(SYNTHETIC_CASES):
+        width, height = RESOLUTIONS[resolution]
+        img, drawn = make_screenshot(width, height, density, theme, script, seed=seed)
+        samples.append((f"{resolution}-{density}-{theme}-{script}", img, drawn))
+    return samples
+
+def combinations(space, base):
+    # 參數組合 (只列出 space 中的項目)；關閉縮放時 target_text_height 沒有作用，只保留一種
+    keys = list(space)
+    seen = set()
+    for values in itertools.product(*(space[key] for key in keys)):
+        combo = dict(zip(keys, values))
+        if combo.get('scale_normalization') is False and 'target_text_height' in combo:
+            combo['target_text_height'] = base['target_text_height']
+        key = tuple(combo[key] for key in keys)
+        if key not in seen:
+            seen.add(key)
+            yield combo
+
+def measure_ocr(samples, params, backend, repeat):
+    # 以 params 辨識所有樣本，回傳 (每張樣本的 data, 總耗時 (每張取中位數後加總))
+    results = []
+    total = 0.0
+    for _, img, _ in samples:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                data, _, _ = mod200_translate.recognize_text(img, backend, params)
+            times.append(time.perf_counter() - start)
+        results.append(data)
+        total += statistics.median(times)
+    return results, total
+
+def evaluate_layout(samples, results, params):
+    # 以 params 分行，回傳 (樣本平均正確率, 分行總耗時)
+    accuracies = []
+    total = 0.0
+    for (_, _, expected), data in zip(samples, results):
+        start = time.perf_counter()
+        lines = mod211_layout.group_lines(data, params)
+        total += time.perf_counter() - start
+        recognized = [' '.join(line['texts']) for line in lines.values() if line['texts']]
+        accuracies.append(text_accuracy(expected, recognized))
+    return statistics.mean(accuracies), total
+
+def tune(samples, base, backend, repeat, target):
+    # 回傳所有組合的結果 [{'params', 'accuracy', 'time', 'ocr_time'}]，依是否達到目標、耗時、正確率排序
+    ocr_combos = list(combinations(OCR_SEARCH_SPACE, base))
+    layout_combos = list(combinations(LAYOUT_SEARCH_SPACE, base))
+    print(f"樣本 {len(samples)} 張，OCR 組合 {len(ocr_combos)} 種 x 分行組合 {len(layout_combos)} 種")
+
+    # 預熱 (載入引擎)，不列入統計
+    with contextlib.redirect_stdout(io.StringIO()):
+        mod200_translate.recognize_text(samples[0][1], backend, base)
+
+    trials = []
+    for i, ocr_combo in enumerate(ocr_combos, 1):
+        params = dict(base, **ocr_combo)
+        results, ocr_time = measure_ocr(samples, params, backend, repeat)
+        best_accuracy = 0.0
+        for layout_combo in layout_combos:
+            trial_params = dict(params, **layout_combo)
+            accuracy, layout_time = evaluate_layout(samples, results, trial_params)
+            trials.append({'params': trial_params, 'accuracy': accuracy, 'time': ocr_time + layout_time,
+                           'ocr_time': ocr_time})
+            best_accuracy = max(best_accuracy, accuracy)
+        print(f"[{i}/{len(ocr_combos)}] {ocr_combo}  OCR {ocr_time * 1000:8.1f}ms  最高正確率 {best_accuracy:.3f}")
+
+    # 同一種 OCR 組合的分行耗時差異只是誤差，依 OCR 耗時排序後優先選擇正確率較高、與原本參數差異較少的組合
+    trials.sort(key=lambda trial: (trial['accuracy'] < target, trial['ocr_time'], -trial['accuracy'],
+                                   sum(trial['params'][key] != base[key] for key in trial['params'])))
+    return trials
+
+def describe(params, base):
+    changed = {key: value for key, value in params.items() if value != base.get(key)}
+    return ", ".join(f"{key}={value}" for key, value in changed.items()) or "(與原本相同)"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="自動調整截圖設定檔的 OCR 與分行參數")
+    parser.add_argument("profile", help="要建立或更新的設定檔名稱")
+    parser.add_argument("--samples", default=None, help="有標註的樣本資料夾 (圖片與同名 .txt)，預設使用合成截圖")
+    parser.add_argument("--target", type=float, default=ACCURACY_TARGET, help="正確率目標 (0~1)")
+    parser.add_argument("--repeat", type=int, default=1, help="每張樣本辨識次數 (耗時取中位數)")
+    parser.add_argument("--backend", default=None, help="OCR 後端 (見 mod201_ocr_engine.BACKENDS)")
+    parser.add_argument("--title", action="append", default=None, help="套用此設定檔的視窗標題樣式 (可重複)")
+    parser.add_argument("--process", action="append", default=None, help="套用此設定檔的程序名稱樣式 (可重複)")
+    parser.add_argument("--top", type=int, default=10, help="列出前幾名的組合")
+    parser.add_argument("--dry-run", action="store_true", help="只列出結果，不保存設定檔")
+    args = parser.parse_args(argv)
+
+    samples = load_samples(args.samples) if args.samples else synthetic_samples()
+    if not samples:
+        print(f"找不到有標註的樣本: {args.samples}")
+        return 1
+
+    store = mod218_profiles.get_store()
+    base = store.params(args.profile if args.profile in store.names() else None)
+    mod201_ocr_engine.warm_up(backend=args.backend)
+
+    # 以目前的參數作為比較基準
+    results, base_time = measure_ocr(samples, base, args.backend, args.repeat)
+    base_accuracy, layout_time = evaluate_layout(samples, results, base)
+    base_time += layout_time
+    print(f"目前的參數: 耗時 {base_time * 1000:.1f}ms  正確率 {base_accuracy:.3f}\n")
+
+    trials = tune(samples, base, args.backend, args.repeat, args.target)
+    print(f"\n前 {args.top} 名 (正確率目標 {args.target:.2f})：")
+    for trial in trials[:args.top]:
+        mark = " " if trial['accuracy'] >= args.target else "x"
+        print(f" {mark} 耗時 {trial['time'] * 1000:8.1f}ms  正確率 {trial['accuracy']:.3f}  {describe(trial['params'], base)}")
+
+    best = trials[0]
+    if best['accuracy'] < args.target:
+        print(f"\n沒有達到正確率目標的組合 (最高 {max(trial['accuracy'] for trial in trials):.3f})，不保存設定檔")
+        return 1
+    print(f"\n最快的組合: 耗時 {best['time'] * 1000:.1f}ms ({base_time / best['time'] if best['time'] else 0:.2f} 倍)  "
+          f"正確率 {best['accuracy']:.3f}")
+    if args.dry_run:
+        return 0
+
+    match = None
+    if args.title or args.process:
+        match = {"title": args.title or [], "process": args.process or []}
+    store.save_profile(args.profile, best['params'], match)
+    print(f"設定檔 {args.profile} 已保存至 {store.path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import argparse
+import json
+import socket
+import ssl
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mod206_translate_dispatch
+import mod219_translate_providers
+
+# 本機的翻譯 API 模擬伺服器：與 Gemini (generateContent) 及 GPT (chat/completions) 相同的格式，
+# 譯文為原文加上〔〕，可離線測試翻譯流程與連線池 (設定環境變數 TRANSLATE_API_BASE_URL=http://127.0.0.1:埠號)
+
+
+def fake_translate_text(text):
+    # 依 mod206_translate_dispatch 的請求格式回答：編號 JSON 逐項加上〔〕，
+    # 純文字格式 (build_plain_request) 去除格式說明後逐行加上〔〕，行數與原文相同
+    if text.startswith(mod206_translate_dispatch.BATCH_INSTRUCTION):
+        try:
+            data = json.loads(text[len(mod206_translate_dispatch.BATCH_INSTRUCTION):])
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            return json.dumps({key: f"〔{value}〕" for key, value in data.items()}, ensure_ascii=False)
+    if text.startswith(mod206_translate_dispatch.PLAIN_INSTRUCTION):
+        text = text[len(mod206_translate_dispatch.PLAIN_INSTRUCTION):]
+    return "\n".join(f"〔{line}〕" for line in text.splitlines())
+
+def fake_translate(prompt):
+    # 取出提示中的原文 (見 mod219_translate_providers.build_prompt)
+    return fake_translate_text(prompt.split(mod219_translate_providers.PROMPT_SEPARATOR, 1)[-1])
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """處理翻譯請求，HTTP/1.1 保持連線 (與實際的 API 相同)"""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+        with self.server.stats_lock:
+            self.server.open_connections.add(self.connection)
+
+    def finish(self):
+        with self.server.stats_lock:
+            self.server.open_connections.discard(self.connection)
+        super().finish()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+        self.server.count('requests')
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path.endswith(":generateContent"):
+            if not self.headers.get('x-goog-api-key'):
+                self.send_json(403, {"error": {"message": "API key not valid"}})
+                return
+            prompt = "".join(part.get("text", "") for part in payload["contents"][0]["parts"])
+            self.send_json(200, {"candidates": [{"content": {"role": "model", "parts": [{"text": fake_translate(prompt)}]}}]})
+        elif self.path.endswith("/chat/completions"):
+            auth = self.headers.get('Authorization', '')
+            if not auth.startswith("Bearer ") or not auth[len("Bearer "):].strip():
+                self.send_json(401, {"error": {"message": "Incorrect API key provided"}})
+                return
+            prompt = payload["messages"][-1]["content"]
+            self.send_json(200, {"choices": [{"index": 0, "message": {"role": "assistant", "content": fake_translate(prompt)}}]})
+        else:
+            self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_GET(self):
+        # /stats: 連線數與請求數 (確認連線有被重複使用)
+        if self.path == "/stats":
+            self.send_json(200, self.server.snapshot())
+        else:
+            self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    """模擬伺服器，記錄建立的連線數與請求數"""
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, certfile=None, keyfile=None):
+        super().__init__(address, MockHandler)
+        self.latency = latency
+        self.https = certfile is not None
+        if self.https:
+            # HTTPS：交握在處理連線的執行緒中進行 (第一次讀取時)，不阻塞接受新連線
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+        self.stats = {'connections': 0, 'requests': 0}
+        self.stats_lock = threading.Lock()
+        self.open_connections = set()
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def snapshot(self):
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def drop_connections(self):
+        # 關閉所有保持中的連線 (模擬伺服器關閉閒置連線，測試連線池重新連線)
+        with self.stats_lock:
+            connections = list(self.open_connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def start_server(port=0, latency=0.0, certfile=None, keyfile=None):
+    # 在背景執行緒啟動伺服器，回傳 (伺服器, 基底網址)；指定 certfile 時使用 HTTPS
+    server = MockServer(("127.0.0.1", port), latency, certfile, keyfile)
+    threading.Thread(target=server.serve_forever, daemon=True, name="mock_translate_server").start()
+    return server, server_url(server)
+
+def server_url(server):
+    return f"{'https' if server.https else 'http'}://127.0.0.1:{server.server_address[1]}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本機的翻譯 API 模擬伺服器 (Gemini / GPT 格式)")
+    parser.add_argument("--port", type=int, default=8765, help="監聽的連接埠")
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求的模擬延遲秒數")
+    parser.add_argument("--certfile", default=None, help="憑證檔 (PEM)，指定時使用 HTTPS")
+    parser.add_argument("--keyfile", default=None, help="私鑰檔 (PEM)，憑證檔中已包含私鑰時可省略")
+    args = parser.parse_args(argv)
+
+    server = MockServer(("127.0.0.1", args.port), args.latency, args.certfile, args.keyfile)
+    url = server_url(server)
+    print(f"模擬伺服器已啟動: {url}")
+    print(f"設定 {mod219_translate_providers.BASE_URL_ENV}={url} 後啟動翻譯程式，"
+          f"api_config.json 中任意的 API key 都可使用")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"統計: {server.snapshot()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())